@@ -0,0 +1,267 @@
+"""
+Reproduzierbare Benchmarks auf synthetischen Netzen (kein osmnx-Download).
+
+Aufruf aus dem Repo-Wurzelverzeichnis:
+    python -m benchmarks.run                         # alle Fälle
+    python -m benchmarks.run --sizes 1000,10000 -o bench.json
+    python -m benchmarks.run --compare alt.json      # Vergleich mit Baseline
+
+Jeder Fall läuft in einem eigenen (per fork gestarteten) Prozess: erst ein
+Durchlauf für die Zeit, dann ein zweiter unter tracemalloc für den
+Spitzenverbrauch. Ergebnis ist JSON mit Rate (Operationen/s) und peak_mb.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from typing import Callable, Dict, List, Optional
+
+from src.dashboard.geometry import StreetGeometry, vehicle_arrays
+from src.simulation import Simulator
+from src.simulation.synthetic import grid_network
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def _network(size: int, seed: int):
+    # Etwa 1 Kreuzung je 25 Fahrzeuge, mindestens 10 x 10
+    side = max(10, int(round((size / 25) ** 0.5)))
+    return grid_network(side, side, seed=seed)
+
+
+def _simulator(size: int, seed: int, engine: str = "objects") -> Simulator:
+    intersections, streets = _network(size, seed)
+    return Simulator.from_network(intersections, streets, engine=engine, seed=seed)
+
+
+# ----------------------------------------------------------------------
+# Fälle: jede Funktion liefert (Sekunden, Anzahl Operationen, Einheit)
+# ----------------------------------------------------------------------
+def bench_graph_build(size: int, seed: int, steps: int):
+    t = time.perf_counter()
+    intersections, streets = _network(size, seed)
+    Simulator.from_network(intersections, streets, seed=seed)
+    return time.perf_counter() - t, len(streets), "streets/s"
+
+
+def bench_build_adjacency(size: int, seed: int, steps: int):
+    sim = _simulator(size, seed)
+    reps = 5
+    t = time.perf_counter()
+    for _ in range(reps):
+        sim.build_adjacency(sim.intersections, sim.streets, bidir=False)
+    return time.perf_counter() - t, reps * len(sim.streets), "streets/s"
+
+
+def bench_dijkstra_route(size: int, seed: int, steps: int):
+    sim = _simulator(size, seed)
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(sim.spawn_nodes, size=(50, 2))
+    t = time.perf_counter()
+    for s, g in pairs:
+        sim.dijkstra_route(sim.adjacency, s, g)
+    return time.perf_counter() - t, len(pairs), "routes/s"
+
+
+def bench_router_route(size: int, seed: int, steps: int):
+    sim = _simulator(size, seed)
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(sim.spawn_nodes, size=(200, 2))
+    t = time.perf_counter()
+    for s, g in pairs:
+        sim.router.route(s, g)
+    return time.perf_counter() - t, len(pairs), "routes/s"
+
+
+def bench_spawn_vehicle(size: int, seed: int, steps: int):
+    sim = _simulator(size, seed)
+    n = min(size, 2000)
+    t = time.perf_counter()
+    for _ in range(n):
+        sim.spawn_vehicle()
+    return time.perf_counter() - t, n, "vehicles/s"
+
+
+def bench_spawn_vehicles(size: int, seed: int, steps: int):
+    sim = _simulator(size, seed)
+    t = time.perf_counter()
+    n = sim.spawn_vehicles(size, processes=1)
+    return time.perf_counter() - t, n, "vehicles/s"
+
+
+def _bench_step(engine: str):
+    def bench(size: int, seed: int, steps: int):
+        sim = _simulator(size, seed, engine=engine)
+        sim.spawn_vehicles(size, processes=1)
+        vehicle_steps = 0
+        t = time.perf_counter()
+        for _ in range(steps):
+            vehicle_steps += sim.vehicle_count()
+            sim.step(1.0)
+        return time.perf_counter() - t, vehicle_steps, "vehicle-steps/s"
+
+    return bench
+
+
+def bench_dashboard_frame(size: int, seed: int, steps: int):
+    sim = _simulator(size, seed)
+    sim.spawn_vehicles(size, processes=1)
+    for _ in range(5):
+        sim.step(1.0)
+    geom = StreetGeometry(sim.streets)
+    reps = 20
+    t = time.perf_counter()
+    for _ in range(reps):
+        _, street_ids, pos = vehicle_arrays(sim)
+        geom.positions(street_ids, pos)
+    return time.perf_counter() - t, reps * sim.vehicle_count(), "vehicles/s"
+
+
+# Name -> (Funktion, hängt von der Größe ab)
+BENCHMARKS: Dict[str, Callable] = {
+    "graph_build": bench_graph_build,
+    "build_adjacency": bench_build_adjacency,
+    "dijkstra_route": bench_dijkstra_route,
+    "router_route": bench_router_route,
+    "spawn_vehicle": bench_spawn_vehicle,
+    "spawn_vehicles": bench_spawn_vehicles,
+    "step_objects": _bench_step("objects"),
+    "step_vectorized": _bench_step("vectorized"),
+    "dashboard_frame": bench_dashboard_frame,
+}
+
+
+def _run_case(conn, name: str, size: int, seed: int, steps: int, memory: bool):
+    # Ausgaben des Simulators unterdrücken, nur das Ergebnis zählt
+    sys.stdout = open(os.devnull, "w")
+    func = BENCHMARKS[name]
+    seconds, ops, unit = func(size, seed, steps)
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        func(size, seed, steps)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    conn.send(
+        {
+            "name": name,
+            "size": size,
+            "seconds": seconds,
+            "ops": ops,
+            "rate": ops / seconds if seconds > 0 else None,
+            "unit": unit,
+            "peak_mb": peak_mb,
+        }
+    )
+    conn.close()
+
+
+def run_case(name: str, size: int, seed: int, steps: int, memory: bool) -> dict:
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_case, args=(child, name, size, seed, steps, memory))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {"name": name, "size": size, "error": f"exit code {proc.exitcode}"}
+    proc.join()
+    return result
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: List[dict], baseline_path: str):
+    """Druckt das Verhältnis der Raten zur Baseline (>1 = schneller)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(r["name"], r["size"]): r for r in baseline["results"] if "rate" in r}
+    print(f"{'Fall':<20} {'Größe':>8} {'Rate':>14} {'Baseline':>14} {'Faktor':>8}")
+    for r in results:
+        base = old.get((r["name"], r["size"]))
+        if not base or not r.get("rate") or not base.get("rate"):
+            continue
+        print(
+            f"{r['name']:<20} {r['size']:>8} {r['rate']:>14.1f} "
+            f"{base['rate']:>14.1f} {r['rate'] / base['rate']:>8.2f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Simulator-Benchmarks")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="Fahrzeuganzahlen, kommagetrennt",
+    )
+    parser.add_argument(
+        "--only", default="", help="nur diese Fälle (kommagetrennt)"
+    )
+    parser.add_argument("--steps", type=int, default=20, help="Ticks je step-Fall")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="kein tracemalloc-Lauf")
+    parser.add_argument("-o", "--output", help="JSON-Ausgabedatei")
+    parser.add_argument("--compare", metavar="BASELINE", help="Baseline-JSON")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unbekannte Fälle: {unknown}")
+
+    results = []
+    for name in names:
+        for size in sizes:
+            r = run_case(name, size, args.seed, args.steps, not args.no_memory)
+            results.append(r)
+            if "error" in r:
+                print(f"[bench] {name:<20} {size:>8}  FEHLER {r['error']}")
+                continue
+            peak = f"{r['peak_mb']:.1f} MB" if r["peak_mb"] is not None else "-"
+            print(
+                f"[bench] {name:<20} {size:>8}  {r['rate']:>14.1f} {r['unit']:<16} "
+                f"{r['seconds']:.3f}s  peak {peak}"
+            )
+
+    report = {
+        "environment": environment(),
+        "settings": {"sizes": sizes, "steps": args.steps, "seed": args.seed},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[bench] Ergebnis gespeichert: {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main()
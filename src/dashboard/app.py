@@ -1,20 +1,62 @@
+import argparse
+
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-import shapely.geometry
+from matplotlib.collections import LineCollection
+from matplotlib.widgets import Slider
 import mplcursors  # <-- Wichtig, installiere mit `pip install mplcursors`
 
+from typing import Dict, List, Optional, Tuple
+
 # Aus deinem lokalen Paket (ggf. Pfad anpassen):
 from ..simulation import Simulator
+from ..simulation.recorder import TrajectoryReader
+from .geometry import StreetGeometry, vehicle_arrays
 
 
 def position_on_street(street, s):
     """
     Liefert (x, y) als Interpolation auf der Street-Polylinie
     für die Distanz s (Position auf der Street in Metern).
+    Für viele Fahrzeuge StreetGeometry.positions verwenden.
+    """
+    geom = StreetGeometry({street.id: street})
+    x, y = geom.positions(np.array([street.id]), np.array([s], dtype=np.float64))[0]
+    return x, y
+
+
+class VehicleIndex:
+    """
+    Nachschlagen eines Fahrzeugs per ID (für Hover). Das Mapping wird erst
+    bei Bedarf gebaut und pro Frame verworfen, kostet also nur etwas, wenn
+    tatsächlich gehovert wird.
     """
-    linestr = shapely.geometry.LineString(street.coords)
-    point = linestr.interpolate(s)
-    return point.x, point.y
+
+    def __init__(self, sim: Simulator):
+        self.sim = sim
+        self._by_id: Optional[Dict[int, object]] = None
+
+    def invalidate(self):
+        self._by_id = None
+
+    def info(self, veh_id: int) -> Optional[Tuple[float, List[int]]]:
+        """(speed, route_streets) des Fahrzeugs oder None."""
+        engine = self.sim.engine
+        if self._by_id is None:
+            if engine is not None:
+                n = engine.size
+                self._by_id = dict(zip(engine.vid[:n].tolist(), range(n)))
+            else:
+                self._by_id = {v.vehicle_id: v for v in self.sim.vehicles}
+        entry = self._by_id.get(veh_id)
+        if entry is None:
+            return None
+        if engine is not None:
+            off, ln = int(engine.route_off[entry]), int(engine.route_len[entry])
+            route = engine.street_ids[engine.route_buf[off : off + ln]].tolist()
+            return float(engine.speed[entry]), route
+        return entry.speed, entry.route_streets
 
 
 def main():
@@ -25,27 +67,25 @@ def main():
     for _ in range(30):
         sim.spawn_vehicle()
 
+    # Geometrie einmalig vorberechnen (Bogenlängen, Polylinien)
+    geom = StreetGeometry(sim.streets)
+
     # 2) Erstelle eine Matplotlib-Figur
     fig, ax = plt.subplots(figsize=(8, 8))
     ax.set_title("Verkehrs-Simulation (interaktiv)")
     ax.set_xlabel("x-Koordinate (Proj.)")
     ax.set_ylabel("y-Koordinate (Proj.)")
 
-    # 3) Zeichne alle Straßen als Linien (grau)
-    for st_id, st in sim.streets.items():
-        x_vals = [p[0] for p in st.coords]
-        y_vals = [p[1] for p in st.coords]
-        ax.plot(x_vals, y_vals, color="gray", linewidth=1)
+    # 3) Zeichne alle Straßen als eine LineCollection (grau)
+    ax.add_collection(LineCollection(geom.segments(), colors="gray", linewidths=1))
 
     # 4) Zeichne alle Intersections als Marker (grün)
-    intersection_x = []
-    intersection_y = []
-    for node_id, inter in sim.intersections.items():
-        intersection_x.append(inter.x_coord)
-        intersection_y.append(inter.y_coord)
+    intersection_xy = np.array(
+        [(inter.x_coord, inter.y_coord) for inter in sim.intersections.values()]
+    ).reshape(-1, 2)
     intersections_scatter = ax.scatter(
-        intersection_x,
-        intersection_y,
+        intersection_xy[:, 0],
+        intersection_xy[:, 1],
         c="green",
         s=40,
         marker="x",
@@ -58,10 +98,10 @@ def main():
     # Optional: Legende
     ax.legend()
 
-    # (A) Globale Liste oder Dict, um Mapping "Index -> Fahrzeug" zu haben
-    # Da Matplotlibs scatter per default "index" = Reihenfolge in set_offsets.
-    # => Wir speichern pro Frame die IDs.
-    vehicle_ids = []
+    # (A) IDs in Scatter-Reihenfolge des aktuellen Frames (Index -> ID)
+    # und ID -> Fahrzeug für den Hover
+    frame_ids = np.zeros(0, dtype=np.int64)
+    vehicle_index = VehicleIndex(sim)
 
     # (B) Für die Routenanzeige brauchen wir eine "aktuelle Route-Linie"
     current_route_line = None
@@ -71,18 +111,11 @@ def main():
         Initialisierungsfunktion für FuncAnimation.
         Setzt Achsen-Grenzen usw.
         """
-        all_x = []
-        all_y = []
-        for st in sim.streets.values():
-            for xx, yy in st.coords:
-                all_x.append(xx)
-                all_y.append(yy)
-
         # Falls wir Koordinaten haben, Achsenlimit setzen
-        if all_x and all_y:
-            margin = 100
-            ax.set_xlim(min(all_x) - margin, max(all_x) + margin)
-            ax.set_ylim(min(all_y) - margin, max(all_y) + margin)
+        if len(geom.xy):
+            xmin, xmax, ymin, ymax = geom.bounds(margin=100)
+            ax.set_xlim(xmin, xmax)
+            ax.set_ylim(ymin, ymax)
 
         return (vehicle_scatter,)
 
@@ -90,26 +123,17 @@ def main():
         """
         Update-Funktion pro Frame:
         - Einen Zeitschritt simulieren
-        - Alle Fahrzeugpositionen updaten
+        - Alle Fahrzeugpositionen vektorisiert interpolieren
         - Scatter-Punkte aktualisieren
         """
+        nonlocal frame_ids
         sim.step(dt=1.0)
 
-        # Positionen aller Fahrzeuge sammeln
-        xs = []
-        ys = []
-        # Leeren wir "vehicle_ids", füllen neu
-        vehicle_ids.clear()
-
-        for v in sim.vehicles:
-            st = v.current_street
-            x, y = position_on_street(st, v.position_s)
-            xs.append(x)
-            ys.append(y)
-            vehicle_ids.append(v.vehicle_id)  # ID merken
+        frame_ids, street_ids, pos = vehicle_arrays(sim)
+        vehicle_index.invalidate()
 
         # In den Scatter "einspielen"
-        vehicle_scatter.set_offsets(list(zip(xs, ys)))
+        vehicle_scatter.set_offsets(geom.positions(street_ids, pos))
 
         return (vehicle_scatter,)
 
@@ -121,21 +145,16 @@ def main():
         nonlocal current_route_line  # Wir ändern den im äußeren Scope
 
         idx = sel.index  # Index in der aktuellen Scatter-Reihenfolge
-        veh_id = vehicle_ids[idx] if idx < len(vehicle_ids) else None
+        veh_id = int(frame_ids[idx]) if idx < len(frame_ids) else None
+        info = vehicle_index.info(veh_id) if veh_id is not None else None
 
-        # Passendes Vehicle-Objekt holen
-        v_obj = None
-        for v in sim.vehicles:
-            if v.vehicle_id == veh_id:
-                v_obj = v
-                break
-
-        if v_obj is None:
+        if info is None:
             sel.annotation.set_text("Unbekanntes Fahrzeug")
             return
+        speed, route_streets = info
 
         # Tooltip-Text: ID, Geschwindigkeit, ggf. Ampelstatus etc.
-        txt = f"Fahrzeug-ID: {v_obj.vehicle_id}\nSpeed: {v_obj.speed:.2f} m/s"
+        txt = f"Fahrzeug-ID: {veh_id}\nSpeed: {speed:.2f} m/s"
         sel.annotation.set_text(txt)
 
         # (Optional) Route-Linie einzeichnen
@@ -144,16 +163,11 @@ def main():
             current_route_line.remove()
             current_route_line = None
 
-        # Sammle alle Koordinaten auf der Route
-        route_xs = []
-        route_ys = []
-        for st_id in v_obj.route_streets:
-            st_obj = sim.streets[st_id]
-            route_xs += [p[0] for p in st_obj.coords]
-            route_ys += [p[1] for p in st_obj.coords]
-
         # Zeichne Route als blaue Linie
-        (current_route_line,) = ax.plot(route_xs, route_ys, color="blue", linewidth=2)
+        route_xy = geom.route_xy(route_streets)
+        (current_route_line,) = ax.plot(
+            route_xy[:, 0], route_xy[:, 1], color="blue", linewidth=2
+        )
 
     @cursor.connect("remove")
     def on_remove(sel):
@@ -171,5 +185,58 @@ def main():
     plt.show()
 
 
+def replay(recording_dir: str):
+    """
+    Spielt eine Aufzeichnung (siehe simulation/recorder.py) ab, ohne zu
+    simulieren. Der Schieberegler springt direkt zu einem beliebigen Tick.
+    """
+    reader = TrajectoryReader(recording_dir)
+    if not len(reader):
+        print(f"[replay] Aufzeichnung {recording_dir} ist leer")
+        return
+    _, streets = reader.load_network()
+    geom = StreetGeometry(streets)
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    fig.subplots_adjust(bottom=0.15)
+    ax.set_xlabel("x-Koordinate (Proj.)")
+    ax.set_ylabel("y-Koordinate (Proj.)")
+    ax.add_collection(LineCollection(geom.segments(), colors="gray", linewidths=1))
+    xmin, xmax, ymin, ymax = geom.bounds(margin=100)
+    ax.set_xlim(xmin, xmax)
+    ax.set_ylim(ymin, ymax)
+    vehicle_scatter = ax.scatter([], [], c="red", s=20, label="Fahrzeuge")
+    ax.legend()
+
+    slider_ax = fig.add_axes([0.15, 0.04, 0.7, 0.03])
+    slider = Slider(slider_ax, "Tick", 0, len(reader) - 1, valinit=0, valstep=1)
+
+    def show(i: int):
+        state = reader.tick(i)
+        vehicle_scatter.set_offsets(geom.positions(state["street"], state["position_s"]))
+        ax.set_title(f"Replay t={state['time']:.1f}s ({len(state['vid'])} Fahrzeuge)")
+        fig.canvas.draw_idle()
+
+    slider.on_changed(lambda val: show(int(val)))
+
+    def update(frame):
+        # Abspielen = Schieberegler weiterstellen (ruft show auf)
+        slider.set_val((int(slider.val) + 1) % len(reader))
+        return (vehicle_scatter,)
+
+    show(0)
+    ani = animation.FuncAnimation(fig, update, interval=50, cache_frame_data=False)
+
+    plt.show()
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Verkehrs-Dashboard")
+    parser.add_argument(
+        "--replay", metavar="DIR", help="Aufzeichnung abspielen statt simulieren"
+    )
+    args = parser.parse_args()
+    if args.replay:
+        replay(args.replay)
+    else:
+        main()
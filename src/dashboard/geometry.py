@@ -0,0 +1,90 @@
+import numpy as np
+
+from typing import Dict, List, Tuple
+
+from ..simulation.street import Street
+
+
+class StreetGeometry:
+    """
+    Vorberechnete Geometrie aller Streets für schnelles Zeichnen.
+
+    Alle Polylinien liegen hintereinander in einem Array (xy), dazu je Punkt
+    die kumulierte Bogenlänge. Die Bogenlängen sind über alle Streets
+    fortlaufend (Street r beginnt bei base[r]), so dass für beliebig viele
+    Fahrzeuge mit einem einzigen searchsorted das passende Segment gefunden
+    und linear interpoliert werden kann.
+    """
+
+    def __init__(self, streets: Dict[int, Street]):
+        st_list = list(streets.values())
+        self.street_ids = np.array([st.id for st in st_list], dtype=np.int64)
+        # Street-ID -> Zeile (dicht, IDs sind kleine Ganzzahlen)
+        self.row_of = np.full(
+            int(self.street_ids.max(initial=-1)) + 1, -1, dtype=np.int64
+        )
+        self.row_of[self.street_ids] = np.arange(len(st_list))
+
+        counts = np.array([st.num_points for st in st_list], dtype=np.int64)
+        self.offsets = np.zeros(len(st_list) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(counts)
+        self.xy = (
+            np.concatenate([np.frombuffer(st.xy, dtype=np.float64) for st in st_list])
+            if st_list
+            else np.zeros(0, dtype=np.float64)
+        ).reshape(-1, 2)
+
+        # Segmentlängen; das erste "Segment" jeder Street hat Länge 0
+        seg = np.zeros(len(self.xy), dtype=np.float64)
+        if len(self.xy) > 1:
+            seg[1:] = np.hypot(*(self.xy[1:] - self.xy[:-1]).T)
+        seg[self.offsets[:-1]] = 0.0
+        cum = np.cumsum(seg)
+        # Bogenlänge innerhalb der Street und Gesamtlänge je Street
+        self.base = cum[self.offsets[:-1]] if st_list else np.zeros(0)
+        self.length = cum[self.offsets[1:] - 1] - self.base if st_list else np.zeros(0)
+        self.cum = cum
+
+    def positions(self, street_ids: np.ndarray, s: np.ndarray) -> np.ndarray:
+        """
+        (x, y) für alle Fahrzeuge auf einmal: Street-IDs und Positionen s
+        (Meter ab Street-Anfang), wie LineString.interpolate(s) je Fahrzeug.
+        """
+        if len(street_ids) == 0:
+            return np.zeros((0, 2), dtype=np.float64)
+        rows = self.row_of[street_ids]
+        s = np.clip(s, 0.0, self.length[rows])
+        arc = self.base[rows] + s
+        # Segmentende k: erster Punkt mit cum >= arc, innerhalb der Street
+        k = np.searchsorted(self.cum, arc, side="left")
+        k = np.clip(k, self.offsets[rows] + 1, self.offsets[rows + 1] - 1)
+        c0 = self.cum[k - 1]
+        seg = self.cum[k] - c0
+        t = np.divide(arc - c0, seg, out=np.zeros_like(arc), where=seg > 0)
+        p0 = self.xy[k - 1]
+        return p0 + (self.xy[k] - p0) * t[:, None]
+
+    def segments(self) -> List[np.ndarray]:
+        """Polylinien aller Streets (für eine LineCollection)."""
+        return np.split(self.xy, self.offsets[1:-1])
+
+    def route_xy(self, route_streets: List[int]) -> np.ndarray:
+        """Aneinandergehängte Polylinien einer Route."""
+        if not route_streets:
+            return np.zeros((0, 2), dtype=np.float64)
+        rows = self.row_of[np.asarray(route_streets, dtype=np.int64)]
+        return np.concatenate(
+            [self.xy[self.offsets[r] : self.offsets[r + 1]] for r in rows]
+        )
+
+    def bounds(self, margin: float = 0.0) -> Tuple[float, float, float, float]:
+        """(xmin, xmax, ymin, ymax) über alle Streets."""
+        xmin, ymin = self.xy.min(axis=0)
+        xmax, ymax = self.xy.max(axis=0)
+        return xmin - margin, xmax + margin, ymin - margin, ymax + margin
+
+
+def vehicle_arrays(sim) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(vehicle_ids, street_ids, position_s) aller Fahrzeuge als Arrays."""
+    cols = sim.vehicle_columns()
+    return cols["vid"], cols["street"], cols["position_s"]
@@ -0,0 +1,579 @@
+"""
+Live-Server: streamt den Zustand eines laufenden Simulators an beliebig
+viele Zuschauer (asyncio, WebSocket + HTTP, ohne Zusatzpakete).
+
+Aufruf aus dem Repo-Wurzelverzeichnis:
+    python -m src.dashboard.server --grid 30 --vehicles 3000
+    python -m src.dashboard.server --network data/berlin.osm --port 8765
+
+HTTP (GET):
+    /network   Geometrie als Binärblock (siehe network_blob)
+    /stats     JSON mit Tick, Fahrzeugen, Clients, verworfenen Frames und
+               ungültigen Nachrichten je Client
+    /ws        WebSocket (Upgrade), Frames wie unten
+
+Frames (binär, little endian):
+    Kopf  FRAME_HEADER: Typ (FRAME_KEY/FRAME_DELTA), Version, Flags, Tick,
+          Simulationszeit, n Fahrzeuge, m entfernte, k Ampeln
+    vid   uint32[n]  geänderte oder neue Fahrzeuge
+    state uint64[n]  street_id << 32 | pos << 16 | lane << 8 | speed
+                     (pos = Anteil der Street-Länge * 65535,
+                      speed in SPEED_STEP m/s)
+    gone  uint32[m]  entfernte bzw. nicht mehr sichtbare Fahrzeuge
+    light uint32[k]  Controller-Index, dann phase uint8[k]
+
+Ein Delta bezieht sich immer auf den Stand, den der Client zuletzt
+tatsächlich bekommen hat. Kommt ein Client nicht hinterher, werden Ticks
+für ihn übersprungen (der nächste Frame enthält alle Änderungen seitdem);
+die Simulation wartet nie auf Clients. FRAME_KEY heißt: Client-Zustand
+vorher leeren (erster Frame einer Verbindung).
+
+Client -> Server (Text, JSON):
+    {"viewport": [xmin, ymin, xmax, ymax]}  nur Streets in diesem Rechteck
+    {"streets": [id, ...]}                  nur diese Streets
+    {"viewport": null}                      wieder alles
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import time
+
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from ..simulation import Simulator
+from .geometry import StreetGeometry
+
+FRAME_KEY = 1
+FRAME_DELTA = 2
+PROTOCOL_VERSION = 1
+
+# Typ, Version, Flags, Tick, Zeit, n Fahrzeuge, m entfernte, k Ampeln
+FRAME_HEADER = struct.Struct("<BBHIdIII")
+
+# Quantisierung: Position als Anteil der Street-Länge, Tempo in 0.25 m/s
+POS_SCALE = 65535
+SPEED_STEP = 0.25
+
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_BINARY = 0x2
+WS_TEXT = 0x1
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+MAX_MESSAGE = 1 << 16
+
+
+class Snapshot:
+    """
+    Quantisierter Zustand nach einem Tick (nach vid sortiert). Gefilterte
+    Sichten und fertig kodierte Frames werden hier je Tick zwischengespeichert,
+    damit Clients mit gleichem Stand denselben Frame teilen.
+    """
+
+    __slots__ = ("tick", "time", "vid", "state", "phase", "views", "frames")
+
+    def __init__(self, tick: int, time: float, vid, state, phase):
+        self.tick = tick
+        self.time = time
+        self.vid = vid
+        self.state = state
+        self.phase = phase
+        self.views: Dict[object, Tuple[np.ndarray, np.ndarray]] = {}
+        self.frames: Dict[Tuple[int, object, object], bytes] = {}
+
+
+class Viewport:
+    """Sichtbare Streets und Ampeln eines Clients (None = alles)."""
+
+    __slots__ = ("key", "streets", "lights")
+
+    def __init__(self, key, streets: Optional[np.ndarray], lights: Optional[np.ndarray]):
+        self.key = key
+        self.streets = streets
+        self.lights = lights
+
+
+ALL = Viewport(None, None, None)
+
+
+def encode_frame(kind: int, tick: int, t: float, vid, state, gone, light_idx, phase) -> bytes:
+    return b"".join(
+        (
+            FRAME_HEADER.pack(
+                kind, PROTOCOL_VERSION, 0, tick, t, len(vid), len(gone), len(light_idx)
+            ),
+            np.ascontiguousarray(vid, dtype="<u4").tobytes(),
+            np.ascontiguousarray(state, dtype="<u8").tobytes(),
+            np.ascontiguousarray(gone, dtype="<u4").tobytes(),
+            np.ascontiguousarray(light_idx, dtype="<u4").tobytes(),
+            np.ascontiguousarray(phase, dtype="u1").tobytes(),
+        )
+    )
+
+
+class FrameDecoder:
+    """
+    Gegenstück für Python-Clients: wendet Frames auf einen lokalen Zustand
+    an (vid -> (street_id, pos, lane, speed) quantisiert, Ampel -> Phase).
+    """
+
+    def __init__(self):
+        self.tick = -1
+        self.time = 0.0
+        self.vehicles: Dict[int, Tuple[int, int, int, int]] = {}
+        self.lights: Dict[int, int] = {}
+
+    def apply(self, frame: bytes):
+        kind, _, _, tick, t, n, m, k = FRAME_HEADER.unpack_from(frame)
+        off = FRAME_HEADER.size
+        vid = np.frombuffer(frame, "<u4", n, off)
+        off += 4 * n
+        state = np.frombuffer(frame, "<u8", n, off)
+        off += 8 * n
+        gone = np.frombuffer(frame, "<u4", m, off)
+        off += 4 * m
+        light_idx = np.frombuffer(frame, "<u4", k, off)
+        off += 4 * k
+        phase = np.frombuffer(frame, "u1", k, off)
+        if kind == FRAME_KEY:
+            self.vehicles.clear()
+            self.lights.clear()
+        for v in gone.tolist():
+            self.vehicles.pop(v, None)
+        for v, s in zip(vid.tolist(), state.tolist()):
+            self.vehicles[v] = (s >> 32, (s >> 16) & 0xFFFF, (s >> 8) & 0xFF, s & 0xFF)
+        self.lights.update(zip(light_idx.tolist(), phase.tolist()))
+        self.tick = tick
+        self.time = t
+
+
+class Client:
+    """Verbindung eines Zuschauers; Stand = zuletzt gesendete Sicht."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.viewport = ALL
+        self.base: Optional[Snapshot] = None
+        self.base_view = ALL
+        self.sent = 0
+        self.dropped = 0
+        self.invalid = 0  # verworfene (ungültige) Nachrichten
+        self.wakeup = asyncio.Event()
+
+
+class LiveServer:
+    """
+    asyncio-Server um Simulator.step: rechnet alle `interval` Sekunden einen
+    Tick (im Thread-Pool, damit die Verbindungen weiterlaufen) und
+    benachrichtigt die Clients. Jeder Client hat einen eigenen Sende-Task,
+    der immer den neuesten Tick als Delta zu seinem letzten Stand schickt;
+    Ticks, die während eines langsamen Sendevorgangs anfallen, werden für
+    diesen Client zusammengefasst (verworfene Frames).
+    """
+
+    def __init__(
+        self,
+        sim: Simulator,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        dt: float = 1.0,
+        interval: float = 0.1,
+        max_buffer: int = 1 << 20,
+    ):
+        self.sim = sim
+        self.host = host
+        self.port = port
+        self.dt = dt
+        self.interval = interval
+        self.max_buffer = max_buffer
+
+        self.geom = StreetGeometry(sim.streets)
+        max_id = int(self.geom.street_ids.max(initial=-1)) + 1
+        self.street_length = np.ones(max_id, dtype=np.float64)
+        for st in sim.streets.values():
+            self.street_length[st.id] = max(st.length, 1e-9)
+        # Bounding-Box je Street (Zeile wie in geom)
+        if len(self.geom.xy):
+            starts = self.geom.offsets[:-1]
+            self.street_min = np.minimum.reduceat(self.geom.xy, starts)
+            self.street_max = np.maximum.reduceat(self.geom.xy, starts)
+        else:
+            self.street_min = self.street_max = np.zeros((0, 2))
+
+        self.clients: List[Client] = []
+        self.snapshot: Optional[Snapshot] = None
+        self._viewports: Dict[object, Viewport] = {None: ALL}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.tick_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Zustand
+    # ------------------------------------------------------------------
+    def take_snapshot(self) -> Snapshot:
+        cols = self.sim.vehicle_columns()
+        order = np.argsort(cols["vid"], kind="stable")
+        street = cols["street"][order]
+        frac = np.clip(cols["position_s"][order] / self.street_length[street], 0.0, 1.0)
+        pos = np.rint(frac * POS_SCALE).astype(np.uint64)
+        lane = np.clip(cols["lane"][order], 0, 255).astype(np.uint64)
+        speed = np.clip(np.rint(cols["speed"][order] / SPEED_STEP), 0, 255).astype(np.uint64)
+        state = (street.astype(np.uint64) << 32) | (pos << 16) | (lane << 8) | speed
+        return Snapshot(
+            self.sim.ticks,
+            self.sim.time,
+            cols["vid"][order].astype(np.uint32),
+            state,
+            self.sim.light_scheduler.phase.copy(),
+        )
+
+    def viewport(self, msg: dict) -> Viewport:
+        """Viewport aus einer Client-Nachricht (gleiche Anfragen teilen sich eine)."""
+        if msg.get("streets") is not None:
+            key = ("streets", tuple(sorted(int(s) for s in msg["streets"])))
+            visible = np.isin(self.geom.street_ids, np.array(key[1], dtype=np.int64))
+        elif msg.get("viewport") is not None:
+            xmin, ymin, xmax, ymax = (float(c) for c in msg["viewport"])
+            key = ("box", xmin, ymin, xmax, ymax)
+            visible = (
+                (self.street_max[:, 0] >= xmin)
+                & (self.street_min[:, 0] <= xmax)
+                & (self.street_max[:, 1] >= ymin)
+                & (self.street_min[:, 1] <= ymax)
+            )
+        else:
+            return ALL
+        vp = self._viewports.get(key)
+        if vp is not None:
+            return vp
+        streets = np.zeros(len(self.street_length), dtype=bool)
+        streets[self.geom.street_ids[visible]] = True
+        controllers = self.sim.light_scheduler.controllers
+        lights = np.array(
+            [any(streets[st] for st, _ in tl.spurs if st < len(streets)) for tl in controllers],
+            dtype=bool,
+        )
+        vp = self._viewports[key] = Viewport(key, streets, lights)
+        return vp
+
+    def _view(self, snap: Snapshot, vp: Viewport) -> Tuple[np.ndarray, np.ndarray]:
+        view = snap.views.get(vp.key)
+        if view is None:
+            if vp.streets is None:
+                view = (snap.vid, snap.state)
+            else:
+                keep = vp.streets[(snap.state >> np.uint64(32)).astype(np.int64)]
+                view = (snap.vid[keep], snap.state[keep])
+            snap.views[vp.key] = view
+        return view
+
+    def frame(self, client: Client, snap: Snapshot) -> bytes:
+        """Delta von client.base (in dessen Sicht) zu snap in client.viewport."""
+        base, base_vp, vp = client.base, client.base_view, client.viewport
+        cache_key = (base.tick if base is not None else -1, base_vp.key, vp.key)
+        data = snap.frames.get(cache_key)
+        if data is not None:
+            return data
+
+        vid, state = self._view(snap, vp)
+        phase = snap.phase
+        lights = np.ones(len(phase), dtype=bool) if vp.lights is None else vp.lights
+        if base is None:
+            kind = FRAME_KEY
+            changed = np.ones(len(vid), dtype=bool)
+            gone = np.zeros(0, dtype=np.uint32)
+            send_light = lights
+        else:
+            kind = FRAME_DELTA
+            old_vid, old_state = self._view(base, base_vp)
+            idx = np.searchsorted(old_vid, vid)
+            idx[idx >= len(old_vid)] = 0
+            found = (old_vid[idx] == vid) if len(old_vid) else np.zeros(len(vid), bool)
+            changed = ~found | (old_state[idx] != state) if len(old_vid) else ~found
+            gone = old_vid[~np.isin(old_vid, vid, assume_unique=True)]
+            old_lights = (
+                np.ones(len(phase), dtype=bool) if base_vp.lights is None else base_vp.lights
+            )
+            send_light = lights & (~old_lights | (base.phase != phase))
+        light_idx = np.flatnonzero(send_light)
+        data = encode_frame(
+            kind,
+            snap.tick,
+            snap.time,
+            vid[changed],
+            state[changed],
+            gone,
+            light_idx,
+            phase[light_idx],
+        )
+        snap.frames[cache_key] = data
+        return data
+
+    # ------------------------------------------------------------------
+    # Simulation
+    # ------------------------------------------------------------------
+    def _tick(self) -> Snapshot:
+        t = time.perf_counter()
+        self.sim.step(self.dt)
+        snap = self.take_snapshot()
+        self.tick_seconds = time.perf_counter() - t
+        return snap
+
+    async def _simulate(self, steps: Optional[int]):
+        loop = asyncio.get_running_loop()
+        n = 0
+        while steps is None or n < steps:
+            start = loop.time()
+            self.snapshot = await loop.run_in_executor(None, self._tick)
+            for client in self.clients:
+                if client.wakeup.is_set():
+                    # Vorheriger Tick noch nicht gesendet: wird übersprungen
+                    client.dropped += 1
+                client.wakeup.set()
+            n += 1
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - start)))
+
+    def stats(self) -> dict:
+        snap = self.snapshot
+        return {
+            "tick": self.sim.ticks,
+            "time": self.sim.time,
+            "vehicles": len(snap.vid) if snap is not None else 0,
+            "tick_ms": self.tick_seconds * 1e3,
+            "clients": [
+                {
+                    "viewport": c.viewport.key,
+                    "sent": c.sent,
+                    "dropped": c.dropped,
+                    "invalid": c.invalid,
+                    "buffered": c.writer.transport.get_write_buffer_size(),
+                }
+                for c in self.clients
+            ],
+        }
+
+    def network_blob(self) -> bytes:
+        """
+        Geometrie für Clients: uint32 n_streets, n_points, n_lights, dann
+        street_id uint32[n], offsets uint32[n+1], length float32[n],
+        xy float32[n_points, 2], Ampel-Position float32[n_lights, 2]
+        (Index = Controller-Index in den Frames).
+        """
+        geom = self.geom
+        controllers = self.sim.light_scheduler.controllers
+        light_xy = np.zeros((len(controllers), 2), dtype=np.float32)
+        for inter in self.sim.intersections.values():
+            tl = inter.traffic_lights
+            if tl is not None and 0 <= tl._index < len(controllers):
+                light_xy[tl._index] = (inter.x_coord, inter.y_coord)
+        return b"".join(
+            (
+                struct.pack("<III", len(geom.street_ids), len(geom.xy), len(controllers)),
+                geom.street_ids.astype("<u4").tobytes(),
+                geom.offsets.astype("<u4").tobytes(),
+                geom.length.astype("<f4").tobytes(),
+                geom.xy.astype("<f4").tobytes(),
+                light_xy.astype("<f4").tobytes(),
+            )
+        )
+
+    # ------------------------------------------------------------------
+    # Verbindungen
+    # ------------------------------------------------------------------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        path = parts[1] if len(parts) > 1 else "/"
+
+        if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+            await self._websocket(reader, writer, headers)
+            return
+        if path == "/network":
+            self._http(writer, 200, "application/octet-stream", self.network_blob())
+        elif path == "/stats":
+            body = json.dumps(self.stats()).encode("utf-8")
+            self._http(writer, 200, "application/json", body)
+        else:
+            self._http(writer, 404, "text/plain", b"not found")
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    @staticmethod
+    def _http(writer, status: int, ctype: str, body: bytes):
+        reason = {200: "OK", 404: "Not Found"}.get(status, "")
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(body)}\r\nAccess-Control-Allow-Origin: *\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            + body
+        )
+
+    async def _websocket(self, reader, writer, headers: Dict[str, str]):
+        key = headers.get("sec-websocket-key", "").encode("latin-1")
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest()).decode("ascii")
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode("latin-1")
+        )
+        writer.transport.set_write_buffer_limits(high=self.max_buffer)
+        client = Client(writer)
+        self.clients.append(client)
+        if self.snapshot is not None:
+            client.wakeup.set()
+        sender = asyncio.create_task(self._send_loop(client))
+        try:
+            await self._receive_loop(reader, client)
+        except asyncio.CancelledError:
+            # Server wird beendet
+            pass
+        finally:
+            sender.cancel()
+            self.clients.remove(client)
+            writer.close()
+
+    async def _send_loop(self, client: Client):
+        writer = client.writer
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                snap = self.snapshot
+                writer.write(ws_frame(WS_BINARY, self.frame(client, snap)))
+                client.base = snap
+                client.base_view = client.viewport
+                client.sent += 1
+                # Langsamer Client: hier warten, währenddessen laufen Ticks weiter
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    async def _receive_loop(self, reader: asyncio.StreamReader, client: Client):
+        buf = b""
+        while True:
+            try:
+                b0, b1 = await reader.readexactly(2)
+                n = b1 & 0x7F
+                if n == 126:
+                    (n,) = struct.unpack("!H", await reader.readexactly(2))
+                elif n == 127:
+                    (n,) = struct.unpack("!Q", await reader.readexactly(8))
+                if n > MAX_MESSAGE:
+                    return
+                mask = await reader.readexactly(4) if b1 & 0x80 else b"\0\0\0\0"
+                payload = bytearray(await reader.readexactly(n))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            for i in range(n):
+                payload[i] ^= mask[i & 3]
+            opcode = b0 & 0x0F
+            if opcode == WS_CLOSE:
+                client.writer.write(ws_frame(WS_CLOSE, bytes(payload[:2])))
+                return
+            if opcode == WS_PING:
+                client.writer.write(ws_frame(WS_PONG, bytes(payload)))
+                continue
+            if opcode in (WS_TEXT, 0x0):
+                buf += payload
+                if not b0 & 0x80 or len(buf) > MAX_MESSAGE:
+                    continue
+                try:
+                    client.viewport = self.viewport(json.loads(buf.decode("utf-8")))
+                except (ValueError, TypeError, KeyError, AttributeError):
+                    # Nicht loggen: jeder Zuschauer kann beliebig viele schicken
+                    client.invalid += 1
+                buf = b""
+                if self.snapshot is not None:
+                    client.wakeup.set()
+
+    async def serve(self, steps: Optional[int] = None):
+        """Startet den Server und simuliert `steps` Ticks (None = endlos)."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        if self.port == 0:
+            self.port = self._server.sockets[0].getsockname()[1]
+        print(f"[LiveServer] http://{self.host}:{self.port}/ (WebSocket: /ws)")
+        try:
+            await self._simulate(steps)
+        finally:
+            self._server.close()
+            for client in list(self.clients):
+                client.writer.close()
+            await self._server.wait_closed()
+
+    def run(self, steps: Optional[int] = None):
+        asyncio.run(self.serve(steps))
+
+
+def ws_frame(opcode: int, payload: bytes) -> bytes:
+    """Unmaskierter WebSocket-Frame (Server -> Client)."""
+    n = len(payload)
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return head + payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live-Server für die Simulation")
+    parser.add_argument("--network", help="lokale Netzdatei oder Cache-Verzeichnis")
+    parser.add_argument("--grid", type=int, help="synthetisches N x N-Gitter")
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--engine", default="objects", choices=("objects", "vectorized"))
+    parser.add_argument("--dt", type=float, default=1.0)
+    parser.add_argument("--interval", type=float, default=0.1, help="Sekunden je Tick")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.grid:
+        from ..simulation.synthetic import grid_network
+
+        intersections, streets = grid_network(args.grid, args.grid, seed=args.seed)
+        sim = Simulator.from_network(
+            intersections, streets, engine=args.engine, seed=args.seed
+        )
+    else:
+        sim = Simulator(
+            "Berlin, Germany",
+            dist_m=500,
+            network_file=args.network,
+            engine=args.engine,
+            seed=args.seed,
+        )
+    sim.spawn_vehicles(args.vehicles)
+    server = LiveServer(
+        sim, host=args.host, port=args.port, dt=args.dt, interval=args.interval
+    )
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+import mmap
+import multiprocessing
+
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from ..simulation import Simulator
+from ..simulation.TrafficLight import PHASE_CYCLE, TrafficLightController
+from ..simulation.intersection import Intersection
+from ..simulation.street import Street
+
+# Unterhalb dieser Geschwindigkeit (m/s) gilt ein Fahrzeug als wartend
+STOP_SPEED = 0.1
+
+# Anteil fertiger Fahrzeuge, die je Env nachgespawnt werden (wie Simulator.step)
+RESPAWN_RATE = 0.7
+
+# Beobachtungen je (Env, Controller) und ihr dtype
+OBSERVATIONS = (
+    ("queue", np.float32),  # wartende Fahrzeuge auf Ampel-Spuren (Ende des Intervalls)
+    ("wait", np.float32),  # Wartezeit im letzten Intervall (Fahrzeug-Sekunden)
+    ("phase", np.int8),  # aktuelle Phase (PHASE_*)
+    ("time_in_phase", np.float32),  # Sekunden seit dem letzten Phasenwechsel
+)
+
+
+def replicate_network(
+    intersections: Dict[str, Intersection], streets: Dict[int, Street], copies: int
+) -> Tuple[Dict[str, Intersection], Dict[int, Street], int]:
+    """
+    `copies` unverbundene Kopien eines Netzes in einem: Knoten-IDs werden
+    zu "<k>/<id>", Street-IDs zu k * stride + id. Kopie k liegt in den
+    Dicts als k-ter Block in der Originalreihenfolge, ihre Ampeln sind im
+    Scheduler also die Controller k * C ... (k + 1) * C - 1.
+    Liefert (intersections, streets, stride).
+    """
+    stride = max(streets, default=-1) + 1
+    inter_out: Dict[str, Intersection] = {}
+    streets_out: Dict[int, Street] = {}
+    for k in range(copies):
+        base = k * stride
+        for nid, inter in intersections.items():
+            copy = Intersection(f"{k}/{nid}", x=inter.x_coord, y=inter.y_coord)
+            tl = inter.traffic_lights
+            if tl is not None:
+                copy.set_traffic_lights(
+                    TrafficLightController(
+                        [(base + st, ln) for st, ln in tl.spurs], tl.durations, tl.offset
+                    )
+                )
+            inter_out[copy.id] = copy
+        for st_id, st in streets.items():
+            streets_out[base + st_id] = Street(
+                st_id=base + st_id,
+                start_node=f"{k}/{st.start_node}",
+                end_node=f"{k}/{st.end_node}",
+                coords=st.xy,
+                speed_limit=st.speed_limit,
+                lane_dirs=st.lane_dirs,
+                length=st.length,
+            )
+    return inter_out, streets_out, stride
+
+
+def _allocate(
+    num_envs: int, num_ctrl: int, shared: bool
+) -> Dict[str, np.ndarray]:
+    """
+    Alle Beobachtungs-, Belohnungs- und Aktions-Arrays in einem Block;
+    mit shared=True in anonymem Shared Memory (für per fork gestartete Worker).
+    """
+    specs = [(name, dtype, (num_envs, num_ctrl)) for name, dtype in OBSERVATIONS]
+    specs += [
+        ("reward", np.float32, (num_envs,)),
+        ("done", np.bool_, (num_envs,)),
+        ("action", np.int8, (num_envs, num_ctrl)),
+    ]
+    offsets = []
+    size = 0
+    for _, dtype, shape in specs:
+        size = -(-size // 64) * 64
+        offsets.append(size)
+        size += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    buf = mmap.mmap(-1, max(size, 1)) if shared else bytearray(max(size, 1))
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buf, offset=off)
+        for (name, dtype, shape), off in zip(specs, offsets)
+    }
+
+
+class SignalEnvSlice:
+    """
+    Die Envs [start, stop) eines Prozesses, gemeinsam in EINEM Simulator:
+    das Netz wird je Env einmal kopiert (replicate_network), ein step
+    rechnet damit alle Envs zusammen. Liest Aktionen aus und schreibt
+    Beobachtungen direkt in die gemeinsamen Arrays.
+
+    Nachgespawnt wird je Env (Start und Ziel in derselben Kopie), daher
+    ist respawn_rate des Simulators 0.
+    """
+
+    def __init__(
+        self,
+        intersections: Dict[str, Intersection],
+        streets: Dict[int, Street],
+        start: int,
+        stop: int,
+        arrays: Dict[str, np.ndarray],
+        vehicles: int,
+        ticks_per_action: int,
+        dt: float,
+        episode_steps: int,
+        seed: int,
+        sim_kwargs: dict,
+    ):
+        self.start = start
+        self.stop = stop
+        self.n = stop - start
+        self.arrays = arrays
+        self.vehicles = vehicles
+        self.ticks_per_action = ticks_per_action
+        self.dt = dt
+        self.episode_steps = episode_steps
+        self.seed = seed
+        self.episode = 0
+        self.steps = 0
+
+        inter_n, streets_n, self.stride = replicate_network(
+            intersections, streets, self.n
+        )
+        self.base = Simulator.from_network(inter_n, streets_n, seed=seed, **sim_kwargs)
+        self.base.respawn_rate = 0.0
+        self.base.spawn_processes = 1
+        self.sim: Optional[Simulator] = None
+        self.rng = np.random.default_rng(seed)
+
+        # Randknoten je Env (Spawn innerhalb der eigenen Kopie)
+        self.spawn_nodes: List[List[str]] = [[] for _ in range(self.n)]
+        for nid in self.base.spawn_nodes:
+            self.spawn_nodes[int(nid.split("/", 1)[0])].append(nid)
+
+        sched = self.base.light_scheduler
+        self.num_ctrl = len(sched) // self.n if self.n else 0
+        self.since = np.zeros(len(sched), dtype=np.float64)
+        self.queue = np.zeros(len(sched), dtype=np.float64)
+        self.counts = np.zeros(self.n, dtype=np.int64)
+
+        # Wartende zählen: Engine über Street-Zeilen, Objekte über Spur-Schlüssel
+        engine = self.base.engine
+        if engine is not None:
+            sched_index = np.array(
+                [tl._index for tl in engine.controllers] + [-1], dtype=np.int64
+            )
+            self._row_ctrl = sched_index[engine.st_end_ctrl]
+            self._row_env = engine.street_ids // self.stride
+        self._lane_ctrl: Dict[Tuple[int, int], int] = {
+            key: c for c, tl in enumerate(sched.controllers) for key in tl.spurs
+        }
+
+    def _rows(self, name: str) -> np.ndarray:
+        return self.arrays[name][self.start : self.stop]
+
+    def _count(self):
+        """Wartende je Controller (self.queue) und Fahrzeuge je Env (self.counts)."""
+        sim = self.sim
+        engine = sim.engine
+        if engine is not None:
+            n = engine.size
+            street = engine.street[:n]
+            lane_idx = engine.lane_offsets[street] + engine.lane[:n]
+            ctrl = self._row_ctrl[street]
+            m = (engine.speed[:n] < STOP_SPEED) & engine.lane_has_light[lane_idx] & (ctrl >= 0)
+            self.queue[:] = np.bincount(ctrl[m], minlength=len(self.queue))
+            self.counts[:] = np.bincount(self._row_env[street], minlength=self.n)
+            return
+        queue = [0] * len(self.queue)
+        counts = [0] * self.n
+        lane_ctrl = self._lane_ctrl
+        stride = self.stride
+        for v in sim.vehicles:
+            st_id = v.current_street.id
+            counts[st_id // stride] += 1
+            if v.speed < STOP_SPEED:
+                c = lane_ctrl.get((st_id, v.lane_index))
+                if c is not None:
+                    queue[c] += 1
+        self.queue[:] = queue
+        self.counts[:] = counts
+
+    def _spawn(self, env: int, n: int) -> int:
+        sim = self.sim
+        all_nodes = sim.spawn_nodes
+        sim.spawn_nodes = self.spawn_nodes[env]
+        try:
+            return sim.spawn_vehicles(n)
+        finally:
+            sim.spawn_nodes = all_nodes
+
+    def _observe(self):
+        sched = self.sim.light_scheduler
+        shape = (self.n, self.num_ctrl)
+        self._rows("queue")[:] = self.queue.reshape(shape)
+        self._rows("phase")[:] = sched.phase.reshape(shape)
+        self._rows("time_in_phase")[:] = (self.sim.time - self.since).reshape(shape)
+
+    def reset(self):
+        seq = np.random.SeedSequence([self.seed, self.start, self.episode])
+        state = seq.generate_state(2)
+        sim = self.sim = self.base.fork()
+        sim.rng.seed(int(state[0]))
+        self.rng = np.random.default_rng(int(state[1]))
+        for env in range(self.n):
+            self._spawn(env, self.vehicles)
+        self.steps = 0
+        self.since[:] = sim.light_scheduler.phase_start
+        self._count()
+        self._rows("wait")[:] = 0.0
+        self._rows("reward")[:] = 0.0
+        self._rows("done")[:] = False
+        self._observe()
+
+    def step(self):
+        sim = self.sim
+        sched = sim.light_scheduler
+        act = self._rows("action").reshape(-1)
+        interval = self.ticks_per_action * self.dt
+
+        # Gewünschte Phase setzen; eine gehaltene Phase, die im Intervall
+        # ablaufen würde, wird neu gestartet (-1 = fester Zeitplan)
+        force = (act >= 0) & (
+            (sched.phase != act) | (sched.next_change <= sim.time + interval)
+        )
+        last_phase = sched.phase.copy()
+        if force.any():
+            cs = np.flatnonzero(force)
+            sched.force_phases(cs, act[cs])
+            self.since[sched.phase != last_phase] = sim.time
+            last_phase[:] = sched.phase
+
+        wait = np.zeros(len(self.queue), dtype=np.float64)
+        for _ in range(self.ticks_per_action):
+            before = self.counts.copy()
+            sim.step(self.dt)
+            self._count()
+            wait += self.queue * self.dt
+            switched = sched.phase != last_phase
+            self.since[switched] = sim.time
+            last_phase[:] = sched.phase
+            # Fertige Fahrzeuge je Env anteilig nachspawnen
+            respawn = self.rng.binomial(np.maximum(before - self.counts, 0), RESPAWN_RATE)
+            for env in np.flatnonzero(respawn).tolist():
+                self.counts[env] += self._spawn(env, int(respawn[env]))
+
+        wait = wait.reshape(self.n, self.num_ctrl)
+        self._rows("wait")[:] = wait
+        self._rows("reward")[:] = -wait.sum(axis=1)
+        self.steps += 1
+        if self.steps >= self.episode_steps:
+            # Alle Envs haben gleich lange Episoden: gemeinsamer Reset,
+            # die Beobachtung gehört schon zur neuen Episode
+            self.episode += 1
+            reward = self._rows("reward").copy()
+            self.reset()
+            self._rows("reward")[:] = reward
+            self._rows("done")[:] = True
+        else:
+            self._rows("done")[:] = False
+            self._observe()
+
+
+def _worker_main(conn, args: tuple):
+    envs = SignalEnvSlice(*args)
+    conn.send(True)
+    while True:
+        cmd = conn.recv()
+        if cmd == "step":
+            envs.step()
+        elif cmd == "reset":
+            envs.reset()
+        elif cmd == "stop":
+            conn.close()
+            return
+        conn.send(True)
+
+
+class VecSignalEnv:
+    """
+    Gebündelte Umgebung für adaptive Ampelsteuerung: num_envs Kopien
+    desselben Netzes, je Prozess in einem gemeinsamen Simulator (ein Tick
+    rechnet alle Envs des Prozesses), optional verteilt auf `processes`
+    per fork gestartete Worker.
+
+    Beobachtungen liegen in vorab angelegten Arrays der Form
+    (num_envs, num_controllers) (siehe OBSERVATIONS), Controller in der
+    Reihenfolge des TrafficLightScheduler (controller_nodes). step() nimmt
+    je Env und Controller die gewünschte Phase (PHASE_*; -1 = fester
+    Zeitplan) und rechnet ticks_per_action Ticks; reward = -Wartezeit
+    aller Ampel-Spuren im Intervall. Alle Episoden dauern episode_steps
+    Aktionen und werden gemeinsam automatisch zurückgesetzt (done = True,
+    obs gehört schon zur neuen Episode).
+
+    Die zurückgegebenen Arrays werden beim nächsten step überschrieben;
+    wer sie aufheben will, muss kopieren.
+    """
+
+    def __init__(
+        self,
+        intersections: Dict[str, Intersection],
+        streets: Dict[int, Street],
+        num_envs: int,
+        processes: int = 1,
+        vehicles: int = 200,
+        ticks_per_action: int = 5,
+        dt: float = 1.0,
+        episode_steps: int = 360,
+        seed: int = 0,
+        **sim_kwargs,
+    ):
+        processes = max(1, min(processes, num_envs))
+        if processes > 1 and "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("Mehrere Prozesse benötigen fork-Prozesse")
+        self.num_envs = num_envs
+        self.processes = processes
+
+        lights = [nid for nid, inter in intersections.items() if inter.traffic_lights]
+        self.controller_nodes = lights
+        self.num_controllers = len(lights)
+        self.arrays = _allocate(num_envs, self.num_controllers, processes > 1)
+        self.arrays["action"][:] = -1
+        self.observations = {name: self.arrays[name] for name, _ in OBSERVATIONS}
+
+        bounds = np.linspace(0, num_envs, processes + 1).astype(int).tolist()
+        slices = [
+            (
+                intersections,
+                streets,
+                bounds[k],
+                bounds[k + 1],
+                self.arrays,
+                vehicles,
+                ticks_per_action,
+                dt,
+                episode_steps,
+                seed,
+                sim_kwargs,
+            )
+            for k in range(processes)
+        ]
+        self._local: Optional[SignalEnvSlice] = None
+        self._conns = []
+        self._procs = []
+        if processes == 1:
+            self._local = SignalEnvSlice(*slices[0])
+            return
+        ctx = multiprocessing.get_context("fork")
+        for args in slices:
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker_main, args=(child, args), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        for conn in self._conns:
+            conn.recv()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _broadcast(self, cmd: str):
+        if self._local is not None:
+            getattr(self._local, cmd)()
+            return
+        for conn in self._conns:
+            conn.send(cmd)
+        for conn in self._conns:
+            conn.recv()
+
+    def reset(self) -> Dict[str, np.ndarray]:
+        self._broadcast("reset")
+        return self.observations
+
+    def step(
+        self, actions: np.ndarray
+    ) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray, dict]:
+        actions = np.asarray(actions)
+        valid = (actions == -1) | np.isin(actions, PHASE_CYCLE)
+        if not valid.all():
+            raise ValueError(f"Ungültige Phase(n) in actions: {np.unique(actions[~valid])}")
+        self.arrays["action"][:] = actions
+        self._broadcast("step")
+        return self.observations, self.arrays["reward"], self.arrays["done"], {}
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send("stop")
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._conns = []
+        self._procs = []
@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 
 # Ampelphasen
 PHASE_GREEN = 0
@@ -14,43 +14,102 @@ PHASE_DURATIONS = {
     PHASE_REDYELLOW: 2.0,
 }
 
+# Reihenfolge im Umlauf (ein Controller startet mit Rot)
+PHASE_CYCLE = (PHASE_RED, PHASE_REDYELLOW, PHASE_GREEN, PHASE_YELLOW)
+
 
 class TrafficLightPhase:
+    __slots__ = ("phase", "time_in_phase")
+
     def __init__(self, phase=PHASE_RED, time_in_phase=0.0):
         self.phase = phase
         self.time_in_phase = time_in_phase
 
 
 class TrafficLightController:
-    def __init__(self, incoming_spurs: List[Tuple[int, int]]):
-        self.lights: Dict[Tuple[int, int], TrafficLightPhase] = {}
-        for sp in incoming_spurs:
-            self.lights[sp] = TrafficLightPhase(phase=PHASE_RED, time_in_phase=0.0)
+    """
+    Ampel einer Kreuzung. Alle eingehenden Spuren (street_id, lane_index)
+    folgen derselben globalen Phase.
+
+    Standalone zählt update(dt) die Phase selbst weiter. Ist der Controller
+    an einen TrafficLightScheduler angehängt (siehe light_scheduler.py),
+    wird die Phase dort aus der Simulationszeit berechnet und update() ist
+    wirkungslos.
+    """
+
+    __slots__ = (
+        "spurs",
+        "durations",
+        "offset",
+        "_global_phase",
+        "_time_in_global_phase",
+        "_scheduler",
+        "_index",
+    )
+
+    def __init__(
+        self,
+        incoming_spurs: Iterable[Tuple[int, int]],
+        durations: Optional[Dict[int, float]] = None,
+        offset: float = 0.0,
+    ):
+        self.spurs = frozenset(incoming_spurs)
+        # Zeitplan: Dauer je Phase und Versatz des Umlaufs (Sekunden)
+        self.durations = durations if durations is not None else PHASE_DURATIONS
+        self.offset = offset
+
+        self._global_phase = PHASE_RED
+        self._time_in_global_phase = 0.0
 
-        self.global_phase = PHASE_RED
-        self.time_in_global_phase = 0.0
+        self._scheduler = None
+        self._index = -1
+
+    def _attach(self, scheduler, index: int):
+        self._scheduler = scheduler
+        self._index = index
+
+    @property
+    def global_phase(self) -> int:
+        if self._scheduler is not None:
+            return int(self._scheduler.phase[self._index])
+        return self._global_phase
+
+    @property
+    def time_in_global_phase(self) -> float:
+        if self._scheduler is not None:
+            return self._scheduler.time_in_phase(self._index)
+        return self._time_in_global_phase
+
+    @property
+    def lights(self) -> Dict[Tuple[int, int], TrafficLightPhase]:
+        """
+        Zustand je Spur (nur zur Ansicht; alle Spuren spiegeln global_phase).
+        """
+        phase = self.global_phase
+        t = self.time_in_global_phase
+        return {sp: TrafficLightPhase(phase, t) for sp in self.spurs}
 
     def update(self, dt: float):
-        self.time_in_global_phase += dt
-        duration = PHASE_DURATIONS[self.global_phase]
-
-        if self.time_in_global_phase >= duration:
-            self.time_in_global_phase = 0.0
-            if self.global_phase == PHASE_GREEN:
-                self.global_phase = PHASE_YELLOW
-            elif self.global_phase == PHASE_YELLOW:
-                self.global_phase = PHASE_RED
-            elif self.global_phase == PHASE_RED:
-                self.global_phase = PHASE_REDYELLOW
-            elif self.global_phase == PHASE_REDYELLOW:
-                self.global_phase = PHASE_GREEN
-
-        for sp, tl in self.lights.items():
-            tl.phase = self.global_phase
-            tl.time_in_phase = self.time_in_global_phase
+        if self._scheduler is not None:
+            return
+        self._time_in_global_phase += dt
+        duration = self.durations[self._global_phase]
+
+        if self._time_in_global_phase >= duration:
+            self._time_in_global_phase = 0.0
+            if self._global_phase == PHASE_GREEN:
+                self._global_phase = PHASE_YELLOW
+            elif self._global_phase == PHASE_YELLOW:
+                self._global_phase = PHASE_RED
+            elif self._global_phase == PHASE_RED:
+                self._global_phase = PHASE_REDYELLOW
+            elif self._global_phase == PHASE_REDYELLOW:
+                self._global_phase = PHASE_GREEN
 
     def is_green_or_yellow(self, street_id: int, lane_index: int) -> bool:
-        tl = self.lights.get((street_id, lane_index))
-        if not tl:
+        if (street_id, lane_index) not in self.spurs:
             return True
-        return tl.phase == PHASE_GREEN or tl.phase == PHASE_YELLOW
+        if self._scheduler is not None:
+            return bool(self._scheduler.green[self._index])
+        phase = self._global_phase
+        return phase == PHASE_GREEN or phase == PHASE_YELLOW
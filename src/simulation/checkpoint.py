@@ -0,0 +1,300 @@
+import os
+
+import numpy as np
+
+from typing import Dict, List
+
+from .TrafficLight import PHASE_CYCLE, PHASE_DURATIONS
+from .contraction import ContractionHierarchy
+from .lane_index import LaneOccupancy
+from .light_scheduler import TrafficLightScheduler
+from .metrics import FIELDS
+from .vectorized import PROFILE_NAMES
+from .vehicle import Vehicle
+
+# Version des Checkpoint-Formats; bei Änderungen am Layout hochzählen
+CHECKPOINT_FORMAT_VERSION = 1
+
+# Fahrzeugspalten im Checkpoint (Routen als Offsets + flache Street-Liste)
+VEHICLE_COLUMNS = (
+    "vid",  # (V,) int64
+    "profile",  # (V,) int8   Index in PROFILE_NAMES
+    "street",  # (V,) int64   aktuelle Street-ID
+    "lane",  # (V,) int32
+    "position_s",  # (V,) float64
+    "speed",  # (V,) float64
+    "base_limit",  # (V,) float64
+    "route_index",  # (V,) int32
+    "route_offsets",  # (V+1,) int64
+    "route_streets",  # (R,) int64
+)
+
+
+def _vehicle_columns(vehicles: List[Vehicle]) -> Dict[str, np.ndarray]:
+    n = len(vehicles)
+    lens = [len(v.route_streets) for v in vehicles]
+    route_offsets = np.zeros(n + 1, dtype=np.int64)
+    route_offsets[1:] = np.cumsum(lens)
+    profile_index = {name: i for i, name in enumerate(PROFILE_NAMES)}
+    return {
+        "vid": np.array([v.vehicle_id for v in vehicles], dtype=np.int64),
+        "profile": np.array([profile_index[v.profile] for v in vehicles], dtype=np.int8),
+        "street": np.array([v.current_street_id() for v in vehicles], dtype=np.int64),
+        "lane": np.array([v.lane_index for v in vehicles], dtype=np.int32),
+        "position_s": np.array([v.position_s for v in vehicles], dtype=np.float64),
+        "speed": np.array([v.speed for v in vehicles], dtype=np.float64),
+        "base_limit": np.array([v.base_speed_limit for v in vehicles], dtype=np.float64),
+        "route_index": np.array([v.route_index for v in vehicles], dtype=np.int32),
+        "route_offsets": route_offsets,
+        "route_streets": np.fromiter(
+            (s for v in vehicles for s in v.route_streets),
+            dtype=np.int64,
+            count=int(route_offsets[-1]),
+        ),
+    }
+
+
+# Mesoskopische Warteschlangen (nur mit Simulator.enable_meso)
+MESO_COLUMNS = (
+    "meso_streets",  # (M,) int64   mesoskopische Street-IDs
+    "meso_street",  # (Q,) int64   Street je Eintrag, FIFO-Reihenfolge
+    "meso_vid",  # (Q,) int64
+    "meso_profile",  # (Q,) int8   Index in PROFILE_NAMES
+    "meso_lane",  # (Q,) int32
+    "meso_route_index",  # (Q,) int32
+    "meso_entered",  # (Q,) float64
+    "meso_ready",  # (Q,) float64
+    "meso_route_offsets",  # (Q+1,) int64
+    "meso_route_streets",  # (R,) int64
+    "meso_credit",  # (S,) float64 je Street-Zeile
+    "meso_head_ready",  # (S,) float64
+)
+
+# Laufende Kennzahlen (nur mit Umrouten, aus ihnen entstehen die nächsten
+# Staufaktoren): Fenster-Ring je Feld als (H, S) float64, dazu
+METRICS_COLUMNS = tuple(f"metrics_{f}" for f in FIELDS) + (
+    "metrics_window",  # () float64   Fensterlänge
+    "metrics_window_time",  # (H,) float64
+    "metrics_trip_sketch",  # (H, B) int64
+    "metrics_trips",  # (H,) int64
+    "metrics_tt_sketch",  # (S, B) int32
+    "metrics_enter_time",  # (V,) float64 je Fahrzeug-ID
+    "metrics_spawn_time",  # (V,) float64
+    "metrics_clock",  # (3,) float64 now, laufendes Fenster, erstes ungeschriebenes
+)
+
+# Routen-Cache (nur mit Umrouten): Knoten-Indizes im CSRGraph, Routen
+# als Offsets + flache Street-Liste, in LRU-Reihenfolge
+CACHE_COLUMNS = (
+    "cache_start",  # (C,) int64
+    "cache_goal",  # (C,) int64
+    "cache_offsets",  # (C+1,) int64
+    "cache_streets",  # (R,) int64
+)
+
+
+def _cache_columns(router) -> Dict[str, np.ndarray]:
+    items = list(router.cache._data.items()) if router.cache is not None else []
+    index = router.graph.node_index
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(route) for _, route in items])
+    return {
+        "cache_start": np.array([index[s] for (s, _), _ in items], dtype=np.int64),
+        "cache_goal": np.array([index[g] for (_, g), _ in items], dtype=np.int64),
+        "cache_offsets": offsets,
+        "cache_streets": np.fromiter(
+            (st for _, route in items for st in route),
+            dtype=np.int64,
+            count=int(offsets[-1]),
+        ),
+    }
+
+
+def _restore_cache(router, cols: Dict[str, np.ndarray]):
+    cache = router.cache
+    if cache is None:
+        return
+    cache.clear()
+    node_ids = router.graph.node_ids
+    offsets = cols["cache_offsets"].tolist()
+    streets = cols["cache_streets"].tolist()
+    pairs = zip(cols["cache_start"].tolist(), cols["cache_goal"].tolist())
+    for i, (s, g) in enumerate(pairs):
+        route = tuple(streets[offsets[i] : offsets[i + 1]])
+        cache.put((node_ids[s], node_ids[g]), route)
+
+
+def _vehicles_from_columns(cols: Dict[str, np.ndarray], sim) -> List[Vehicle]:
+    offsets = cols["route_offsets"].tolist()
+    routes = cols["route_streets"].tolist()
+    intern = sim.route_table.intern
+    vehicles = []
+    for i, (vid, prof, st_id, lane, pos, speed, base_limit, route_index) in enumerate(
+        zip(
+            cols["vid"].tolist(),
+            cols["profile"].tolist(),
+            cols["street"].tolist(),
+            cols["lane"].tolist(),
+            cols["position_s"].tolist(),
+            cols["speed"].tolist(),
+            cols["base_limit"].tolist(),
+            cols["route_index"].tolist(),
+        )
+    ):
+        v = Vehicle(
+            vehicle_id=vid,
+            profile=PROFILE_NAMES[prof],
+            current_street=sim.streets[st_id],
+            lane_index=lane,
+            route_streets=intern(routes[offsets[i] : offsets[i + 1]]),
+            streets_map=sim.streets,
+            intersections_map=sim.intersections,
+        )
+        v.position_s = pos
+        v.speed = speed
+        v.base_speed_limit = base_limit
+        v.route_index = route_index
+        v.plan_turn()
+        vehicles.append(v)
+    return vehicles
+
+
+def save_checkpoint(sim, path: str):
+    """
+    Schreibt den dynamischen Zustand von sim (Fahrzeuge, Ampel-Zeitpläne,
+    Simulationszeit, Zufallsgenerator, next_vid) als .npz. Das Netz selbst
+    wird nicht gespeichert, nur eine Kennung zur Prüfung beim Laden.
+    Mit Umrouten kommen dessen Staufaktoren, der Routen-Cache und die
+    Kennzahlen-Fenster dazu, aus denen die nächsten Faktoren berechnet
+    werden (METRICS_COLUMNS).
+    Mesoskopische Warteschlangen werden mit Ein- und Ausfahrzeiten sowie
+    Kapazitäts-Guthaben gespeichert (MESO_COLUMNS), der Lauf geht nach
+    dem Laden also genau so weiter.
+    """
+    if sim.engine is not None:
+        cols = sim.engine.export_columns()
+    else:
+        cols = _vehicle_columns(sim.vehicles)
+    if sim.meso is not None:
+        cols.update(sim.meso.export_columns())
+
+    rng_version, rng_state, rng_gauss = sim.rng.getstate()
+    controllers = sim.light_scheduler.controllers
+    durations = np.array(
+        [[tl.durations[p] for p in PHASE_CYCLE] for tl in controllers],
+        dtype=np.float64,
+    ).reshape(len(controllers), len(PHASE_CYCLE))
+
+    arrays = dict(cols)
+    arrays.update(
+        format_version=np.int64(CHECKPOINT_FORMAT_VERSION),
+        fingerprint=ContractionHierarchy.fingerprint(sim.router.graph),
+        time=np.float64(sim.time),
+        next_vid=np.int64(sim.next_vid),
+        rng_version=np.int64(rng_version),
+        rng_state=np.array(rng_state, dtype=np.int64),
+        rng_gauss=np.float64(np.nan if rng_gauss is None else rng_gauss),
+        light_durations=durations,
+        light_offset=np.array([tl.offset for tl in controllers], dtype=np.float64),
+    )
+    if sim.rerouter is not None:
+        arrays.update(
+            reroute_factor=sim.rerouter.factor,
+            reroute_reference=sim.rerouter.reference,
+            reroute_next_update=np.float64(sim.rerouter.next_update),
+            **_cache_columns(sim.router),
+            **sim.metrics.export_columns(),
+        )
+    tmp_path = path + ".tmp.npz"
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(sim, path: str):
+    """
+    Stellt einen mit save_checkpoint geschriebenen Zustand in sim wieder her.
+    sim muss auf demselben Netz laufen (Engine darf abweichen). Enthält der
+    Checkpoint Staufaktoren, routet sim danach mit denselben Kosten (mit
+    eingeschaltetem Umrouten geht es samt Kennzahlen-Fenstern genau dort
+    weiter; window muss dann übereinstimmen). Ein Checkpoint mit
+    mesoskopischen Warteschlangen braucht dieselben mesoskopischen Streets
+    (Simulator.enable_meso vor dem Laden).
+    """
+    with np.load(path) as data:
+        if int(data["format_version"]) != CHECKPOINT_FORMAT_VERSION:
+            raise ValueError(f"Checkpoint-Format nicht unterstützt: {path}")
+        if not np.allclose(
+            data["fingerprint"], ContractionHierarchy.fingerprint(sim.router.graph)
+        ):
+            raise ValueError(f"Checkpoint passt nicht zum geladenen Netz: {path}")
+        cols = {name: data[name] for name in VEHICLE_COLUMNS}
+        meso_cols = None
+        if "meso_streets" in data:
+            meso_cols = {name: data[name] for name in MESO_COLUMNS}
+        time = float(data["time"])
+        next_vid = int(data["next_vid"])
+        gauss = float(data["rng_gauss"])
+        rng_state = (
+            int(data["rng_version"]),
+            tuple(data["rng_state"].tolist()),
+            None if np.isnan(gauss) else gauss,
+        )
+        light_durations = data["light_durations"]
+        light_offset = data["light_offset"]
+        reroute = None
+        if "reroute_factor" in data:
+            reroute = (
+                data["reroute_factor"],
+                data["reroute_reference"],
+                float(data["reroute_next_update"]),
+                {name: data[name] for name in CACHE_COLUMNS},
+                {name: data[name] for name in METRICS_COLUMNS},
+            )
+
+    controllers = sim.light_scheduler.controllers
+    if len(controllers) != len(light_offset):
+        raise ValueError(f"Checkpoint passt nicht zu den Ampeln: {path}")
+    default = tuple(PHASE_DURATIONS[p] for p in PHASE_CYCLE)
+    for tl, row, offset in zip(controllers, light_durations.tolist(), light_offset):
+        if tuple(row) == default:
+            tl.durations = PHASE_DURATIONS
+        else:
+            tl.durations = dict(zip(PHASE_CYCLE, row))
+        tl.offset = float(offset)
+
+    sim.time = time
+    sim.next_vid = next_vid
+    sim.rng.setstate(rng_state)
+    sim.light_scheduler = TrafficLightScheduler(controllers, now=time)
+
+    if reroute is not None:
+        factor, reference, next_update, cache_cols, metrics_cols = reroute
+        if sim.rerouter is not None:
+            sim.rerouter.restore(factor, reference, next_update)
+            sim.metrics.import_columns(metrics_cols)
+        else:
+            # Eigener Router wie bei enable_rerouting, Forks bleiben unberührt
+            sim.close()
+            sim.router = sim.router.branch()
+            sim.router.set_street_weights(sim.router.graph.base_weights * factor)
+        _restore_cache(sim.router, cache_cols)
+
+    if sim.engine is not None:
+        sim.engine.scheduler = sim.light_scheduler
+        sim.engine.import_columns(cols)
+        sim.vehicles = []
+        sim.lane_index = LaneOccupancy()
+    else:
+        sim.vehicles = _vehicles_from_columns(cols, sim)
+        sim.lane_index = LaneOccupancy.from_vehicles(sim.vehicles)
+    if meso_cols is not None:
+        if sim.meso is None:
+            raise ValueError(
+                f"Checkpoint enthält mesoskopische Streets, erst enable_meso: {path}"
+            )
+        sim.meso.import_columns(meso_cols)
+    elif sim.meso is not None:
+        # Checkpoint ohne Warteschlangen: Fahrzeuge auf mesoskopischen
+        # Streets wechseln wie beim Einschalten (Fortschritt aus position_s)
+        sim.meso.clear()
+        sim.meso.absorb()
@@ -0,0 +1,434 @@
+import heapq
+import math
+import os
+
+import numpy as np
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .routing import CSRGraph
+
+# Dateiname der Hierarchie neben dem kompilierten Netz
+CH_FILE = "ch.npz"
+
+# Abbruch der Zeugensuche nach so vielen abgeschlossenen Knoten
+WITNESS_SETTLE_LIMIT = 200
+
+
+class ContractionHierarchy:
+    """
+    Contraction Hierarchy über einem CSRGraph.
+
+    Vorverarbeitung: Knoten werden nach "Edge Difference" der Reihe nach
+    kontrahiert; wo kein gleich kurzer Zeugenpfad existiert, entsteht eine
+    Abkürzung (Shortcut) u -> w über den kontrahierten Knoten v.
+    Anfragen laufen dann als bidirektionale Dijkstra-Suche nur "aufwärts"
+    (zu höher eingestuften Knoten) und berühren nur wenige hundert Knoten.
+
+    Jede Kante (Original oder Shortcut) liegt in einer Kantentabelle:
+    edge_street >= 0 für Original-Streets, sonst verweisen edge_c1/edge_c2
+    auf die beiden Teilkanten, über die der Pfad wieder entpackt wird.
+    """
+
+    ARRAYS = (
+        "rank",
+        "up_indptr",
+        "up_target",
+        "up_weight",
+        "up_edge",
+        "dn_indptr",
+        "dn_target",
+        "dn_weight",
+        "dn_edge",
+        "edge_street",
+        "edge_c1",
+        "edge_c2",
+    )
+
+    def __init__(self, graph: CSRGraph, arrays: Dict[str, np.ndarray]):
+        self.graph = graph
+        for name in self.ARRAYS:
+            setattr(self, name, np.asarray(arrays[name]))
+        # Listen-Kopien für die Suchschleifen
+        self._up_indptr = self.up_indptr.tolist()
+        self._up_target = self.up_target.tolist()
+        self._up_weight = self.up_weight.tolist()
+        self._up_edge = self.up_edge.tolist()
+        self._dn_indptr = self.dn_indptr.tolist()
+        self._dn_target = self.dn_target.tolist()
+        self._dn_weight = self.dn_weight.tolist()
+        self._dn_edge = self.dn_edge.tolist()
+        self._edge_street = self.edge_street.tolist()
+        self._edge_c1 = self.edge_c1.tolist()
+        self._edge_c2 = self.edge_c2.tolist()
+
+    @property
+    def num_shortcuts(self) -> int:
+        return int((self.edge_street < 0).sum())
+
+    # ------------------------------------------------------------------
+    # Vorverarbeitung
+    # ------------------------------------------------------------------
+    @classmethod
+    def build(cls, graph: CSRGraph, verbose: bool = False) -> "ContractionHierarchy":
+        n = graph.num_nodes
+        # Kantentabelle
+        e_street: List[int] = []
+        e_c1: List[int] = []
+        e_c2: List[int] = []
+
+        # Restgraph: out_edges[u][w] = (weight, edge_id), in_edges[w][u] = ...
+        out_edges: List[Dict[int, Tuple[float, int]]] = [dict() for _ in range(n)]
+        in_edges: List[Dict[int, Tuple[float, int]]] = [dict() for _ in range(n)]
+        for u in range(n):
+            for e in range(graph._indptr[u], graph._indptr[u + 1]):
+                w = graph._targets[e]
+                if w == u:
+                    continue
+                weight = graph._weights[e]
+                old = out_edges[u].get(w)
+                if old is not None and old[0] <= weight:
+                    continue  # parallele Kante, die kürzere reicht
+                eid = len(e_street)
+                e_street.append(graph._edge_street[e])
+                e_c1.append(-1)
+                e_c2.append(-1)
+                out_edges[u][w] = (weight, eid)
+                in_edges[w][u] = (weight, eid)
+
+        contracted = [False] * n
+        deleted_neighbors = [0] * n
+        rank = [0] * n
+        up: List[List[Tuple[int, float, int]]] = [[] for _ in range(n)]
+        dn: List[List[Tuple[int, float, int]]] = [[] for _ in range(n)]
+
+        def witness_dist(u: int, v: int, targets: Dict[int, float], limit: float):
+            """Distanzen von u ohne Umweg über v (begrenzte Dijkstra-Suche)."""
+            dist = {u: 0.0}
+            heap = [(0.0, u)]
+            settled = 0
+            found = 0
+            while heap and settled < WITNESS_SETTLE_LIMIT:
+                d, x = heapq.heappop(heap)
+                if d > dist[x]:
+                    continue
+                if d > limit:
+                    break
+                settled += 1
+                if x in targets:
+                    found += 1
+                    if found == len(targets):
+                        break
+                for y, (wt, _) in out_edges[x].items():
+                    if y == v:
+                        continue
+                    nd = d + wt
+                    if nd < dist.get(y, math.inf):
+                        dist[y] = nd
+                        heapq.heappush(heap, (nd, y))
+            return dist
+
+        def shortcuts_for(v: int) -> List[Tuple[int, int, float, int, int]]:
+            result = []
+            outs = out_edges[v]
+            if not outs:
+                return result
+            for u, (w_uv, e_uv) in in_edges[v].items():
+                targets = {
+                    w: w_uv + w_vw for w, (w_vw, _) in outs.items() if w != u
+                }
+                if not targets:
+                    continue
+                dist = witness_dist(u, v, targets, max(targets.values()))
+                for w, via in targets.items():
+                    if dist.get(w, math.inf) <= via:
+                        continue
+                    result.append((u, w, via, e_uv, outs[w][1]))
+            return result
+
+        def priority(v: int) -> float:
+            num_sc = len(shortcuts_for(v))
+            removed = len(in_edges[v]) + len(out_edges[v])
+            return num_sc - removed + deleted_neighbors[v]
+
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        level = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            # Lazy update: Priorität neu berechnen, ggf. zurücklegen
+            p = priority(v)
+            if heap and p > heap[0][0]:
+                heapq.heappush(heap, (p, v))
+                continue
+
+            for u, w, via, e1, e2 in shortcuts_for(v):
+                old = out_edges[u].get(w)
+                if old is not None and old[0] <= via:
+                    continue
+                eid = len(e_street)
+                e_street.append(-1)
+                e_c1.append(e1)
+                e_c2.append(e2)
+                out_edges[u][w] = (via, eid)
+                in_edges[w][u] = (via, eid)
+
+            # Verbleibende Nachbarn sind höher eingestuft
+            for w, (wt, eid) in out_edges[v].items():
+                up[v].append((w, wt, eid))
+                del in_edges[w][v]
+                deleted_neighbors[w] += 1
+            for u, (wt, eid) in in_edges[v].items():
+                dn[v].append((u, wt, eid))
+                del out_edges[u][v]
+                deleted_neighbors[u] += 1
+            out_edges[v] = {}
+            in_edges[v] = {}
+            contracted[v] = True
+            rank[v] = level
+            level += 1
+            if verbose and level % 5000 == 0:
+                print(f"[ContractionHierarchy] {level}/{n} Knoten kontrahiert")
+
+        def to_csr(lists):
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(x) for x in lists])
+            flat = [t for x in lists for t in x]
+            return (
+                indptr,
+                np.array([t[0] for t in flat], dtype=np.int64),
+                np.array([t[1] for t in flat], dtype=np.float64),
+                np.array([t[2] for t in flat], dtype=np.int64),
+            )
+
+        up_indptr, up_target, up_weight, up_edge = to_csr(up)
+        dn_indptr, dn_target, dn_weight, dn_edge = to_csr(dn)
+        arrays = {
+            "rank": np.array(rank, dtype=np.int64),
+            "up_indptr": up_indptr,
+            "up_target": up_target,
+            "up_weight": up_weight,
+            "up_edge": up_edge,
+            "dn_indptr": dn_indptr,
+            "dn_target": dn_target,
+            "dn_weight": dn_weight,
+            "dn_edge": dn_edge,
+            "edge_street": np.array(e_street, dtype=np.int64),
+            "edge_c1": np.array(e_c1, dtype=np.int64),
+            "edge_c2": np.array(e_c2, dtype=np.int64),
+        }
+        ch = cls(graph, arrays)
+        if verbose:
+            print(
+                f"[ContractionHierarchy] Fertig: {n} Knoten, "
+                f"{ch.num_shortcuts} Shortcuts"
+            )
+        return ch
+
+    # ------------------------------------------------------------------
+    # Persistenz
+    # ------------------------------------------------------------------
+    @staticmethod
+    def fingerprint(graph: CSRGraph) -> np.ndarray:
+        """
+        Kennung des Graphen, damit eine veraltete Hierarchie erkannt wird.
+        Nutzt die Basiskosten (Längen), nicht die per set_street_weights
+        geänderten.
+        """
+        return np.array(
+            [graph.num_nodes, len(graph.targets), float(graph.base_weights.sum())],
+            dtype=np.float64,
+        )
+
+    def save(self, path: str):
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        arrays["fingerprint"] = self.fingerprint(self.graph)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, graph: CSRGraph, path: str) -> Optional["ContractionHierarchy"]:
+        """Lädt eine gespeicherte Hierarchie; None, falls sie nicht zum Graph passt."""
+        with np.load(path) as data:
+            if not np.allclose(data["fingerprint"], cls.fingerprint(graph)):
+                return None
+            arrays = {name: data[name] for name in cls.ARRAYS}
+        return cls(graph, arrays)
+
+    @classmethod
+    def load_or_build(
+        cls, graph: CSRGraph, path: Optional[str], verbose: bool = True
+    ) -> "ContractionHierarchy":
+        """
+        Lädt die Hierarchie aus `path` (falls vorhanden und passend),
+        sonst wird sie gebaut und dort gespeichert.
+        """
+        if path and os.path.isfile(path):
+            ch = cls.load(graph, path)
+            if ch is not None:
+                return ch
+        if verbose:
+            print(f"[ContractionHierarchy] Baue Hierarchie für {graph.num_nodes} Knoten...")
+        ch = cls.build(graph, verbose=verbose)
+        if path:
+            ch.save(path)
+        return ch
+
+    # ------------------------------------------------------------------
+    # Anfragen
+    # ------------------------------------------------------------------
+    def _unpack(self, eid: int, out: List[int]):
+        """Hängt die Original-Streets der (Shortcut-)Kante eid an out an."""
+        stack = [eid]
+        edge_street, c1, c2 = self._edge_street, self._edge_c1, self._edge_c2
+        while stack:
+            e = stack.pop()
+            st = edge_street[e]
+            if st >= 0:
+                out.append(st)
+            else:
+                stack.append(c2[e])
+                stack.append(c1[e])
+
+    def _upward_search(self, src: int, indptr, target, weight, edge):
+        dist = {src: 0.0}
+        pred: Dict[int, Tuple[int, int]] = {}
+        heap = [(0.0, src)]
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            yield d, x, dist, pred
+            for i in range(indptr[x], indptr[x + 1]):
+                y = target[i]
+                nd = d + weight[i]
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    pred[y] = (x, edge[i])
+                    heapq.heappush(heap, (nd, y))
+
+    def query(self, s: int, t: int) -> Tuple[float, Tuple[int, ...]]:
+        """
+        Kürzester Weg von Knotenindex s nach t: (Kosten, Street-IDs).
+        Unerreichbar => (inf, ()).
+        """
+        if s == t:
+            return 0.0, ()
+        f_dist = {s: 0.0}
+        b_dist = {t: 0.0}
+        f_pred: Dict[int, Tuple[int, int]] = {}
+        b_pred: Dict[int, Tuple[int, int]] = {}
+        f_heap = [(0.0, s)]
+        b_heap = [(0.0, t)]
+        best = math.inf
+        meet = -1
+
+        up = (self._up_indptr, self._up_target, self._up_weight, self._up_edge)
+        dn = (self._dn_indptr, self._dn_target, self._dn_weight, self._dn_edge)
+        while f_heap or b_heap:
+            f_top = f_heap[0][0] if f_heap else math.inf
+            b_top = b_heap[0][0] if b_heap else math.inf
+            if min(f_top, b_top) >= best:
+                break
+            if f_top <= b_top:
+                heap, dist, pred, other, (indptr, target, weight, edge) = (
+                    f_heap,
+                    f_dist,
+                    f_pred,
+                    b_dist,
+                    up,
+                )
+            else:
+                heap, dist, pred, other, (indptr, target, weight, edge) = (
+                    b_heap,
+                    b_dist,
+                    b_pred,
+                    f_dist,
+                    dn,
+                )
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            od = other.get(x)
+            if od is not None and d + od < best:
+                best = d + od
+                meet = x
+            for i in range(indptr[x], indptr[x + 1]):
+                y = target[i]
+                nd = d + weight[i]
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    pred[y] = (x, edge[i])
+                    heapq.heappush(heap, (nd, y))
+
+        if meet < 0:
+            return math.inf, ()
+
+        # s -> meet (Vorwärtskanten), meet -> t (Rückwärtskanten)
+        f_edges = []
+        x = meet
+        while x != s:
+            x, eid = f_pred[x]
+            f_edges.append(eid)
+        f_edges.reverse()
+        b_edges = []
+        x = meet
+        while x != t:
+            x, eid = b_pred[x]
+            b_edges.append(eid)
+
+        route: List[int] = []
+        for eid in f_edges:
+            self._unpack(eid, route)
+        for eid in b_edges:
+            self._unpack(eid, route)
+        return best, tuple(route)
+
+    def route(self, s: int, t: int) -> Tuple[int, ...]:
+        return self.query(s, t)[1]
+
+    def _search_space(self, src: int, upward: bool) -> Dict[int, float]:
+        """Alle aufwärts erreichbaren Knoten mit Distanz (vollständige Suche)."""
+        if upward:
+            arrs = (self._up_indptr, self._up_target, self._up_weight, self._up_edge)
+        else:
+            arrs = (self._dn_indptr, self._dn_target, self._dn_weight, self._dn_edge)
+        dist = {}
+        for d, x, _, _ in self._upward_search(src, *arrs):
+            dist[x] = d
+        return dist
+
+    def many_to_many(
+        self, sources: Sequence[int], targets: Sequence[int]
+    ) -> np.ndarray:
+        """
+        Distanzmatrix D[i, j] = Kosten sources[i] -> targets[j] (inf falls
+        unerreichbar) mit dem Bucket-Verfahren: eine Rückwärtssuche je Ziel
+        füllt Buckets an den Knoten, eine Vorwärtssuche je Quelle liest sie.
+        """
+        buckets: Dict[int, List[Tuple[int, float]]] = {}
+        for j, t in enumerate(targets):
+            for x, d in self._search_space(t, upward=False).items():
+                buckets.setdefault(x, []).append((j, d))
+
+        result = np.full((len(sources), len(targets)), np.inf, dtype=np.float64)
+        for i, s in enumerate(sources):
+            row = result[i]
+            best = [math.inf] * len(targets)
+            for x, d in self._search_space(s, upward=True).items():
+                for j, dt in buckets.get(x, ()):
+                    if d + dt < best[j]:
+                        best[j] = d + dt
+            row[:] = best
+        return result
+
+    def one_to_many(self, source: int, targets: Sequence[int]) -> np.ndarray:
+        return self.many_to_many([source], targets)[0]
+
+    def od_matrix(self, node_ids: Sequence[str]) -> np.ndarray:
+        """OD-Matrix (Kosten) zwischen Knoten-IDs, z. B. Simulator.spawn_nodes."""
+        idx = [self.graph.node_index[nid] for nid in node_ids]
+        return self.many_to_many(idx, idx)
@@ -0,0 +1,368 @@
+import csv
+import gzip
+import heapq
+import io
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .vehicle import VEHICLE_PROFILES
+
+# Eine Fahrt: (Abfahrt in s, Start-Knoten, Ziel-Knoten, Profil oder None)
+Trip = Tuple[float, str, str, Optional[str]]
+
+# Spalten der Dateiformate (Kopfzeile erforderlich, weitere Spalten egal)
+TRIP_COLUMNS = ("depart", "origin", "destination")  # optional: profile
+OD_COLUMNS = ("begin", "end", "origin", "destination", "count")  # optional: profile
+
+
+def parse_time(text: str) -> float:
+    """Sekunden aus "123.5" oder "HH:MM[:SS]" (auch über 24 h)."""
+    text = text.strip()
+    if ":" not in text:
+        return float(text)
+    parts = [float(p) for p in text.split(":")]
+    while len(parts) < 3:
+        parts.append(0.0)
+    h, m, s = parts
+    return h * 3600.0 + m * 60.0 + s
+
+
+def open_text(path: str):
+    """Textdatei zum zeilenweisen Lesen öffnen (.gz transparent)."""
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _columns(header: List[str], required: Sequence[str], path: str) -> Dict[str, int]:
+    index = {name.strip().lower(): i for i, name in enumerate(header)}
+    missing = [c for c in required if c not in index]
+    if missing:
+        raise ValueError(f"{path}: Spalten fehlen: {', '.join(missing)}")
+    return index
+
+
+def read_trips(path: str) -> Iterator[Trip]:
+    """
+    Liest eine Fahrtenliste (CSV: depart, origin, destination[, profile])
+    zeilenweise. Die Datei muss nach depart sortiert sein (sonst
+    ValueError; unsortierte Dateien mit sort_trips vorbereiten).
+    """
+    with open_text(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        col = _columns(header, TRIP_COLUMNS, path)
+        i_dep, i_org, i_dst = col["depart"], col["origin"], col["destination"]
+        i_prof = col.get("profile")
+        last = -np.inf
+        for line, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            depart = parse_time(row[i_dep])
+            if depart < last:
+                raise ValueError(
+                    f"{path}:{line}: Fahrten nicht nach depart sortiert "
+                    f"({depart} nach {last}), siehe sort_trips"
+                )
+            last = depart
+            profile = (row[i_prof].strip() or None) if i_prof is not None else None
+            yield depart, row[i_org].strip(), row[i_dst].strip(), profile
+
+
+def read_od_matrix(path: str, rng: random.Random) -> Iterator[Trip]:
+    """
+    Liest OD-Matrizen je Zeitscheibe (CSV: begin, end, origin,
+    destination, count[, profile]) zeilenweise und zieht je Zeile `count`
+    Abfahrten gleichverteilt in [begin, end) (Nachkommaanteil von count =
+    Wahrscheinlichkeit einer weiteren Fahrt). Die Zeilen müssen nach begin
+    sortiert sein; ausgegeben wird nach Abfahrt sortiert, gepuffert werden
+    nur Fahrten der Zeitscheiben, die noch nicht abgeschlossen sind.
+    """
+    heap: List[Tuple[float, int, str, str, Optional[str]]] = []
+    seq = 0
+    with open_text(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        col = _columns(header, OD_COLUMNS, path)
+        i_prof = col.get("profile")
+        last = -np.inf
+        for line, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            begin = parse_time(row[col["begin"]])
+            end = parse_time(row[col["end"]])
+            if begin < last:
+                raise ValueError(f"{path}:{line}: Zeilen nicht nach begin sortiert")
+            last = begin
+            # Alles vor begin ist vollständig: ausgeben
+            while heap and heap[0][0] < begin:
+                depart, _, o, d, p = heapq.heappop(heap)
+                yield depart, o, d, p
+            count = float(row[col["count"]])
+            n = int(count)
+            if rng.random() < count - n:
+                n += 1
+            origin = row[col["origin"]].strip()
+            dest = row[col["destination"]].strip()
+            profile = (row[i_prof].strip() or None) if i_prof is not None else None
+            for _ in range(n):
+                heapq.heappush(
+                    heap, (begin + rng.random() * (end - begin), seq, origin, dest, profile)
+                )
+                seq += 1
+    while heap:
+        depart, _, o, d, p = heapq.heappop(heap)
+        yield depart, o, d, p
+
+
+def sort_trips(path: str, out_path: str, chunk_rows: int = 1_000_000) -> int:
+    """
+    Sortiert eine Fahrtenliste nach depart mit begrenztem Speicher
+    (sortierte Blöcke in temporäre Dateien, dann k-Wege-Merge). Gibt die
+    Anzahl Fahrten zurück; eine leere Eingabe ergibt eine leere Ausgabe.
+    """
+    chunks: List[str] = []
+    total = 0
+    with tempfile.TemporaryDirectory(
+        prefix="trips_", dir=os.path.dirname(out_path) or None
+    ) as tmp_dir:
+        with open_text(path) as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                open(out_path, "w", encoding="utf-8").close()
+                return 0
+            i_dep = _columns(header, TRIP_COLUMNS, path)["depart"]
+
+            def write_chunk(rows):
+                rows.sort(key=lambda r: r[0])
+                name = os.path.join(tmp_dir, f"chunk_{len(chunks):05d}.csv")
+                with open(name, "w", encoding="utf-8", newline="") as out:
+                    csv.writer(out).writerows((d, *r) for d, r in rows)
+                chunks.append(name)
+
+            rows: List[Tuple[float, List[str]]] = []
+            for row in reader:
+                if not row:
+                    continue
+                rows.append((parse_time(row[i_dep]), row))
+                if len(rows) >= chunk_rows:
+                    total += len(rows)
+                    write_chunk(rows)
+                    rows = []
+            if rows:
+                total += len(rows)
+                write_chunk(rows)
+
+        files = [open(name, encoding="utf-8", newline="") for name in chunks]
+        try:
+            streams = [((float(r[0]), r[1:]) for r in csv.reader(fh)) for fh in files]
+            with open(out_path, "w", encoding="utf-8", newline="") as out:
+                writer = csv.writer(out)
+                writer.writerow(header)
+                for _, row in heapq.merge(*streams, key=lambda item: item[0]):
+                    writer.writerow(row)
+        finally:
+            for fh in files:
+                fh.close()
+    print(f"[sort_trips] {total} Fahrten in {len(chunks)} Blöcken sortiert -> {out_path}")
+    return total
+
+
+class _Batch:
+    """Vorbereitete Fahrten eines Zeitabschnitts (nach Abfahrt sortiert)."""
+
+    __slots__ = ("depart", "profiles", "lanes", "routes", "pos")
+
+    def __init__(self, depart, profiles, lanes, routes):
+        self.depart = np.asarray(depart, dtype=np.float64)
+        self.profiles = profiles
+        self.lanes = lanes
+        self.routes = routes
+        self.pos = 0
+
+
+class Demand:
+    """
+    Zeitabhängige Nachfrage aus Dateien statt gleichverteilter Spawns.
+
+    Die Fahrten kommen als nach Abfahrt sortierter Strom (read_trips,
+    read_od_matrix oder ein beliebiger Iterator von Trip-Tupeln) und
+    werden nie vollständig geladen. Dem Simulationstakt voraus werden
+    jeweils die Fahrten der nächsten `lookahead` Sekunden gelesen und in
+    einem Rutsch geroutet (doppelte OD-Paare einmal, über Router-Cache
+    bzw. Prozess-Pool wie spawn_vehicles), sobald weniger als die Hälfte
+    des Vorlaufs vorbereitet ist. inject() fügt je Tick alle fälligen
+    Fahrzeuge gebündelt ein. Im Speicher liegen so nur die Fahrten eines
+    Vorlaufs (plus gemeinsam genutzte Routen).
+
+    Fahrten vor `begin` (Standard: Simulationszeit beim Laden) werden
+    überlesen, ebenso Fahrten mit unbekannten Knoten oder ohne Route;
+    alle werden gezählt. Spur und fehlende Profile zieht ein eigener
+    Zufallsgenerator (seed), unabhängig von Simulator.rng.
+    """
+
+    def __init__(
+        self,
+        sim,
+        trips: Iterator[Trip],
+        lookahead: float = 300.0,
+        seed: Optional[int] = None,
+        processes: Optional[int] = None,
+        min_parallel: int = 500,
+        begin: Optional[float] = None,
+    ):
+        self.sim = sim
+        self.begin = sim.time if begin is None else begin
+        self._trips = self._from_begin(iter(trips))
+        self._next: Optional[Trip] = None
+        self.lookahead = lookahead
+        self.rng = random.Random(seed)
+        self.processes = processes
+        self.min_parallel = min_parallel
+
+        self._batches: List[_Batch] = []
+        self.prepared_until = -np.inf
+        self.exhausted = False
+
+        self.read = 0
+        self.injected = 0
+        self.skipped_past = 0
+        self.skipped_nodes = 0
+        self.skipped_routes = 0
+
+    @classmethod
+    def from_file(
+        cls, sim, path: str, kind: str = "trips", seed: Optional[int] = None, **kwargs
+    ) -> "Demand":
+        """kind = "trips" (Fahrtenliste) oder "od" (OD-Matrizen je Zeitscheibe)."""
+        if kind == "trips":
+            trips = read_trips(path)
+        elif kind == "od":
+            trips = read_od_matrix(path, random.Random(seed))
+        else:
+            raise ValueError(f"Unbekannte Nachfrage-Art: {kind}")
+        return cls(sim, trips, seed=seed, **kwargs)
+
+    def _from_begin(self, trips: Iterator[Trip]) -> Iterator[Trip]:
+        for trip in trips:
+            if trip[0] >= self.begin:
+                yield trip
+                break
+            self.skipped_past += 1
+        yield from trips
+
+    @property
+    def pending(self) -> int:
+        """Vorbereitete, noch nicht eingefügte Fahrten."""
+        return sum(len(b.depart) - b.pos for b in self._batches)
+
+    @property
+    def finished(self) -> bool:
+        return self.exhausted and not self._batches
+
+    def _read_until(self, t: float) -> List[Trip]:
+        trips = []
+        if self._next is not None:
+            if self._next[0] > t:
+                return trips
+            trips.append(self._next)
+            self._next = None
+        for trip in self._trips:
+            if trip[0] > t:
+                self._next = trip
+                return trips
+            trips.append(trip)
+        self.exhausted = True
+        return trips
+
+    def prepare(self, until: float):
+        """Liest und routet alle Fahrten mit Abfahrt <= until."""
+        if until <= self.prepared_until or (self.exhausted and self._next is None):
+            self.prepared_until = max(self.prepared_until, until)
+            return
+        trips = self._read_until(until)
+        self.prepared_until = until
+        self.read += len(trips)
+        if not trips:
+            return
+        sim = self.sim
+        known = sim.intersections
+        valid = [t for t in trips if t[1] in known and t[2] in known and t[1] != t[2]]
+        self.skipped_nodes += len(trips) - len(valid)
+
+        routes = sim._route_pairs(
+            [(t[1], t[2]) for t in valid], self.processes, self.min_parallel
+        )
+        names = list(VEHICLE_PROFILES)
+        mix = sim.profile_mix
+        weights = [mix.get(p, 0.0) for p in names] if mix else None
+        rng = self.rng
+        depart, profiles, lanes, shared = [], [], [], []
+        for (dep, _, _, prof), route_st in zip(valid, routes):
+            if not route_st:
+                self.skipped_routes += 1
+                continue
+            if prof is None:
+                prof = rng.choices(names, weights=weights)[0]
+            elif prof not in VEHICLE_PROFILES:
+                raise ValueError(f"Unbekanntes Fahrzeugprofil: {prof}")
+            depart.append(dep)
+            profiles.append(prof)
+            lanes.append(rng.randint(0, sim.streets[route_st[0]].num_lanes - 1))
+            shared.append(sim.route_table.intern(route_st))
+        if depart:
+            self._batches.append(_Batch(depart, profiles, lanes, shared))
+        if sim.profiler is not None:
+            sim.profiler.count("demand.read", len(trips))
+            sim.profiler.count("demand.prepared", len(depart))
+
+    def inject(self) -> int:
+        """
+        Fügt alle fälligen Fahrzeuge (Abfahrt <= Simulationszeit) in einem
+        Rutsch ein und bereitet bei Bedarf den nächsten Vorlauf vor. Gibt
+        die Anzahl eingefügter Fahrzeuge zurück.
+        """
+        sim = self.sim
+        now = sim.time
+        if self.prepared_until < now + self.lookahead / 2:
+            self.prepare(now + self.lookahead)
+
+        spawns = []
+        while self._batches:
+            b = self._batches[0]
+            end = int(np.searchsorted(b.depart, now, side="right"))
+            for i in range(b.pos, end):
+                spawns.append((sim.next_vid, b.profiles[i], b.lanes[i], b.routes[i]))
+                sim.next_vid += 1
+            b.pos = end
+            if end < len(b.depart):
+                break
+            self._batches.pop(0)
+        if spawns:
+            sim._insert_spawns(spawns)
+            self.injected += len(spawns)
+            if sim.profiler is not None:
+                sim.profiler.count("vehicles.spawned", len(spawns))
+        return len(spawns)
+
+    def stats(self) -> dict:
+        return {
+            "read": self.read,
+            "injected": self.injected,
+            "pending": self.pending,
+            "skipped_past": self.skipped_past,
+            "skipped_nodes": self.skipped_nodes,
+            "skipped_routes": self.skipped_routes,
+            "prepared_until": self.prepared_until,
+            "finished": self.finished,
+        }
@@ -3,6 +3,8 @@ from typing import Optional
 
 
 class Intersection:
+    __slots__ = ("id", "traffic_lights", "x_coord", "y_coord")
+
     def __init__(self, node_id, x=0.0, y=0.0):
         self.id = node_id
         self.traffic_lights: Optional[TrafficLightController] = None
@@ -0,0 +1,166 @@
+from bisect import bisect_left
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .vehicle import Vehicle
+
+LaneKey = Tuple[int, int]
+
+
+def lane_order_key(v: Vehicle) -> Tuple[float, int]:
+    """
+    Reihenfolge innerhalb einer Spur: vorderstes Fahrzeug zuerst
+    (position_s absteigend), bei gleicher Position kleinere ID zuerst.
+    """
+    return (-v.position_s, v.vehicle_id)
+
+
+class LaneOccupancy:
+    """
+    Persistente Belegung je (street_id, lane_index).
+
+    Jede Spur ist eine Liste von Fahrzeugen in lane_order_key-Reihenfolge,
+    d. h. lane[i - 1] ist der Vordermann von lane[i] und lane[-1] das
+    hinterste Fahrzeug. Die Listen werden nicht jeden Tick neu gebaut,
+    sondern nur angepasst, wenn ein Fahrzeug die Street/Spur wechselt,
+    neu eingesetzt wird oder fertig ist.
+
+    Für schlafende Fahrzeuge (Simulator(sleep_idle=True)): `idle` enthält
+    Spuren, deren Fahrzeuge alle schlafen und seitdem unverändert sind,
+    `woken` Spuren, die im nächsten Tick vollständig aktualisiert werden
+    müssen (z. B. nach einem Ampelwechsel).
+    """
+
+    def __init__(self):
+        self.lanes: Dict[LaneKey, List[Vehicle]] = {}
+        self.idle: Set[LaneKey] = set()
+        self.woken: Set[LaneKey] = set()
+
+    @classmethod
+    def from_vehicles(cls, vehicles: List[Vehicle]) -> "LaneOccupancy":
+        """Baut den Index für eine bestehende Fahrzeugliste auf (z. B. nach Restore)."""
+        index = cls()
+        lanes = index.lanes
+        for v in vehicles:
+            lanes.setdefault((v.current_street_id(), v.lane_index), []).append(v)
+        for vlist in lanes.values():
+            vlist.sort(key=lane_order_key)
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(vlist) for vlist in self.lanes.values())
+
+    def items(self) -> Iterator[Tuple[LaneKey, List[Vehicle]]]:
+        return iter(list(self.lanes.items()))
+
+    def lane(self, street_id: int, lane_index: int) -> List[Vehicle]:
+        return self.lanes.get((street_id, lane_index), [])
+
+    def rear(self, street_id: int, lane_index: int) -> Optional[Vehicle]:
+        """Hinterstes Fahrzeug der Spur (None, falls leer)."""
+        vlist = self.lanes.get((street_id, lane_index))
+        return vlist[-1] if vlist else None
+
+    def wake(self, keys: Iterable[LaneKey]):
+        """Alle Fahrzeuge dieser Spuren im nächsten Tick aktualisieren."""
+        for key in keys:
+            if key in self.lanes:
+                self.woken.add(key)
+                self.idle.discard(key)
+
+    def wake_all(self):
+        self.woken = set(self.lanes)
+        self.idle.clear()
+
+    def add(self, v: Vehicle):
+        """Fügt v an der passenden Stelle seiner aktuellen Spur ein."""
+        key = (v.current_street_id(), v.lane_index)
+        self.idle.discard(key)
+        vlist = self.lanes.get(key)
+        if vlist is None:
+            self.lanes[key] = [v]
+            return
+        k = lane_order_key(v)
+        if lane_order_key(vlist[-1]) < k:
+            vlist.append(v)  # Normalfall: Einfahrt hinten bei s = 0
+        else:
+            vlist.insert(bisect_left(vlist, k, key=lane_order_key), v)
+
+    def remove_many(self, key: LaneKey, gone: List[Vehicle]):
+        vlist = self.lanes.get(key)
+        if vlist is None:
+            return
+        self.idle.discard(key)
+        if len(gone) == 1:
+            vlist.remove(gone[0])
+        else:
+            ids = set(map(id, gone))
+            vlist[:] = [v for v in vlist if id(v) not in ids]
+        if not vlist:
+            del self.lanes[key]
+
+    def leader_of(self, v: Vehicle) -> Optional[Vehicle]:
+        """Vordermann von v in seiner Spur."""
+        vlist = self.lanes.get((v.current_street_id(), v.lane_index), [])
+        i = bisect_left(vlist, lane_order_key(v), key=lane_order_key)
+        if 0 < i < len(vlist) and vlist[i] is v:
+            return vlist[i - 1]
+        return None
+
+    def fix_order(self, key: LaneKey):
+        """
+        Stellt die Reihenfolge nach einem Überholen wieder her (Timsort ist
+        auf fast sortierten Listen linear).
+        """
+        vlist = self.lanes.get(key)
+        if vlist:
+            vlist.sort(key=lane_order_key)
+            self.idle.discard(key)
+
+    def apply_moves(
+        self, moved: List[Tuple[Vehicle, LaneKey]], dirty: List[LaneKey]
+    ) -> List[Vehicle]:
+        """
+        Übernimmt die Änderungen eines Ticks: erst Abgänge aus den alten
+        Spuren entfernen, dann Reihenfolge geänderter Spuren reparieren,
+        zuletzt Zugänge (nicht fertige Fahrzeuge) einsortieren.
+        Gibt die eingefügten Fahrzeuge zurück.
+        """
+        by_lane: Dict[LaneKey, List[Vehicle]] = {}
+        for v, old_key in moved:
+            by_lane.setdefault(old_key, []).append(v)
+        for key, gone in by_lane.items():
+            self.remove_many(key, gone)
+        for key in dirty:
+            self.fix_order(key)
+        arrivals = [v for v, _ in moved if not v.done]
+        for v in arrivals:
+            self.add(v)
+        return arrivals
+
+    def next_leader_positions(
+        self, streets, foreign_rears: Optional[Dict[LaneKey, float]] = None
+    ) -> Dict[LaneKey, float]:
+        """
+        Für das vorderste Fahrzeug jeder Spur: Position des hintersten
+        Fahrzeugs auf der nächsten Street seiner Route (in der Spur, in die es
+        einfahren würde). So sieht es Fahrzeuge auch über die Kreuzung hinweg.
+        Wird zu Tick-Beginn ausgewertet, bevor sich Positionen ändern.
+        foreign_rears ergänzt Spuren, die nicht in diesem Index liegen
+        (partitionierter Betrieb).
+        """
+        result: Dict[LaneKey, float] = {}
+        for key, vlist in self.lanes.items():
+            head = vlist[0]
+            nxt = head.next_street_id()
+            if nxt is None:
+                continue
+            ln = min(head.lane_index, streets[nxt].num_lanes - 1)
+            rear = self.rear(nxt, ln)
+            if rear is not None:
+                result[key] = rear.position_s
+            elif foreign_rears:
+                pos = foreign_rears.get((nxt, ln))
+                if pos is not None:
+                    result[key] = pos
+        return result
@@ -0,0 +1,189 @@
+import heapq
+
+import numpy as np
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .TrafficLight import (
+    PHASE_CYCLE,
+    PHASE_GREEN,
+    PHASE_YELLOW,
+    TrafficLightController,
+)
+
+# Toleranz für Phasengrenzen (aufsummierte dt-Schritte)
+TIME_EPS = 1e-9
+
+# Phase <-> Position im Umlauf als Arrays (für force_phases)
+_CYCLE_PHASES = np.array(PHASE_CYCLE, dtype=np.int8)
+_CYCLE_INDEX = np.full(max(PHASE_CYCLE) + 1, -1, dtype=np.int64)
+_CYCLE_INDEX[list(PHASE_CYCLE)] = np.arange(len(PHASE_CYCLE))
+
+
+class TrafficLightScheduler:
+    """
+    Ereignisgesteuerte Ampelsteuerung für alle Controller einer Simulation.
+
+    Pro Controller werden nur Zeitplan (plan), Versatz (offset) und der
+    aktuell gültige Zustand (phase, phase_start, green) in Arrays gehalten.
+    Die Phase ergibt sich aus der Simulationszeit:
+        tau = (t - offset) mod Umlaufdauer
+    Ein Heap enthält den nächsten Wechselzeitpunkt je Controller, sodass
+    advance(t) nur die Kreuzungen anfasst, deren Phase tatsächlich wechselt.
+    """
+
+    def __init__(self, controllers: List[TrafficLightController], now: float = 0.0):
+        self.controllers = controllers
+        n = len(controllers)
+        self.now = now
+
+        # Zeitpläne: Dauer je Phase in PHASE_CYCLE-Reihenfolge, dedupliziert
+        self.plan_durations: List[Tuple[float, ...]] = []
+        self._plan_ids: Dict[Tuple[float, ...], int] = {}
+        self._plan_bounds: List[List[float]] = []
+
+        self.plan = np.zeros(n, dtype=np.int32)
+        self.offset = np.zeros(n, dtype=np.float64)
+        self.phase = np.zeros(n, dtype=np.int8)
+        self.phase_start = np.zeros(n, dtype=np.float64)
+        self.next_change = np.zeros(n, dtype=np.float64)
+        self.green = np.zeros(n, dtype=bool)
+        self._version = [0] * n
+        self._heap: List[Tuple[float, int, int]] = []
+        # Per set_plan/force_phase geänderte Controller (für advance)
+        self._touched: List[int] = []
+
+        for c, tl in enumerate(controllers):
+            tl._attach(self, c)
+            self.plan[c] = self._plan_id(tl.durations)
+            self.offset[c] = tl.offset
+            self._recompute(c, now)
+
+    def __len__(self) -> int:
+        return len(self.controllers)
+
+    def _plan_id(self, durations: Dict[int, float]) -> int:
+        key = tuple(float(durations[p]) for p in PHASE_CYCLE)
+        pid = self._plan_ids.get(key)
+        if pid is None:
+            pid = len(self.plan_durations)
+            self.plan_durations.append(key)
+            self._plan_ids[key] = pid
+            bounds = [0.0]
+            for d in key:
+                bounds.append(bounds[-1] + d)
+            self._plan_bounds.append(bounds)
+        return pid
+
+    def _recompute(self, c: int, t: float):
+        """Phase von Controller c zur Zeit t bestimmen, nächsten Wechsel einplanen."""
+        bounds = self._plan_bounds[self.plan[c]]
+        cycle = bounds[-1]
+        tau = (t - self.offset[c] + TIME_EPS) % cycle
+        cycle_start = t - tau + TIME_EPS
+        k = 0
+        while tau >= bounds[k + 1]:
+            k += 1
+        phase = PHASE_CYCLE[k]
+        self.phase[c] = phase
+        self.green[c] = phase == PHASE_GREEN or phase == PHASE_YELLOW
+        self.phase_start[c] = cycle_start + bounds[k]
+        nxt = cycle_start + bounds[k + 1]
+        self.next_change[c] = nxt
+        self._version[c] += 1
+        heapq.heappush(self._heap, (nxt, c, self._version[c]))
+
+    def advance(self, t: float) -> List[int]:
+        """
+        Setzt die Simulationszeit auf t und aktualisiert nur Controller mit
+        fälligem Phasenwechsel. Gibt deren Indizes zurück, dazu Controller,
+        die seit dem letzten advance per set_plan/force_phase geändert wurden.
+        """
+        self.now = t
+        heap = self._heap
+        version = self._version
+        changed = self._touched
+        self._touched = []
+        while heap and heap[0][0] <= t + TIME_EPS:
+            _, c, ver = heapq.heappop(heap)
+            if ver != version[c]:
+                continue  # veralteter Eintrag (Zeitplan geändert)
+            old = self.phase[c]
+            self._recompute(c, t)
+            if self.phase[c] != old:
+                changed.append(c)
+        return changed
+
+    def time_in_phase(self, c: int) -> float:
+        return max(0.0, self.now - float(self.phase_start[c]))
+
+    def set_plan(
+        self,
+        c: int,
+        durations: Optional[Dict[int, float]] = None,
+        offset: Optional[float] = None,
+    ):
+        """Eigener Zeitplan und/oder Versatz für Controller c (ab sofort gültig)."""
+        tl = self.controllers[c]
+        if durations is not None:
+            tl.durations = durations
+            self.plan[c] = self._plan_id(durations)
+        if offset is not None:
+            tl.offset = offset
+            self.offset[c] = offset
+        self._recompute(c, self.now)
+        self._touched.append(c)
+
+    def force_phase(self, c: int, phase: int):
+        """
+        Schaltet Controller c sofort auf den Beginn von `phase`; der Umlauf
+        läuft von dort mit seinem Zeitplan weiter (Versatz wird verschoben).
+        """
+        bounds = self._plan_bounds[self.plan[c]]
+        k = PHASE_CYCLE.index(phase)
+        offset = self.now - bounds[k]
+        self.controllers[c].offset = offset
+        self.offset[c] = offset
+        self._recompute(c, self.now)
+        self._touched.append(c)
+
+    def force_phases(self, cs: Sequence[int], phases: Sequence[int]):
+        """
+        force_phase für viele Controller auf einmal (z. B. je RL-Aktion),
+        vektorisiert über die Arrays; nur der Heap wird einzeln gepflegt.
+        Jeder Controller darf höchstens einmal vorkommen.
+        """
+        cs = np.asarray(cs, dtype=np.int64)
+        if not len(cs):
+            return
+        phases = np.asarray(phases, dtype=np.int64)
+        if ((phases < 0) | (phases >= len(_CYCLE_INDEX))).any() or (
+            _CYCLE_INDEX[np.clip(phases, 0, len(_CYCLE_INDEX) - 1)] < 0
+        ).any():
+            raise ValueError(f"Unbekannte Phase in {phases.tolist()!r}")
+        k = _CYCLE_INDEX[phases]
+        bounds = np.asarray(self._plan_bounds, dtype=np.float64)[self.plan[cs]]
+        rows = np.arange(len(cs))
+        t = self.now
+        offset = t - bounds[rows, k]
+        self.offset[cs] = offset
+
+        # wie _recompute, nur über alle cs
+        tau = np.mod(t - offset + TIME_EPS, bounds[:, -1])
+        cycle_start = t - tau + TIME_EPS
+        k = (tau[:, None] >= bounds[:, 1:-1]).sum(axis=1)
+        phase = _CYCLE_PHASES[k]
+        self.phase[cs] = phase
+        self.green[cs] = (phase == PHASE_GREEN) | (phase == PHASE_YELLOW)
+        self.phase_start[cs] = cycle_start + bounds[rows, k]
+        nxt = cycle_start + bounds[rows, k + 1]
+        self.next_change[cs] = nxt
+
+        controllers = self.controllers
+        version = self._version
+        heap = self._heap
+        for c, off, when in zip(cs.tolist(), offset.tolist(), nxt.tolist()):
+            controllers[c].offset = off
+            version[c] += 1
+            heapq.heappush(heap, (when, c, version[c]))
+        self._touched.extend(cs.tolist())
@@ -0,0 +1,654 @@
+import copy
+import math
+from collections import deque
+
+import numpy as np
+
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .vehicle import VEHICLE_PROFILES, Vehicle
+
+# Platzbedarf je Fahrzeug im Stau (m); so viel Abstand braucht auch die
+# Einfahrt in eine mikroskopische Spur
+JAM_SPACING = 7.5
+# Sättigungsverkehrsstärke je Spur (Fz/s), entspricht 1800 Fz/h
+SATURATION_FLOW = 0.5
+# Untergrenze der Geschwindigkeit als Anteil der freien Geschwindigkeit
+MIN_SPEED_RATIO = 0.05
+
+# Eintrag einer Warteschlange: (vid, Profil, Spur, Route, route_index,
+# Einfahrt, frühestmögliche Ausfahrt)
+MesoEntry = Tuple[int, str, int, Sequence[int], int, float, float]
+
+
+def streets_near(
+    intersections, streets, nodes: Iterable[str], radius: float
+) -> Set[int]:
+    """
+    Street-IDs, deren Start- oder Endknoten höchstens radius Meter von
+    einem der Knoten entfernt liegt (Region mit mikroskopischem Detail).
+    """
+    nodes = list(nodes)
+    if not nodes:
+        return set()
+    ids = list(intersections)
+    xy = np.array(
+        [(intersections[n].x_coord, intersections[n].y_coord) for n in ids],
+        dtype=np.float64,
+    )
+    centers = np.array(
+        [(intersections[n].x_coord, intersections[n].y_coord) for n in nodes],
+        dtype=np.float64,
+    )
+    near = np.zeros(len(ids), dtype=bool)
+    # Blockweise, damit (Knoten x Zentren) nicht zu groß wird
+    for i in range(0, len(centers), 256):
+        c = centers[i : i + 256]
+        d2 = ((xy[:, None, :] - c[None, :, :]) ** 2).sum(axis=2)
+        near |= (d2 <= radius * radius).any(axis=1)
+    inside = {n for n, flag in zip(ids, near.tolist()) if flag}
+    return {
+        st.id for st in streets.values() if st.start_node in inside or st.end_node in inside
+    }
+
+
+class MesoModel:
+    """
+    Mesoskopisches Warteschlangenmodell für einen Teil der Streets.
+
+    Jede mesoskopische Street ist eine FIFO-Warteschlange ohne Positionen.
+    Beim Einfahren bekommt ein Fahrzeug eine Reisezeit aus der aktuellen
+    Dichte k (Greenshields):
+        v = v_frei * max(1 - k / k_stau, MIN_SPEED_RATIO),
+    v_frei = Tempolimit * speed_factor, k_stau = 1 / jam_spacing je Spur.
+    Danach wartet es an der Haltelinie. Ausfahren darf je Tick höchstens
+    die Kapazität (saturation_flow je Spur und Sekunde), und nur bei Grün
+    bzw. Gelb des TrafficLightController am Endknoten (wie im
+    Mikromodell). Das nächste Ziel muss Platz haben: eine mesoskopische
+    Street höchstens so viele Fahrzeuge wie ihr Stauraum, eine
+    mikroskopische Spur mindestens jam_spacing frei hinter dem letzten
+    Fahrzeug. Sonst staut es sich zurück.
+
+    Übergänge an der Grenze: Fahrzeuge, die im Mikromodell auf eine
+    mesoskopische Street wechseln, werden am Tick-Ende übernommen; wer eine
+    mesoskopische Street in Richtung Mikro verlässt, startet dort wie nach
+    jedem Street-Wechsel bei position_s = 0. Mikro-Fahrzeuge vor der Grenze
+    sehen als hinterstes Fahrzeug der mesoskopischen Street einen virtuellen
+    Rückstau (Länge minus belegter Stauraum je Spur), wie über
+    Simulator.foreign_rears im partitionierten Betrieb.
+    """
+
+    def __init__(
+        self,
+        sim,
+        streets: Iterable[int],
+        saturation_flow: float = SATURATION_FLOW,
+        jam_spacing: float = JAM_SPACING,
+        min_speed_ratio: float = MIN_SPEED_RATIO,
+    ):
+        self.sim = sim
+        self.saturation_flow = saturation_flow
+        self.jam_spacing = jam_spacing
+        self.min_speed_ratio = min_speed_ratio
+
+        st_list = list(sim.streets.values())
+        n = len(st_list)
+        self.street_ids = np.array([st.id for st in st_list], dtype=np.int64)
+        self.row: Dict[int, int] = {st.id: i for i, st in enumerate(st_list)}
+        self.length = np.array([st.length for st in st_list], dtype=np.float64)
+        self.lanes = np.array([st.num_lanes for st in st_list], dtype=np.int64)
+        self.speed_limit = np.array([st.speed_limit for st in st_list], dtype=np.float64)
+        self.end_exists = np.array(
+            [st.end_node in sim.intersections for st in st_list], dtype=bool
+        )
+
+        self.is_meso = np.zeros(n, dtype=bool)
+        for st_id in streets:
+            self.is_meso[self.row[st_id]] = True
+        self.meso_ids = frozenset(self.street_ids[self.is_meso].tolist())
+
+        # Stauraum (Fahrzeuge) und Kapazität (Fz/s) je Street
+        self.storage = np.maximum(self.length * self.lanes / jam_spacing, 1.0)
+        self.rate = saturation_flow * self.lanes
+
+        # Ampel am Endknoten: Index im TrafficLightScheduler oder -1
+        # (-1 bzw. ohne Ampel auf der Street => immer grün)
+        ctrl = np.full(n, -1, dtype=np.int64)
+        for i, st in enumerate(st_list):
+            inter = sim.intersections.get(st.end_node)
+            tl = inter.traffic_lights if inter is not None else None
+            if tl is not None and any((st.id, ln) in tl.spurs for ln in range(st.num_lanes)):
+                ctrl[i] = tl._index
+        self.end_ctrl = ctrl
+
+        # Mesoskopische Streets mit mikroskopischer Zufahrt: nur für diese
+        # brauchen Mikro-Fahrzeuge einen virtuellen Rückstau
+        feeds: Set[int] = set()
+        by_start: Dict[str, List[int]] = {}
+        for i, st in enumerate(st_list):
+            if self.is_meso[i]:
+                by_start.setdefault(st.start_node, []).append(i)
+        for i, st in enumerate(st_list):
+            if not self.is_meso[i]:
+                feeds.update(by_start.get(st.end_node, ()))
+        self.border_rows = np.array(sorted(feeds), dtype=np.int64)
+
+        self.queues: Dict[int, Deque[MesoEntry]] = {}
+        self.count = np.zeros(n, dtype=np.int64)
+        self.credit = np.zeros(n, dtype=np.float64)
+        self.head_ready = np.full(n, np.inf)
+        self.size = 0
+        # Virtueller Rückstau (street_id, Spur) -> Position, für die Objekt-Engine
+        self.rears: Dict[Tuple[int, int], float] = {}
+
+        self.entered = 0
+        self.to_micro = 0
+        self.finished = 0
+        self.blocked = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def branch(self, sim) -> "MesoModel":
+        """Kopie für Simulator.fork() (Warteschlangen flach kopiert)."""
+        other = copy.copy(self)
+        other.sim = sim
+        other.queues = {row: deque(q) for row, q in self.queues.items()}
+        other.count = self.count.copy()
+        other.credit = self.credit.copy()
+        other.head_ready = self.head_ready.copy()
+        other.rears = dict(self.rears)
+        return other
+
+    # ------------------------------------------------------------------
+    # Einfahrt
+    # ------------------------------------------------------------------
+    def travel_time(self, row: int, profile: str) -> float:
+        """Reisezeit bis zur Haltelinie bei der aktuellen Dichte der Street."""
+        ratio = max(1.0 - self.count[row] / self.storage[row], self.min_speed_ratio)
+        v = self.speed_limit[row] * VEHICLE_PROFILES[profile][0] * ratio
+        return float(self.length[row] / v) if v > 0 else math.inf
+
+    def _enter(
+        self,
+        vid: int,
+        profile: str,
+        lane: int,
+        route: Sequence[int],
+        route_index: int,
+        t: float,
+        progress: float = 0.0,
+    ):
+        """Hängt ein Fahrzeug an die Warteschlange seiner aktuellen Street."""
+        row = self.row[route[route_index]]
+        tt = self.travel_time(row, profile)
+        ready = t + (1.0 - progress) * tt
+        lane = min(lane, int(self.lanes[row]) - 1)
+        q = self.queues.get(row)
+        if q is None:
+            q = self.queues[row] = deque()
+        if not q:
+            self.head_ready[row] = ready
+        q.append((vid, profile, lane, route, route_index, ready - tt, ready))
+        self.count[row] += 1
+        self.size += 1
+
+    def enter(
+        self,
+        vids: Sequence[int],
+        profiles: Sequence[str],
+        lanes: Sequence[int],
+        routes: Sequence[Sequence[int]],
+        route_indices: Sequence[int],
+        t: float,
+        progress: Optional[Sequence[float]] = None,
+    ):
+        """
+        Übernimmt Fahrzeuge auf ihre aktuelle Street (route[route_index]).
+        In aufsteigender vid-Reihenfolge, damit beide Engines dieselben
+        Warteschlangen bauen. progress = bereits zurückgelegter Anteil der
+        Street (z. B. beim Einschalten), sonst 0.
+        """
+        order = sorted(range(len(vids)), key=lambda i: vids[i])
+        for i in order:
+            self._enter(
+                int(vids[i]),
+                profiles[i],
+                int(lanes[i]),
+                routes[i],
+                int(route_indices[i]),
+                t,
+                progress[i] if progress is not None else 0.0,
+            )
+        self.entered += len(order)
+
+    def take_spawns(
+        self, spawns: List[Tuple[int, str, int, Sequence[int]]], t: float
+    ) -> List[Tuple[int, str, int, Sequence[int]]]:
+        """
+        Übernimmt neue Fahrzeuge, deren Route auf einer mesoskopischen
+        Street beginnt; gibt die übrigen (mikroskopischen) zurück.
+        """
+        meso = self.meso_ids
+        mine = [sp for sp in spawns if sp[3][0] in meso]
+        if not mine:
+            return spawns
+        vids, profiles, lanes, routes = map(list, zip(*mine))
+        self.enter(vids, profiles, lanes, routes, [0] * len(mine), t)
+        return [sp for sp in spawns if sp[3][0] not in meso]
+
+    def take_arrivals(self, arrivals: List[Vehicle], t: float) -> List[Vehicle]:
+        """
+        Objekt-Engine: übernimmt Fahrzeuge, die in diesem Tick auf eine
+        mesoskopische Street gewechselt sind (entfernt sie aus der
+        Spurbelegung). Gibt die übernommenen Vehicle-Objekte zurück.
+        """
+        meso = self.meso_ids
+        handed = [v for v in arrivals if v.current_street.id in meso]
+        if handed:
+            lanes = self.sim.lane_index
+            for v in handed:
+                lanes.remove_many((v.current_street.id, v.lane_index), [v])
+            self.enter(
+                [v.vehicle_id for v in handed],
+                [v.profile for v in handed],
+                [v.lane_index for v in handed],
+                [v.route_streets for v in handed],
+                [v.route_index for v in handed],
+                t,
+            )
+        return handed
+
+    def take_from_engine(self, t: float):
+        """Vektorisierte Engine: Fahrzeuge auf mesoskopischen Streets übernehmen."""
+        engine = self.sim.engine
+        n = engine.size
+        if n == 0:
+            return
+        on_meso = self.is_meso[engine.street[:n]]
+        if not on_meso.any():
+            return
+        cols = engine.take(on_meso)
+        intern = self.sim.route_table.intern
+        self.enter(
+            cols["vid"],
+            cols["profile"],
+            cols["lane"],
+            [intern(r) for r in cols["routes"]],
+            cols["route_index"],
+            t,
+        )
+
+    def absorb(self):
+        """
+        Übernimmt alle Mikro-Fahrzeuge, die gerade auf mesoskopischen Streets
+        sind (beim Einschalten oder nach einem Checkpoint). Der zurückgelegte
+        Teil der Street zählt als Fortschritt.
+        """
+        sim = self.sim
+        t = sim.time
+        engine = sim.engine
+        if engine is not None:
+            n = engine.size
+            on_meso = self.is_meso[engine.street[:n]]
+            if on_meso.any():
+                progress = (
+                    engine.position_s[:n][on_meso] / engine.st_length[engine.street[:n][on_meso]]
+                )
+                cols = engine.take(on_meso)
+                intern = sim.route_table.intern
+                self.enter(
+                    cols["vid"],
+                    cols["profile"],
+                    cols["lane"],
+                    [intern(r) for r in cols["routes"]],
+                    cols["route_index"],
+                    t,
+                    np.minimum(progress, 1.0).tolist(),
+                )
+        else:
+            meso = self.meso_ids
+            handed = [v for v in sim.vehicles if v.current_street.id in meso]
+            if handed:
+                for v in handed:
+                    sim.lane_index.remove_many((v.current_street.id, v.lane_index), [v])
+                self.enter(
+                    [v.vehicle_id for v in handed],
+                    [v.profile for v in handed],
+                    [v.lane_index for v in handed],
+                    [v.route_streets for v in handed],
+                    [v.route_index for v in handed],
+                    t,
+                    [min(v.position_s / v.current_street.length, 1.0) for v in handed],
+                )
+                ids = set(map(id, handed))
+                sim.vehicles = [v for v in sim.vehicles if id(v) not in ids]
+        self.update_rears()
+
+    def clear(self):
+        """Leert alle Warteschlangen (z. B. vor dem Laden eines Checkpoints)."""
+        self.queues = {}
+        self.count[:] = 0
+        self.credit[:] = 0.0
+        self.head_ready[:] = np.inf
+        self.size = 0
+        self.update_rears()
+
+    # ------------------------------------------------------------------
+    # Ausfahrt
+    # ------------------------------------------------------------------
+    def step(self, dt: float, t: float) -> int:
+        """
+        Ein Tick nach dem Mikromodell: Kapazität gutschreiben und fertige
+        Fahrzeuge (Reisezeit abgelaufen) an der Spitze jeder Warteschlange
+        weitergeben. Gibt die Anzahl beendeter Fahrten zurück.
+        """
+        sim = self.sim
+        green = self.end_ctrl < 0
+        if not green.all():
+            lights = sim.light_scheduler.green
+            sel = ~green
+            green[sel] = lights[self.end_ctrl[sel]]
+        # Kapazität ansparen höchstens für einen Tick (mindestens ein Fahrzeug)
+        self.credit += np.where(green, self.rate * dt, 0.0)
+        np.minimum(self.credit, np.maximum(self.rate * dt, 1.0), out=self.credit)
+
+        active = np.flatnonzero((self.head_ready <= t + 1e-9) & (self.credit >= 1.0))
+        if not len(active):
+            self.update_rears()
+            return 0
+
+        row_of = self.row
+        street_ids = self.street_ids
+        is_meso = self.is_meso
+        lanes = self.lanes
+        count = self.count
+        storage = self.storage
+        micro_rear = None
+        # In diesem Tick schon belegte Mikro-Spuren (Einfahrt bei s = 0)
+        taken: Set[Tuple[int, int]] = set()
+
+        vids: List[int] = []
+        from_rows: List[int] = []
+        to_rows: List[int] = []
+        to_micro: List[Tuple[MesoEntry, int, int]] = []
+        blocked = 0
+        for row in active.tolist():
+            q = self.queues[row]
+            credit = self.credit[row]
+            while q and credit >= 1.0 and q[0][6] <= t + 1e-9:
+                entry = q[0]
+                vid, profile, lane, route, idx = entry[:5]
+                if idx + 1 >= len(route) or not self.end_exists[row]:
+                    nrow = -1
+                else:
+                    nrow = row_of[route[idx + 1]]
+                    if is_meso[nrow]:
+                        if count[nrow] >= storage[nrow]:
+                            blocked += 1
+                            break
+                    else:
+                        ln = min(lane, int(lanes[nrow]) - 1)
+                        key = (int(street_ids[nrow]), ln)
+                        if micro_rear is None:
+                            micro_rear = self._micro_rear_lookup()
+                        if key in taken or micro_rear(key) < self.jam_spacing:
+                            blocked += 1
+                            break
+                        taken.add(key)
+                        to_micro.append((entry, nrow, ln))
+                q.popleft()
+                count[row] -= 1
+                self.size -= 1
+                credit -= 1.0
+                vids.append(vid)
+                from_rows.append(row)
+                to_rows.append(nrow)
+                if nrow >= 0 and is_meso[nrow]:
+                    self._enter(vid, profile, lane, route, idx + 1, t)
+            self.credit[row] = credit
+            self.head_ready[row] = q[0][6] if q else np.inf
+
+        finished = sum(1 for r in to_rows if r < 0)
+        self._insert_micro(to_micro)
+        self.entered += len(vids) - finished - len(to_micro)
+        self.to_micro += len(to_micro)
+        self.finished += finished
+        self.blocked += blocked
+        if sim.metrics is not None and vids:
+            sim.metrics.on_transitions(
+                np.array(vids, dtype=np.int64),
+                np.array(from_rows, dtype=np.int64),
+                np.array(to_rows, dtype=np.int64),
+                t,
+            )
+        if sim.profiler is not None:
+            sim.profiler.count("meso.exits", len(vids))
+            sim.profiler.count("meso.to_micro", len(to_micro))
+            sim.profiler.count("meso.blocked", blocked)
+        self.update_rears()
+        return finished
+
+    def _micro_rear_lookup(self):
+        """Position des hintersten Mikro-Fahrzeugs je (street_id, Spur), inf = frei."""
+        sim = self.sim
+        engine = sim.engine
+        if engine is None:
+            lane_index = sim.lane_index
+
+            def rear(key):
+                v = lane_index.rear(*key)
+                return v.position_s if v is not None else math.inf
+
+            return rear
+
+        n = engine.size
+        pos = np.full(len(engine.lane_mask), np.inf)
+        st = engine.street[:n]
+        np.minimum.at(pos, engine.lane_offsets[st] + engine.lane[:n], engine.position_s[:n])
+        offsets = engine.lane_offsets
+        row_of = engine.street_row
+
+        def rear(key):
+            return float(pos[offsets[row_of[key[0]]] + key[1]])
+
+        return rear
+
+    def _insert_micro(self, exits: List[Tuple[MesoEntry, int, int]]):
+        """Fahrzeuge am Anfang ihrer nächsten (mikroskopischen) Street einsetzen."""
+        if not exits:
+            return
+        sim = self.sim
+        engine = sim.engine
+        for (vid, profile, _, route, idx, _, _), nrow, ln in exits:
+            st_id = int(self.street_ids[nrow])
+            if engine is not None:
+                engine.add_vehicle(vid, profile, st_id, ln, route, route_index=idx + 1)
+                continue
+            v = Vehicle(
+                vehicle_id=vid,
+                profile=profile,
+                current_street=sim.streets[st_id],
+                lane_index=ln,
+                route_streets=route,
+                streets_map=sim.streets,
+                intersections_map=sim.intersections,
+            )
+            v.route_index = idx + 1
+            v.plan_turn()
+            sim.vehicles.append(v)
+            sim.lane_index.add(v)
+
+    def update_rears(self):
+        """
+        Virtueller Rückstau der mesoskopischen Streets mit Mikro-Zufahrt:
+        Länge minus belegter Stauraum je Spur (nur belegte Streets).
+        """
+        rows = self.border_rows
+        rows = rows[self.count[rows] > 0]
+        pos = np.maximum(
+            self.length[rows] - self.count[rows] * self.jam_spacing / self.lanes[rows], 0.0
+        )
+        engine = self.sim.engine
+        if engine is not None:
+            if engine.lane_rear is None or len(engine.lane_rear) != len(engine.lane_mask):
+                engine.lane_rear = np.full(len(engine.lane_mask), np.nan)
+            else:
+                engine.lane_rear[:] = np.nan
+            nl = self.lanes[rows]
+            before = np.cumsum(nl) - nl
+            lane_rows = np.repeat(engine.lane_offsets[rows] - before, nl) + np.arange(
+                int(nl.sum())
+            )
+            engine.lane_rear[lane_rows] = np.repeat(pos, nl)
+            return
+        self.rears = {
+            (st_id, ln): p
+            for st_id, nl, p in zip(
+                self.street_ids[rows].tolist(), self.lanes[rows].tolist(), pos.tolist()
+            )
+            for ln in range(nl)
+        }
+
+    # ------------------------------------------------------------------
+    # Zustand
+    # ------------------------------------------------------------------
+    def _entries(self) -> Iterable[Tuple[int, MesoEntry]]:
+        # Nach Street-Zeile, damit die Reihenfolge nicht davon abhängt, wann
+        # eine Warteschlange angelegt wurde (z. B. nach import_columns)
+        for row in sorted(self.queues):
+            for entry in self.queues[row]:
+                yield row, entry
+
+    def columns(self, t: float) -> Dict[str, np.ndarray]:
+        """
+        Fahrzeuge wie Simulator.vehicle_columns; position_s wird aus dem
+        Fortschritt der Reisezeit interpoliert (Wartende an der Haltelinie).
+        """
+        n = self.size
+        rows = np.empty(n, dtype=np.int64)
+        vid = np.empty(n, dtype=np.int64)
+        lane = np.empty(n, dtype=np.int32)
+        entered = np.empty(n, dtype=np.float64)
+        ready = np.empty(n, dtype=np.float64)
+        for i, (row, e) in enumerate(self._entries()):
+            rows[i] = row
+            vid[i] = e[0]
+            lane[i] = e[2]
+            entered[i] = e[5]
+            ready[i] = e[6]
+        tt = ready - entered
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frac = np.clip(np.where(tt > 0, (t - entered) / tt, 1.0), 0.0, 1.0)
+            speed = np.where((t < ready) & (tt > 0), self.length[rows] / tt, 0.0)
+        return {
+            "vid": vid,
+            "street": self.street_ids[rows],
+            "lane": lane,
+            "position_s": self.length[rows] * frac,
+            "speed": speed,
+        }
+
+    def metrics_state(self, t: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Street-Zeilen, Tempo und "steht an der Haltelinie" aller Fahrzeuge
+        für StreamingMetrics.sample. Tempo je Street aus der Dichte, 0 für
+        Fahrzeuge, deren Reisezeit abgelaufen ist.
+        """
+        occupied = np.flatnonzero(self.count)
+        counts = self.count[occupied]
+        waiting = np.zeros(len(occupied), dtype=np.int64)
+        for k, row in enumerate(occupied.tolist()):
+            w = 0
+            for e in self.queues[row]:
+                if e[6] > t:
+                    break
+                w += 1
+            waiting[k] = w
+        ratio = np.maximum(1.0 - counts / self.storage[occupied], self.min_speed_ratio)
+        rows = np.repeat(occupied, counts)
+        speed = np.repeat(self.speed_limit[occupied] * ratio, counts)
+        # Wartende stehen vorne in der Schlange
+        rank = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        at_line = rank < np.repeat(waiting, counts)
+        speed[at_line] = 0.0
+        return rows, speed, at_line
+
+    def export_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Vollständiger Zustand als Spalten (z. B. für Checkpoints):
+        Warteschlangen-Einträge in FIFO-Reihenfolge, Routen als Offsets +
+        flacher Puffer, dazu credit und head_ready je Street-Zeile.
+        """
+        entries = list(self._entries())
+        n = len(entries)
+        lens = [len(e[3]) for _, e in entries]
+        route_offsets = np.zeros(n + 1, dtype=np.int64)
+        route_offsets[1:] = np.cumsum(lens)
+        profile_index = {name: i for i, name in enumerate(VEHICLE_PROFILES)}
+        rows = np.array([row for row, _ in entries], dtype=np.int64)
+        return {
+            "meso_streets": self.street_ids[self.is_meso],
+            "meso_street": self.street_ids[rows],
+            "meso_vid": np.array([e[0] for _, e in entries], dtype=np.int64),
+            "meso_profile": np.array(
+                [profile_index[e[1]] for _, e in entries], dtype=np.int8
+            ),
+            "meso_lane": np.array([e[2] for _, e in entries], dtype=np.int32),
+            "meso_route_index": np.array([e[4] for _, e in entries], dtype=np.int32),
+            "meso_entered": np.array([e[5] for _, e in entries], dtype=np.float64),
+            "meso_ready": np.array([e[6] for _, e in entries], dtype=np.float64),
+            "meso_route_offsets": route_offsets,
+            "meso_route_streets": np.fromiter(
+                (st for _, e in entries for st in e[3]),
+                dtype=np.int64,
+                count=int(route_offsets[-1]),
+            ),
+            "meso_credit": self.credit.copy(),
+            "meso_head_ready": self.head_ready.copy(),
+        }
+
+    def import_columns(self, cols: Dict[str, np.ndarray]):
+        """Ersetzt alle Warteschlangen durch den Zustand aus export_columns()."""
+        if set(cols["meso_streets"].tolist()) != self.meso_ids:
+            raise ValueError("Gespeicherte mesoskopische Streets weichen ab")
+        names = list(VEHICLE_PROFILES)
+        intern = self.sim.route_table.intern
+        offsets = cols["meso_route_offsets"].tolist()
+        streets = cols["meso_route_streets"].tolist()
+        queues: Dict[int, Deque[MesoEntry]] = {}
+        count = np.zeros(len(self.street_ids), dtype=np.int64)
+        row_of = self.row
+        for i, (st_id, vid, prof, lane, idx, entered, ready) in enumerate(
+            zip(
+                cols["meso_street"].tolist(),
+                cols["meso_vid"].tolist(),
+                cols["meso_profile"].tolist(),
+                cols["meso_lane"].tolist(),
+                cols["meso_route_index"].tolist(),
+                cols["meso_entered"].tolist(),
+                cols["meso_ready"].tolist(),
+            )
+        ):
+            row = row_of[st_id]
+            route = intern(streets[offsets[i] : offsets[i + 1]])
+            queues.setdefault(row, deque()).append(
+                (vid, names[prof], lane, route, idx, entered, ready)
+            )
+            count[row] += 1
+        self.queues = queues
+        self.count = count
+        self.size = int(count.sum())
+        self.credit = cols["meso_credit"].astype(np.float64)
+        self.head_ready = cols["meso_head_ready"].astype(np.float64)
+        self.update_rears()
+
+    def stats(self) -> dict:
+        return {
+            "streets": int(self.is_meso.sum()),
+            "vehicles": self.size,
+            "entered": self.entered,
+            "to_micro": self.to_micro,
+            "finished": self.finished,
+            "blocked": self.blocked,
+        }
@@ -0,0 +1,538 @@
+import csv
+import math
+
+import numpy as np
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .intersection import Intersection
+from .street import Street
+
+# Fahrzeuge langsamer als STOP_SPEED (m/s) zählen zur Warteschlange
+STOP_SPEED = 0.1
+
+# Reisezeit-Sketch: logarithmische Buckets zwischen TT_MIN und TT_MAX
+# Sekunden (Bucket 0 = darunter, letzter Bucket = darüber); relative
+# Auflösung ca. 8 % je Bucket
+TT_MIN = 1.0
+TT_MAX = 4 * 3600.0
+TT_BINS = 128
+_TT_LOG_STEP = math.log(TT_MAX / TT_MIN) / (TT_BINS - 2)
+
+# Summen je Fenster und Street (Zeilen von StreamingMetrics.windows)
+FIELDS = (
+    "entries",  # Einfahrten (inkl. Spawns)
+    "exits",  # Ausfahrten (inkl. Routenende)
+    "veh_seconds",  # Fahrzeuge x Zeit auf der Street
+    "distance",  # gefahrene Meter
+    "queue_seconds",  # stehende Fahrzeuge x Zeit
+    "red_seconds",  # an der Haltelinie wartende Fahrzeuge x Zeit
+    "tt_sum",  # Reisezeiten der Ausfahrten mit bekannter Einfahrt
+    "tt_count",
+    "delay_sum",  # Reisezeit minus freie Fahrzeit
+)
+
+CSV_COLUMNS = (
+    "window_start",
+    "window_end",
+    "street_id",
+    "entries",
+    "exits",
+    "flow_vph",
+    "density_vpkm",
+    "mean_speed",
+    "queue",
+    "red_wait",
+    "travel_time",
+    "delay",
+)
+
+# pyarrow erst laden, wenn wirklich Parquet geschrieben wird
+_pyarrow = None
+
+
+def import_pyarrow():
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as exc:
+            raise ImportError(
+                "Parquet-Ausgabe der Metriken benötigt pyarrow (pip install pyarrow)"
+            ) from exc
+        _pyarrow = pyarrow
+    return _pyarrow
+
+
+def tt_bucket(values: np.ndarray) -> np.ndarray:
+    """Sketch-Bucket je Reisezeit (Sekunden)."""
+    with np.errstate(divide="ignore"):
+        k = np.floor(np.log(np.maximum(values, 1e-12) / TT_MIN) / _TT_LOG_STEP) + 1
+    return np.clip(k, 0, TT_BINS - 1).astype(np.int64)
+
+
+def sketch_quantile(counts: np.ndarray, q: float) -> Optional[float]:
+    """Quantil q aus einem Bucket-Sketch (geometrische Bucket-Mitte)."""
+    cum = np.cumsum(counts)
+    total = cum[-1] if len(cum) else 0
+    if total <= 0:
+        return None
+    k = int(np.searchsorted(cum, q * total, side="left"))
+    if k == 0:
+        return TT_MIN
+    if k >= TT_BINS - 1:
+        return TT_MAX
+    return TT_MIN * math.exp((k - 0.5) * _TT_LOG_STEP)
+
+
+class StreamingMetrics:
+    """
+    Laufende Verkehrskennzahlen je Street und Kreuzung, während der
+    Simulation aktualisiert (Simulator.enable_metrics), statt hinterher aus
+    aufgezeichneten Zuständen berechnet.
+
+    Eingänge je Tick:
+      - on_spawn / on_transitions: Ereignisse (Einfahrt, Ausfahrt,
+        Routenende) mit Fahrzeug-IDs, daraus Reisezeit und Verlustzeit je
+        Street-Durchfahrt,
+      - sample: Momentaufnahme aller Fahrzeuge (Anzahl, Geschwindigkeit,
+        stehend, an der Haltelinie), gewichtet mit dt.
+
+    Alle Summen liegen in Arrays je Street, in einem Ring aus `history`
+    Zeitfenstern der Länge `window` Sekunden. Abfragen (street,
+    intersection, network) summieren nur die gewünschten Fenster einer
+    Street bzw. der Zufahrten einer Kreuzung, kosten also unabhängig von
+    der Netzgröße konstant. Reisezeit-Quantile kommen aus Sketches fester
+    Größe (logarithmische Buckets) je Street, kumulativ seit Beginn, sowie
+    fensterweise für ganze Fahrten.
+
+    Mit `path` (.csv oder .parquet) werden abgeschlossene Fenster in
+    Blöcken von `chunk_windows` Fenstern angehängt, spätestens bevor der
+    Ring sie überschreibt; close() schreibt den Rest.
+    """
+
+    def __init__(
+        self,
+        intersections: Dict[str, Intersection],
+        streets: Dict[int, Street],
+        window: float = 60.0,
+        history: int = 60,
+        path: Optional[str] = None,
+        chunk_windows: int = 10,
+        start_time: float = 0.0,
+    ):
+        if window <= 0 or history < 2:
+            raise ValueError("window muss > 0 und history >= 2 sein")
+        self.window = float(window)
+        self.history = history
+        self.path = path
+        self.chunk_windows = max(1, min(chunk_windows, history - 1))
+
+        # Street-Zeilen in der Reihenfolge von streets (wie VectorizedEngine)
+        st_list = list(streets.values())
+        self.street_ids = np.array([st.id for st in st_list], dtype=np.int64)
+        self._sorter = np.argsort(self.street_ids, kind="stable")
+        self._sorted_ids = self.street_ids[self._sorter]
+        self.length = np.array([st.length for st in st_list], dtype=np.float64)
+        self.free_flow = self.length / np.maximum(
+            np.array([st.speed_limit for st in st_list], dtype=np.float64), 0.1
+        )
+
+        # Kreuzungen: Zufahrten (Street-Zeilen) je Knoten
+        self.node_ids: List[str] = list(intersections)
+        self._node_row = {nid: i for i, nid in enumerate(self.node_ids)}
+        incoming: List[List[int]] = [[] for _ in self.node_ids]
+        for row, st in enumerate(st_list):
+            node = self._node_row.get(st.end_node)
+            if node is not None:
+                incoming[node].append(row)
+        self.incoming = [np.array(rows, dtype=np.int64) for rows in incoming]
+
+        n = len(st_list)
+        self.windows = {f: np.zeros((history, n), dtype=np.float64) for f in FIELDS}
+        self.window_time = np.zeros(history, dtype=np.float64)  # erfasste Sekunden
+        self.trip_sketch = np.zeros((history, TT_BINS), dtype=np.int64)
+        self.trips = np.zeros(history, dtype=np.int64)
+        self.tt_sketch = np.zeros((n, TT_BINS), dtype=np.int32)
+
+        # Je Fahrzeug-ID: Zeit der letzten Einfahrt und des Spawns (NaN =
+        # vor dem Einschalten gespawnt, Reisezeit unbekannt)
+        self.enter_time = np.full(1024, np.nan)
+        self.spawn_time = np.full(1024, np.nan)
+
+        self.now = start_time
+        self.current = self._window_of(start_time)
+        self._flushed = self.current  # erstes noch nicht geschriebenes Fenster
+        self._writer = None
+
+    # ------------------------------------------------------------------
+    # Fenster
+    # ------------------------------------------------------------------
+    def _window_of(self, t: float) -> int:
+        # Ein Tick, der genau auf einer Grenze endet, gehört noch zum alten Fenster
+        return max(0, math.ceil(t / self.window - 1e-9) - 1)
+
+    def _slot(self, w: int) -> int:
+        return w % self.history
+
+    def _advance(self, t: float):
+        """Setzt die Zeit auf t und beginnt ggf. neue (geleerte) Fenster."""
+        self.now = t
+        w = self._window_of(t)
+        if w <= self.current:
+            return
+        # Abgeschlossene Fenster blockweise schreiben, spätestens bevor ihr
+        # Slot für ein neues Fenster geleert wird
+        if self.path is not None and (
+            self.current + 1 - self._flushed >= self.chunk_windows
+            or w - self.history >= self._flushed
+        ):
+            self._flush_range(self._flushed, self.current + 1)
+        for k in range(max(self.current + 1, w - self.history + 1), w + 1):
+            s = self._slot(k)
+            for arr in self.windows.values():
+                arr[s] = 0.0
+            self.window_time[s] = 0.0
+            self.trip_sketch[s] = 0
+            self.trips[s] = 0
+        self.current = w
+
+    def _window_slots(self, windows: int) -> np.ndarray:
+        """Slots der letzten `windows` Fenster inkl. des laufenden."""
+        k = max(1, min(windows, self.history))
+        first = max(0, self.current - k + 1)
+        return np.array([self._slot(w) for w in range(first, self.current + 1)])
+
+    # ------------------------------------------------------------------
+    # Erfassen
+    # ------------------------------------------------------------------
+    def rows(self, street_ids: Sequence[int]) -> np.ndarray:
+        """Street-Zeilen zu Street-IDs."""
+        ids = np.asarray(street_ids, dtype=np.int64)
+        return self._sorter[np.searchsorted(self._sorted_ids, ids)]
+
+    def _ensure_vid(self, max_vid: int):
+        if max_vid < len(self.enter_time):
+            return
+        size = max(max_vid + 1, 2 * len(self.enter_time))
+        for name in ("enter_time", "spawn_time"):
+            arr = np.full(size, np.nan)
+            old = getattr(self, name)
+            arr[: len(old)] = old
+            setattr(self, name, arr)
+
+    def on_spawn(self, vids: Sequence[int], street_ids: Sequence[int], t: float):
+        """Neue Fahrzeuge (Fahrtbeginn und Einfahrt in die erste Street)."""
+        vids = np.asarray(vids, dtype=np.int64)
+        if not len(vids):
+            return
+        self._advance(max(t, self.now))
+        self._ensure_vid(int(vids.max()))
+        self.enter_time[vids] = t
+        self.spawn_time[vids] = t
+        rows = self.rows(street_ids)
+        np.add.at(self.windows["entries"][self._slot(self.current)], rows, 1)
+
+    def on_transitions(
+        self,
+        vids: np.ndarray,
+        from_rows: np.ndarray,
+        to_rows: np.ndarray,
+        t: float,
+    ):
+        """
+        Street-Wechsel des letzten Ticks: Fahrzeug vids verlässt from_rows
+        und fährt in to_rows ein (-1 = Fahrt beendet). Zeilen wie
+        street_ids.
+        """
+        if not len(vids):
+            return
+        self._advance(t)
+        self._ensure_vid(int(vids.max()))
+        s = self._slot(self.current)
+        win = self.windows
+        np.add.at(win["exits"][s], from_rows, 1)
+
+        tt = t - self.enter_time[vids]
+        known = ~np.isnan(tt)
+        if known.any():
+            rows = from_rows[known]
+            tt_k = tt[known]
+            np.add.at(win["tt_sum"][s], rows, tt_k)
+            np.add.at(win["tt_count"][s], rows, 1)
+            np.add.at(
+                win["delay_sum"][s], rows, np.maximum(tt_k - self.free_flow[rows], 0.0)
+            )
+            np.add.at(self.tt_sketch, (rows, tt_bucket(tt_k)), 1)
+
+        entering = to_rows >= 0
+        np.add.at(win["entries"][s], to_rows[entering], 1)
+        self.enter_time[vids[entering]] = t
+
+        ended = vids[~entering]
+        if len(ended):
+            trip = t - self.spawn_time[ended]
+            trip = trip[~np.isnan(trip)]
+            np.add.at(self.trip_sketch[s], tt_bucket(trip), 1)
+            self.trips[s] += len(trip)
+            self.enter_time[ended] = np.nan
+            self.spawn_time[ended] = np.nan
+
+    def sample(
+        self,
+        rows: np.ndarray,
+        speed: np.ndarray,
+        at_stop_line: np.ndarray,
+        dt: float,
+        t: float,
+    ):
+        """
+        Zustand aller Fahrzeuge nach einem Tick (Street-Zeile, Tempo, steht
+        an der Haltelinie), gilt für die vergangenen dt Sekunden.
+        """
+        self._advance(t)
+        s = self._slot(self.current)
+        n = len(self.street_ids)
+        win = self.windows
+        win["veh_seconds"][s] += np.bincount(rows, minlength=n) * dt
+        win["distance"][s] += np.bincount(rows, weights=speed, minlength=n) * dt
+        stopped = speed < STOP_SPEED
+        win["queue_seconds"][s] += np.bincount(rows[stopped], minlength=n) * dt
+        win["red_seconds"][s] += np.bincount(rows[at_stop_line], minlength=n) * dt
+        self.window_time[s] += dt
+
+    # ------------------------------------------------------------------
+    # Abfragen
+    # ------------------------------------------------------------------
+    def _kpis(self, rows, slots: np.ndarray) -> dict:
+        """Kennzahlen über die Street-Zeilen rows und die Fenster slots."""
+        win = self.windows
+        elapsed = float(self.window_time[slots].sum())
+
+        def total(field):
+            return float(win[field][np.ix_(slots, np.atleast_1d(rows))].sum())
+
+        veh_s = total("veh_seconds")
+        tt_count = total("tt_count")
+        length_km = float(np.sum(self.length[rows])) / 1000.0
+        return {
+            "elapsed": elapsed,
+            "entries": int(total("entries")),
+            "exits": int(total("exits")),
+            "flow_vph": total("exits") / elapsed * 3600.0 if elapsed else None,
+            "density_vpkm": (
+                veh_s / elapsed / length_km if elapsed and length_km else None
+            ),
+            "mean_speed": total("distance") / veh_s if veh_s else None,
+            "vehicles": veh_s / elapsed if elapsed else None,
+            "queue": total("queue_seconds") / elapsed if elapsed else None,
+            "red_wait": total("red_seconds") / elapsed if elapsed else None,
+            "travel_time": total("tt_sum") / tt_count if tt_count else None,
+            "delay": total("delay_sum") / tt_count if tt_count else None,
+        }
+
+    def street(self, street_id: int, windows: int = 1) -> dict:
+        """
+        Kennzahlen einer Street über die letzten `windows` Fenster (inkl.
+        des laufenden): flow_vph (Ausfahrten/h), density_vpkm, mean_speed
+        (Raum-Mittel, m/s), queue (mittlere Anzahl stehender Fahrzeuge),
+        red_wait (davon an der Haltelinie), travel_time und delay (Mittel je
+        Durchfahrt, s), dazu Reisezeit-Quantile seit Beginn.
+        """
+        row = int(self.rows([street_id])[0])
+        if self.street_ids[row] != street_id:
+            raise KeyError(street_id)
+        result = self._kpis(row, self._window_slots(windows))
+        sketch = self.tt_sketch[row]
+        result["travel_time_p50"] = sketch_quantile(sketch, 0.5)
+        result["travel_time_p90"] = sketch_quantile(sketch, 0.9)
+        return result
+
+    def intersection(self, node_id: str, windows: int = 1) -> dict:
+        """
+        Kennzahlen einer Kreuzung aus ihren Zufahrten: flow_vph = Fahrzeuge
+        durch die Kreuzung je Stunde, queue/red_wait = Warteschlangen aller
+        Zufahrten, delay = mittlere Verlustzeit je Zufahrt-Durchfahrt.
+        """
+        rows = self.incoming[self._node_row[node_id]]
+        result = self._kpis(rows, self._window_slots(windows))
+        sketch = self.tt_sketch[rows].sum(axis=0)
+        result["travel_time_p50"] = sketch_quantile(sketch, 0.5)
+        result["travel_time_p90"] = sketch_quantile(sketch, 0.9)
+        return result
+
+    def network(self, windows: int = 1) -> dict:
+        """Netzweite Kennzahlen samt Fahrzeit-Quantilen ganzer Fahrten."""
+        slots = self._window_slots(windows)
+        win = self.windows
+        elapsed = float(self.window_time[slots].sum())
+        veh_s = float(win["veh_seconds"][slots].sum())
+        tt_count = float(win["tt_count"][slots].sum())
+        sketch = self.trip_sketch[slots].sum(axis=0)
+        trips = int(self.trips[slots].sum())
+        return {
+            "elapsed": elapsed,
+            "vehicles": veh_s / elapsed if elapsed else None,
+            "mean_speed": float(win["distance"][slots].sum()) / veh_s if veh_s else None,
+            "queue": float(win["queue_seconds"][slots].sum()) / elapsed if elapsed else None,
+            "delay": float(win["delay_sum"][slots].sum()) / tt_count if tt_count else None,
+            "trips": trips,
+            "trips_per_hour": trips / elapsed * 3600.0 if elapsed else None,
+            "trip_time_p50": sketch_quantile(sketch, 0.5),
+            "trip_time_p90": sketch_quantile(sketch, 0.9),
+            "trip_time_p99": sketch_quantile(sketch, 0.99),
+        }
+
+    def street_travel_times(self, windows: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mittlere Reisezeit je Street-Zeile über die letzten `windows`
+        Fenster (NaN = keine Durchfahrt) und die mittlere Anzahl Fahrzeuge
+        darauf, für alle Streets auf einmal (z. B. für Routing-Kosten).
+        """
+        slots = self._window_slots(windows)
+        win = self.windows
+        count = win["tt_count"][slots].sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tt = win["tt_sum"][slots].sum(axis=0) / count
+        elapsed = float(self.window_time[slots].sum())
+        if elapsed:
+            vehicles = win["veh_seconds"][slots].sum(axis=0) / elapsed
+        else:
+            vehicles = np.zeros(len(self.street_ids))
+        return np.where(count > 0, tt, np.nan), vehicles
+
+    def travel_time_quantiles(
+        self, street_id: int, qs: Sequence[float] = (0.5, 0.9, 0.99)
+    ) -> List[Optional[float]]:
+        sketch = self.tt_sketch[int(self.rows([street_id])[0])]
+        return [sketch_quantile(sketch, q) for q in qs]
+
+    # ------------------------------------------------------------------
+    # Zustand (Checkpoints)
+    # ------------------------------------------------------------------
+    def export_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Vollständiger Zustand als Spalten (z. B. für Checkpoints): Ring der
+        Fenster-Summen samt Sketches, Einfahrt-/Spawnzeiten je Fahrzeug-ID
+        und die Fenster-Position.
+        """
+        cols = {f"metrics_{f}": arr.copy() for f, arr in self.windows.items()}
+        cols.update(
+            metrics_window=np.float64(self.window),
+            metrics_window_time=self.window_time.copy(),
+            metrics_trip_sketch=self.trip_sketch.copy(),
+            metrics_trips=self.trips.copy(),
+            metrics_tt_sketch=self.tt_sketch.copy(),
+            metrics_enter_time=self.enter_time.copy(),
+            metrics_spawn_time=self.spawn_time.copy(),
+            metrics_clock=np.array(
+                [self.now, self.current, self._flushed], dtype=np.float64
+            ),
+        )
+        return cols
+
+    def import_columns(self, cols: Dict[str, np.ndarray]):
+        """Ersetzt den Zustand durch den aus export_columns()."""
+        shape = self.windows[FIELDS[0]].shape
+        if (
+            float(cols["metrics_window"]) != self.window
+            or cols[f"metrics_{FIELDS[0]}"].shape != shape
+        ):
+            raise ValueError(
+                "Gespeicherte Kennzahlen passen nicht (window/history/Streets)"
+            )
+        self.windows = {
+            f: cols[f"metrics_{f}"].astype(np.float64) for f in FIELDS
+        }
+        self.window_time = cols["metrics_window_time"].astype(np.float64)
+        self.trip_sketch = cols["metrics_trip_sketch"].astype(np.int64)
+        self.trips = cols["metrics_trips"].astype(np.int64)
+        self.tt_sketch = cols["metrics_tt_sketch"].astype(np.int32)
+        self.enter_time = cols["metrics_enter_time"].astype(np.float64)
+        self.spawn_time = cols["metrics_spawn_time"].astype(np.float64)
+        now, current, flushed = cols["metrics_clock"].tolist()
+        self.now = now
+        self.current = int(current)
+        self._flushed = int(flushed)
+
+    # ------------------------------------------------------------------
+    # Ausgabe
+    # ------------------------------------------------------------------
+    def window_table(self, w: int, end: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        Spalten (CSV_COLUMNS) für Fenster w, nur Streets mit Verkehr.
+        end = Ende des erfassten Zeitraums (für das laufende Fenster).
+        """
+        s = self._slot(w)
+        win = {f: arr[s] for f, arr in self.windows.items()}
+        active = np.flatnonzero((win["veh_seconds"] > 0) | (win["entries"] > 0))
+        elapsed = self.window_time[s]
+        start = w * self.window
+        with np.errstate(divide="ignore", invalid="ignore"):
+            veh_s = win["veh_seconds"][active]
+            tt_count = win["tt_count"][active]
+            per_s = 1.0 / elapsed if elapsed else np.nan
+            return {
+                "window_start": np.full(len(active), start),
+                "window_end": np.full(
+                    len(active), end if end is not None else start + self.window
+                ),
+                "street_id": self.street_ids[active],
+                "entries": win["entries"][active].astype(np.int64),
+                "exits": win["exits"][active].astype(np.int64),
+                "flow_vph": win["exits"][active] * per_s * 3600.0,
+                "density_vpkm": veh_s * per_s / (self.length[active] / 1000.0),
+                "mean_speed": win["distance"][active] / veh_s,
+                "queue": win["queue_seconds"][active] * per_s,
+                "red_wait": win["red_seconds"][active] * per_s,
+                "travel_time": win["tt_sum"][active] / tt_count,
+                "delay": win["delay_sum"][active] / tt_count,
+            }
+
+    def _write(self, tables: List[Dict[str, np.ndarray]]):
+        if not tables:
+            return
+        cols = {c: np.concatenate([t[c] for t in tables]) for c in CSV_COLUMNS}
+        if self.path.endswith(".parquet"):
+            pa = import_pyarrow()
+            table = pa.table(cols)
+            if self._writer is None:
+                self._writer = pa.parquet.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+            return
+        new = self._writer is None
+        if new:
+            self._writer = "csv"
+        with open(self.path, "w" if new else "a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if new:
+                w.writerow(CSV_COLUMNS)
+            w.writerows(zip(*(cols[c].tolist() for c in CSV_COLUMNS)))
+
+    def _flush_range(self, first: int, end: int, partial: bool = False):
+        """
+        Schreibt die Fenster [first, end); mit partial=True endet das
+        laufende Fenster bei self.now statt an seiner Grenze.
+        """
+        first = max(first, self.current - self.history + 1)
+        tables = [
+            self.window_table(w, end=self.now if partial and w == self.current else None)
+            for w in range(first, end)
+        ]
+        self._write(tables)
+        self._flushed = max(self._flushed, end)
+
+    def flush(self):
+        """Schreibt alle abgeschlossenen, noch nicht geschriebenen Fenster."""
+        if self.path is not None:
+            self._flush_range(self._flushed, self.current)
+
+    def close(self):
+        """Schreibt den Rest inkl. des laufenden Fensters und schließt die Datei."""
+        if self.path is None:
+            return
+        self._flush_range(self._flushed, self.current + 1, partial=True)
+        if self._writer is not None and self._writer != "csv":
+            self._writer.close()
+        self._writer = None
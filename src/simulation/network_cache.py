@@ -0,0 +1,393 @@
+import json
+import os
+
+from array import array
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from .TrafficLight import TrafficLightController
+from .intersection import Intersection
+from .street import Street
+
+# Version des kompilierten Formats; bei Änderungen am Layout hochzählen
+NETWORK_FORMAT_VERSION = 1
+
+# Standard-Ablage: <repo>/data/network_cache
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data",
+    "network_cache",
+)
+
+META_FILE = "meta.json"
+
+# Alle Arrays des Formats (Dateiname = <name>.npy)
+ARRAY_NAMES = (
+    "node_ids",  # (N,) str   OSM-Knoten-ID als String
+    "node_xy",  # (N, 2)      projizierte Koordinaten
+    "street_ids",  # (M,)     Street-ID
+    "street_u",  # (M,)       Index Startknoten in node_ids
+    "street_v",  # (M,)       Index Endknoten in node_ids
+    "street_length",  # (M,)
+    "street_speed",  # (M,)   Tempolimit in m/s
+    "coord_offsets",  # (M+1,) Bereich in coords je Street
+    "coords",  # (K, 2)       alle Polylinien hintereinander
+    "lane_offsets",  # (M+1,) Bereich in lane_dirs je Street
+    "lane_dirs",  # (L,) str  erlaubte Richtungen je Spur, ";"-getrennt
+    "adj_offsets",  # (N+1,)  CSR: ausgehende Streets je Knoten
+    "adj_streets",  # (M,)    Street-Index (Zeile in street_*)
+    "spur_offsets",  # (N+1,) CSR: eingehende Spuren je Knoten (Ampel)
+    "spur_streets",  # (S,)   Street-ID
+    "spur_lanes",  # (S,)     Spur-Index
+)
+
+
+def network_key(
+    center: Tuple[float, float], dist_m: float, network_type: str = "drive"
+) -> str:
+    """
+    Schlüssel eines Netz-Ausschnitts aus Mittelpunkt, Radius und Netztyp,
+    z. B. "net_52.52000_13.40500_5000_drive".
+    """
+    lat, lon = center
+    return f"net_{lat:.5f}_{lon:.5f}_{int(round(dist_m))}_{network_type}"
+
+
+def _offsets(groups: List[list]) -> np.ndarray:
+    offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(g) for g in groups])
+    return offsets
+
+
+class CompiledNetwork:
+    """
+    Kompiliertes Straßennetz als flache Arrays (memory-mappable).
+
+    Enthält Knoten, Streets, Polylinien, Spuren, Tempolimits, Adjazenz
+    und die Ampel-Spuren je Knoten. `to_maps()` baut daraus wieder die
+    Intersection-/Street-Objekte, ohne osmnx oder shapely zu benötigen.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[dict] = None):
+        missing = [n for n in ARRAY_NAMES if n not in arrays]
+        if missing:
+            raise ValueError(f"Fehlende Arrays im Netz: {missing}")
+        self.arrays = arrays
+        self.meta = dict(meta or {})
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_streets(self) -> int:
+        return len(self.street_ids)
+
+    @classmethod
+    def from_maps(
+        cls,
+        intersections: Dict[str, Intersection],
+        streets: Dict[int, Street],
+        meta: Optional[dict] = None,
+    ) -> "CompiledNetwork":
+        """
+        Kompiliert vorhandene Intersection-/Street-Maps in das Array-Format.
+        """
+        node_ids = list(intersections.keys())
+        node_index = {nid: i for i, nid in enumerate(node_ids)}
+        node_xy = np.array(
+            [(inter.x_coord, inter.y_coord) for inter in intersections.values()],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+
+        st_list = list(streets.values())
+        street_ids = np.array([st.id for st in st_list], dtype=np.int64)
+        street_u = np.array([node_index[st.start_node] for st in st_list], dtype=np.int64)
+        street_v = np.array([node_index[st.end_node] for st in st_list], dtype=np.int64)
+        street_length = np.array([st.length for st in st_list], dtype=np.float64)
+        street_speed = np.array([st.speed_limit for st in st_list], dtype=np.float64)
+
+        coord_offsets = np.zeros(len(st_list) + 1, dtype=np.int64)
+        coord_offsets[1:] = np.cumsum([st.num_points for st in st_list])
+        coords = (
+            np.concatenate([np.frombuffer(st.xy, dtype=np.float64) for st in st_list])
+            if st_list
+            else np.zeros(0, dtype=np.float64)
+        ).reshape(-1, 2)
+
+        lane_offsets = _offsets([st.lane_dirs for st in st_list])
+        lane_dirs = np.array(
+            [";".join(dirs) for st in st_list for dirs in st.lane_dirs], dtype=str
+        )
+
+        out_groups: List[List[int]] = [[] for _ in node_ids]
+        for row, st in enumerate(st_list):
+            out_groups[node_index[st.start_node]].append(row)
+        adj_offsets = _offsets(out_groups)
+        adj_streets = np.array([r for g in out_groups for r in g], dtype=np.int64)
+
+        spur_groups: List[List[Tuple[int, int]]] = []
+        for nid in node_ids:
+            tl = intersections[nid].traffic_lights
+            spur_groups.append(sorted(tl.spurs) if tl else [])
+        spur_offsets = _offsets(spur_groups)
+        spur_flat = [sp for g in spur_groups for sp in g]
+        spur_streets = np.array([sp[0] for sp in spur_flat], dtype=np.int64)
+        spur_lanes = np.array([sp[1] for sp in spur_flat], dtype=np.int64)
+
+        arrays = {
+            "node_ids": np.array(node_ids, dtype=str),
+            "node_xy": node_xy,
+            "street_ids": street_ids,
+            "street_u": street_u,
+            "street_v": street_v,
+            "street_length": street_length,
+            "street_speed": street_speed,
+            "coord_offsets": coord_offsets,
+            "coords": coords,
+            "lane_offsets": lane_offsets,
+            "lane_dirs": lane_dirs,
+            "adj_offsets": adj_offsets,
+            "adj_streets": adj_streets,
+            "spur_offsets": spur_offsets,
+            "spur_streets": spur_streets,
+            "spur_lanes": spur_lanes,
+        }
+        return cls(arrays, meta)
+
+    def save(self, path: str):
+        """
+        Speichert alle Arrays als einzelne .npy-Dateien plus meta.json in `path`.
+        Erst in ein temporäres Verzeichnis, dann umbenennen, damit ein
+        abgebrochener Schreibvorgang keinen halben Cache hinterlässt.
+        """
+        tmp_path = path + ".tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(tmp_path, name + ".npy"), np.asarray(self.arrays[name]))
+        meta = dict(self.meta)
+        meta["version"] = NETWORK_FORMAT_VERSION
+        meta["num_nodes"] = self.num_nodes
+        meta["num_streets"] = self.num_streets
+        with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        if os.path.isdir(path):
+            for fname in os.listdir(path):
+                os.remove(os.path.join(path, fname))
+            os.rmdir(path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompiledNetwork":
+        """
+        Lädt ein kompiliertes Netz; mit mmap=True werden die Arrays nur
+        memory-mapped und erst beim Zugriff von der Platte gelesen.
+        """
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != NETWORK_FORMAT_VERSION:
+            raise ValueError(
+                f"Netz-Cache {path} hat Version {meta.get('version')}, "
+                f"erwartet {NETWORK_FORMAT_VERSION}"
+            )
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode)
+            for name in ARRAY_NAMES
+        }
+        return cls(arrays, meta)
+
+    def to_maps(self) -> Tuple[Dict[str, Intersection], Dict[int, Street]]:
+        """
+        Baut Intersection-/Street-Objekte aus den Arrays (ohne shapely).
+        """
+        node_ids = self.node_ids.tolist()
+        node_xy = np.asarray(self.node_xy)
+        intersection_map: Dict[str, Intersection] = {}
+        for nid, (x, y) in zip(node_ids, node_xy.tolist()):
+            intersection_map[nid] = Intersection(nid, x=x, y=y)
+
+        # Punkte bleiben gepackt (x0, y0, x1, y1, ...), je Street ein Ausschnitt
+        xy = array("d")
+        xy.frombytes(np.ascontiguousarray(self.coords, dtype=np.float64).tobytes())
+        coord_offsets = self.coord_offsets.tolist()
+        lane_offsets = self.lane_offsets.tolist()
+        lane_dirs = [d.split(";") for d in self.lane_dirs.tolist()]
+
+        streets_map: Dict[int, Street] = {}
+        rows = zip(
+            self.street_ids.tolist(),
+            self.street_u.tolist(),
+            self.street_v.tolist(),
+            self.street_length.tolist(),
+            self.street_speed.tolist(),
+        )
+        for row, (st_id, u, v, length, speed) in enumerate(rows):
+            c0, c1 = coord_offsets[row], coord_offsets[row + 1]
+            l0, l1 = lane_offsets[row], lane_offsets[row + 1]
+            streets_map[st_id] = Street(
+                st_id=st_id,
+                start_node=node_ids[u],
+                end_node=node_ids[v],
+                coords=xy[2 * c0 : 2 * c1],
+                speed_limit=speed,
+                lane_dirs=lane_dirs[l0:l1],
+                length=length,
+            )
+
+        spur_offsets = self.spur_offsets.tolist()
+        spurs = list(zip(self.spur_streets.tolist(), self.spur_lanes.tolist()))
+        for i, nid in enumerate(node_ids):
+            s0, s1 = spur_offsets[i], spur_offsets[i + 1]
+            if s1 > s0:
+                intersection_map[nid].set_traffic_lights(
+                    TrafficLightController(spurs[s0:s1])
+                )
+
+        return intersection_map, streets_map
+
+
+class SharedNetwork:
+    """
+    Kompiliertes Netz in einem einzigen Shared-Memory-Block, damit viele
+    Prozesse dieselben Arrays lesen, ohne sie zu kopieren.
+
+    Der Besitzer legt den Block mit create() an und gibt `handle` (klein,
+    picklebar) an die Worker weiter; diese erhalten mit attach() ein
+    CompiledNetwork, dessen Arrays direkt auf den Block zeigen.
+    Der Besitzer ruft am Ende unlink() auf. Worker müssen das
+    SharedNetwork behalten, solange sie die Arrays benutzen (sonst wird der
+    Block beim Aufräumen aus ihrem Adressraum entfernt), und sollten
+    Kindprozesse des Besitzers sein (gemeinsamer resource_tracker).
+    """
+
+    # Ausrichtung der Arrays im Block (Bytes)
+    ALIGN = 64
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: dict, meta: dict):
+        self.shm = shm
+        self.layout = layout
+        self.meta = meta
+
+    @property
+    def handle(self) -> Tuple[str, dict, dict]:
+        return self.shm.name, self.layout, self.meta
+
+    @classmethod
+    def create(cls, net: CompiledNetwork) -> "SharedNetwork":
+        layout = {}
+        size = 0
+        for name in ARRAY_NAMES:
+            arr = np.asarray(net.arrays[name])
+            size = -(-size // cls.ALIGN) * cls.ALIGN
+            layout[name] = (arr.dtype.str, arr.shape, size)
+            size += arr.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(shm, layout, dict(net.meta))
+        for name, view in shared.arrays().items():
+            view[...] = net.arrays[name]
+        return shared
+
+    @classmethod
+    def attach(cls, handle: Tuple[str, dict, dict]) -> "SharedNetwork":
+        name, layout, meta = handle
+        return cls(shared_memory.SharedMemory(name=name), layout, meta)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=off)
+            for name, (dtype, shape, off) in self.layout.items()
+        }
+
+    def network(self) -> CompiledNetwork:
+        """CompiledNetwork auf den Arrays im Block (keine Kopie)."""
+        return CompiledNetwork(self.arrays(), self.meta)
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def file_cache_key(path: str) -> str:
+    """
+    Cache-Schlüssel einer lokalen Netzdatei (Name, Größe, Änderungszeit).
+    """
+    stat = os.stat(path)
+    return (
+        "file_"
+        + os.path.splitext(os.path.basename(path))[0]
+        + f"_{stat.st_size}_{int(stat.st_mtime)}"
+    )
+
+
+def network_path(
+    cache_dir: Optional[str],
+    network_file: Optional[str] = None,
+    center: Tuple[float, float] = (0.0, 0.0),
+    dist_m: float = 0.0,
+    network_type: str = "drive",
+) -> Optional[str]:
+    """
+    Verzeichnis des kompilierten Netzes (dort liegen auch abgeleitete
+    Daten wie die Contraction Hierarchy). None, wenn nicht gecacht wird.
+    """
+    if network_file and os.path.isdir(network_file):
+        return network_file
+    if not cache_dir:
+        return None
+    if network_file:
+        return os.path.join(cache_dir, file_cache_key(network_file))
+    return os.path.join(cache_dir, network_key(center, dist_m, network_type))
+
+
+def cache_is_current(path: str) -> bool:
+    """
+    True, wenn unter `path` ein vollständiger Netz-Cache im aktuellen
+    Format liegt. Fehlende meta.json oder eine andere Version zählen als
+    Cache-Fehltreffer (der Aufrufer baut neu und überschreibt per save).
+    """
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get("version") == NETWORK_FORMAT_VERSION
+
+
+def load_network(
+    path: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR
+) -> Tuple[Dict[str, Intersection], Dict[int, Street]]:
+    """
+    Lädt ein Netz aus einem kompilierten Cache-Verzeichnis oder aus einer
+    lokalen .osm/.graphml-Datei. Lokale Dateien werden beim ersten Laden
+    kompiliert und (falls cache_dir gesetzt) unter ihrem Dateinamen abgelegt.
+    """
+    if os.path.isdir(path):
+        return CompiledNetwork.load(path).to_maps()
+
+    key = file_cache_key(path)
+    if cache_dir:
+        cached = os.path.join(cache_dir, key)
+        if cache_is_current(cached):
+            return CompiledNetwork.load(cached).to_maps()
+        if os.path.isdir(cached):
+            print(f"[load_network] Veralteter Netz-Cache {cached}, baue neu")
+
+    from .osm_import import graph_to_network, load_osm_file
+
+    print(f"[load_network] Lese lokale Netzdatei {path}")
+    intersections, streets = graph_to_network(load_osm_file(path))
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        CompiledNetwork.from_maps(
+            intersections, streets, meta={"source": os.path.abspath(path)}
+        ).save(os.path.join(cache_dir, key))
+    return intersections, streets
@@ -0,0 +1,334 @@
+import itertools
+import os
+
+from array import array
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from .TrafficLight import TrafficLightController
+from .intersection import Intersection
+from .street import Street
+
+
+# osmnx (samt networkx, shapely, geopandas) erst laden, wenn wirklich ein
+# Netz aus OSM gebaut wird: der Import dauert Sekunden
+_osmnx = None
+
+
+def import_osmnx():
+    """Importiert osmnx bei Bedarf und setzt einmalig die Einstellungen."""
+    global _osmnx
+    if _osmnx is None:
+        import osmnx as ox
+
+        ox.settings.timeout = 300
+        ox.settings.log_console = True
+        ox.settings.use_cache = True
+        _osmnx = ox
+    return _osmnx
+
+
+def parse_turn_lanes(turn_lanes_str: str) -> List[List[str]]:
+    """
+    Parst z. B. "left|through;right" in:
+    [ ["left"], ["through","right"] ]
+    d. h. pro Spur eine Liste an erlaubten Richtungen.
+    Mögliche Werte in OSM: left, right, through, slight_left, slight_right usw.
+    Hier behandeln wir "slight_left" als "left" und "slight_right" als "right".
+    """
+    if not turn_lanes_str:
+        return []
+    # Spur-Einträge durch "|"
+    lane_entries = turn_lanes_str.split("|")
+    result = []
+    for lane_entry in lane_entries:
+        # z. B. "through;right"
+        directions = []
+        for d in lane_entry.split(";"):
+            # Normalisieren slight_left -> left
+            if "left" in d:
+                directions.append("left")
+            elif "right" in d:
+                directions.append("right")
+            elif "through" in d:
+                directions.append("through")
+            else:
+                # Unbekannte Einträge
+                directions.append(d)
+        result.append(directions)
+    return result
+
+
+def load_osm_file(path: str):
+    """
+    Lädt einen lokalen OSM-Export (.osm/.xml) oder eine GraphML-Datei
+    und gibt den projizierten osmnx-Graphen zurück.
+    """
+    ox = import_osmnx()
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".osm", ".xml"):
+        G = ox.graph_from_xml(path, simplify=True)
+    elif ext == ".graphml":
+        G = ox.load_graphml(path)
+    else:
+        raise ValueError(f"Unbekanntes Netzformat: {path}")
+
+    if not ox.projection.is_projected(G.graph.get("crs")):
+        G = ox.project_graph(G)
+    return G
+
+
+# Standardwerte fehlender Tags (wie OSM-Auswertung bisher)
+DEFAULT_MAXSPEED_KMH = 50.0
+DEFAULT_LANES = 1
+
+
+def _first(value):
+    # Mehrfachwerte (nach simplify als Liste) -> erster Eintrag
+    return value[0] if isinstance(value, list) else value
+
+
+def _speed_limit(maxspeed) -> float:
+    try:
+        ms_val = float(_first(maxspeed))
+    except (TypeError, ValueError):
+        ms_val = DEFAULT_MAXSPEED_KMH
+    return ms_val / 3.6  # km/h -> m/s
+
+
+def _lane_count(lanes) -> int:
+    try:
+        return int(lanes)
+    except (TypeError, ValueError):
+        return DEFAULT_LANES
+
+
+def _lane_dirs(turn_lanes, lanes: int) -> List[List[str]]:
+    parsed = parse_turn_lanes(_first(turn_lanes))
+    # Wenn turn:lanes weniger Spuren angibt als "lanes", füllen wir 'through' auf
+    while len(parsed) < lanes:
+        parsed.append(["through"])
+    return parsed
+
+
+def _is_twoway(oneway) -> bool:
+    return oneway in [False, "False", 0, "0"]
+
+
+def _tag_column(edges, name: str, parse: Callable, default) -> list:
+    """
+    parse() je Kante, aber nur einmal je verschiedenem Tag-Wert (es gibt
+    meist nur wenige); fehlende Werte (Spalte fehlt/NaN) wie `default`.
+    """
+    import pandas as pd
+
+    if name not in edges.columns:
+        return [parse(default)] * len(edges)
+    raw = edges[name].to_numpy(dtype=object, copy=True)
+    # Mehrfachwerte (Listen) sind nicht hashbar: als Tupel zählen
+    is_list = np.fromiter(
+        map(isinstance, raw, itertools.repeat(list)), dtype=bool, count=len(raw)
+    )
+    for i in np.flatnonzero(is_list).tolist():
+        raw[i] = tuple(raw[i])
+    codes, uniques = pd.factorize(raw)
+    # Code -1 (fehlender Wert) trifft den letzten Eintrag = default
+    table = np.empty(len(uniques) + 1, dtype=object)
+    for i, x in enumerate(uniques):
+        table[i] = parse(list(x) if isinstance(x, tuple) else x)
+    table[-1] = parse(default)
+    return table[codes].tolist()
+
+
+def _polyline_lengths(
+    pts: np.ndarray, offsets: np.ndarray, reverse: bool = False
+) -> np.ndarray:
+    """
+    Längen der Polylinien pts[offsets[i]:offsets[i+1]], Segment für Segment
+    in derselben Reihenfolge summiert wie street.polyline_length (daher
+    bitgleich); reverse=True summiert von hinten (umgekehrte Richtung).
+    """
+    n = len(offsets) - 1
+    d = np.diff(pts, axis=0)
+    seg = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1])
+    nseg = np.diff(offsets) - 1
+    # Längste zuerst: die noch offenen Polylinien sind dann ein Präfix
+    order = np.argsort(-nseg, kind="stable")
+    nseg_sorted = nseg[order]
+    first = (offsets[1:] - 2 if reverse else offsets[:-1])[order]
+    step = -1 if reverse else 1
+    total = np.zeros(n, dtype=np.float64)
+    for k in range(int(nseg_sorted[0]) if n else 0):
+        m = int(np.count_nonzero(nseg_sorted > k))
+        total[:m] += seg[first[:m] + step * k]
+    lengths = np.empty(n, dtype=np.float64)
+    lengths[order] = total
+    return lengths
+
+
+def graph_to_network(G) -> Tuple[Dict[str, Intersection], Dict[int, Street]]:
+    """
+    Baut aus einem projizierten osmnx-Graphen die Intersection-/Street-Maps
+    (inkl. turn:lanes und Ampeln an allen Knoten mit eingehenden Spuren),
+    über die Knoten-/Kantentabellen, siehe gdfs_to_network.
+    """
+    if next(iter(G.edges), None) is None:
+        return {
+            str(n): Intersection(str(n), x=d.get("x", 0.0), y=d.get("y", 0.0))
+            for n, d in G.nodes(data=True)
+        }, {}
+    nodes, edges = import_osmnx().graph_to_gdfs(
+        G, node_geometry=False, fill_edge_geometry=False
+    )
+    return gdfs_to_network(nodes, edges)
+
+
+def gdfs_to_network(nodes, edges) -> Tuple[Dict[str, Intersection], Dict[int, Street]]:
+    """
+    Massen-Aufbau aus den Knoten-/Kantentabellen (ox.graph_to_gdfs):
+    Tags spaltenweise normalisiert (je verschiedenem Wert einmal geparst),
+    Koordinaten, Längen und Ampel-Spuren als Array-Operationen. Ergebnis
+    und Street-IDs wie beim kantenweisen Aufbau: je Kante in Tabellen-
+    reihenfolge die Hin- und ggf. direkt danach die Rückrichtung.
+    """
+    import pandas as pd
+    import shapely
+
+    # 1) Knoten
+    node_ids = [str(n) for n in nodes.index.tolist()]
+    node_xy = np.column_stack(
+        [
+            nodes[c].to_numpy(dtype=np.float64, na_value=0.0)
+            if c in nodes.columns
+            else np.zeros(len(nodes))
+            for c in ("x", "y")
+        ]
+    )
+    intersection_map: Dict[str, Intersection] = {
+        nid: Intersection(nid, x=x, y=y)
+        for nid, (x, y) in zip(node_ids, node_xy.tolist())
+    }
+
+    # 2) Kanten-Geometrie: Polylinien hintereinander in pts, Bereiche per offsets
+    node_index = pd.Index(nodes.index)
+    u = node_index.get_indexer(edges.index.get_level_values(0))
+    v = node_index.get_indexer(edges.index.get_level_values(1))
+    geoms = edges.geometry.to_numpy()
+    has_geom = ~shapely.is_missing(geoms)
+    geom_pts, geom_idx = shapely.get_coordinates(geoms[has_geom], return_index=True)
+    counts = np.full(len(edges), 2, dtype=np.int64)
+    counts[has_geom] = np.bincount(geom_idx, minlength=int(has_geom.sum()))
+    offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    pts = np.empty((int(offsets[-1]), 2), dtype=np.float64)
+    # Kanten mit Geometrie: Punkte an ihren Platz kopieren
+    geom_rows = np.flatnonzero(has_geom)
+    geom_start = np.zeros(len(geom_rows), dtype=np.int64)
+    geom_start[1:] = np.cumsum(counts[geom_rows])[:-1]
+    rank = np.arange(len(geom_pts)) - geom_start[geom_idx]
+    pts[offsets[geom_rows][geom_idx] + rank] = geom_pts
+    # Ohne Geometrie: Gerade von u nach v
+    plain = np.flatnonzero(~has_geom)
+    pts[offsets[plain]] = node_xy[u[plain]]
+    pts[offsets[plain] + 1] = node_xy[v[plain]]
+    # Rückrichtung: Punktfolge je Kante umgedreht
+    point_edge = np.repeat(np.arange(len(edges)), counts)
+    rev_pts = pts[
+        offsets[:-1][point_edge] + offsets[1:][point_edge] - 1 - np.arange(len(pts))
+    ]
+
+    lengths = _polyline_lengths(pts, offsets).tolist()
+    rev_lengths = _polyline_lengths(pts, offsets, reverse=True).tolist()
+    flat = array("d")
+    flat.frombytes(pts.tobytes())
+    rev_flat = array("d")
+    rev_flat.frombytes(rev_pts.tobytes())
+
+    # 3) Tags spaltenweise
+    speeds = _tag_column(edges, "maxspeed", _speed_limit, "50")
+    lanes = _tag_column(edges, "lanes", _lane_count, DEFAULT_LANES)
+    turn_lanes = _tag_column(edges, "turn:lanes", lambda t: t, "")
+    twoway = _tag_column(edges, "oneway", _is_twoway, False)
+    dirs_cache: Dict[tuple, tuple] = {}
+
+    # 4) Streets (Hin- und ggf. Rückrichtung)
+    streets_map: Dict[int, Street] = {}
+    off = offsets.tolist()
+    st_id = 1
+    for i in range(len(edges)):
+        tl = turn_lanes[i]
+        key = (tuple(tl) if isinstance(tl, list) else tl, lanes[i])
+        parsed = dirs_cache.get(key)
+        if parsed is None:
+            parsed = dirs_cache[key] = tuple(map(tuple, _lane_dirs(tl, lanes[i])))
+        str_u, str_v = node_ids[u[i]], node_ids[v[i]]
+        c0, c1 = 2 * off[i], 2 * off[i + 1]
+        streets_map[st_id] = Street(
+            st_id=st_id,
+            start_node=str_u,
+            end_node=str_v,
+            coords=flat[c0:c1],
+            speed_limit=speeds[i],
+            lane_dirs=parsed,
+            length=lengths[i],
+        )
+        st_id += 1
+        if twoway[i]:
+            streets_map[st_id] = Street(
+                st_id=st_id,
+                start_node=str_v,
+                end_node=str_u,
+                coords=rev_flat[c0:c1],
+                speed_limit=speeds[i],
+                lane_dirs=parsed,  # gleiche Spur-Infos
+                length=rev_lengths[i],
+            )
+            st_id += 1
+
+    # 5) Ampeln: eingehende Spuren je Endknoten in einem Durchgang gruppiert
+    st_list = list(streets_map.values())
+    node_row = {nid: i for i, nid in enumerate(node_ids)}
+    st_lanes = np.array([st.num_lanes for st in st_list], dtype=np.int64)
+    spur_street = np.repeat([st.id for st in st_list], st_lanes)
+    spur_node = np.repeat([node_row[st.end_node] for st in st_list], st_lanes)
+    spur_lane = np.arange(len(spur_street)) - np.repeat(
+        np.cumsum(st_lanes) - st_lanes, st_lanes
+    )
+    order = np.argsort(spur_node, kind="stable")
+    bounds = np.searchsorted(spur_node[order], np.arange(len(node_ids) + 1))
+    spurs = list(zip(spur_street[order].tolist(), spur_lane[order].tolist()))
+    for i, nid in enumerate(node_ids):
+        s0, s1 = bounds[i], bounds[i + 1]
+        if s1 > s0:
+            tl = TrafficLightController(spurs[s0:s1])
+            intersection_map[nid].set_traffic_lights(tl)
+
+    return intersection_map, streets_map
+
+
+def collect_in_spurs(streets_map: Dict[int, Street]) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Sammelt pro Node => Liste aller (street_id, lane_index), die dort enden.
+    """
+    in_spurs: Dict[str, List[Tuple[int, int]]] = {}
+    for st_id, st_obj in streets_map.items():
+        end_n = st_obj.end_node
+        if end_n not in in_spurs:
+            in_spurs[end_n] = []
+        for ln in range(st_obj.num_lanes):
+            in_spurs[end_n].append((st_id, ln))
+    return in_spurs
+
+
+def attach_traffic_lights(
+    intersection_map: Dict[str, Intersection], streets_map: Dict[int, Street]
+):
+    """
+    Legt an jedem Knoten mit eingehenden Spuren einen TrafficLightController an.
+    """
+    in_spurs = collect_in_spurs(streets_map)
+    for n_id, inter in intersection_map.items():
+        if n_id in in_spurs:
+            tl = TrafficLightController(in_spurs[n_id])
+            inter.set_traffic_lights(tl)
@@ -0,0 +1,286 @@
+import copy
+import multiprocessing
+
+from typing import Dict, List, Tuple
+
+from .intersection import Intersection
+from .lane_index import LaneOccupancy
+from .simulation import Simulator
+from .street import Street
+from .vehicle import VEHICLE_PROFILES, Vehicle
+
+# Serialisierter Fahrzeugzustand für die Übergabe zwischen Regionen:
+# (vehicle_id, profile, street_id, lane_index, position_s, speed,
+#  route_streets, route_index, base_speed_limit)
+VehicleState = Tuple[int, str, int, int, float, float, List[int], int, float]
+
+
+def vehicle_state(v: Vehicle) -> VehicleState:
+    return (
+        v.vehicle_id,
+        v.profile,
+        v.current_street_id(),
+        v.lane_index,
+        v.position_s,
+        v.speed,
+        list(v.route_streets),
+        v.route_index,
+        v.base_speed_limit,
+    )
+
+
+def vehicle_from_state(state: VehicleState, sim: Simulator) -> Vehicle:
+    vid, prof, st_id, lane, pos, speed, route, route_index, base_limit = state
+    v = Vehicle(
+        vehicle_id=vid,
+        profile=prof,
+        current_street=sim.streets[st_id],
+        lane_index=lane,
+        route_streets=sim.route_table.intern(route),
+        streets_map=sim.streets,
+        intersections_map=sim.intersections,
+    )
+    v.position_s = pos
+    v.speed = speed
+    v.route_index = route_index
+    v.base_speed_limit = base_limit
+    v.plan_turn()
+    return v
+
+
+def partition_nodes(
+    intersections: Dict[str, Intersection], num_regions: int
+) -> Dict[str, int]:
+    """
+    Teilt die Knoten räumlich in num_regions Regionen (rekursive
+    Koordinaten-Bisektion: jeweils entlang der längeren Achse am
+    Median teilen). Gibt node_id -> Region zurück.
+    """
+    result: Dict[str, int] = {}
+
+    def split(nodes: List[Intersection], parts: int, first_region: int):
+        if parts <= 1 or len(nodes) <= 1:
+            for inter in nodes:
+                result[inter.id] = first_region
+            return
+        xs = [n.x_coord for n in nodes]
+        ys = [n.y_coord for n in nodes]
+        if max(xs) - min(xs) >= max(ys) - min(ys):
+            nodes = sorted(nodes, key=lambda n: (n.x_coord, n.y_coord, n.id))
+        else:
+            nodes = sorted(nodes, key=lambda n: (n.y_coord, n.x_coord, n.id))
+        left_parts = parts // 2
+        cut = len(nodes) * left_parts // parts
+        split(nodes[:cut], left_parts, first_region)
+        split(nodes[cut:], parts - left_parts, first_region + left_parts)
+
+    split(list(intersections.values()), num_regions, 0)
+    return result
+
+
+def street_regions(
+    streets: Dict[int, Street], node_region: Dict[str, int]
+) -> Dict[int, int]:
+    """
+    Eine Street gehört zur Region ihres Endknotens; damit liegt die Ampel,
+    an der ihre Fahrzeuge warten, immer in derselben Region.
+    """
+    return {st_id: node_region[st.end_node] for st_id, st in streets.items()}
+
+
+def _worker_main(
+    conn,
+    sim: Simulator,
+    region: int,
+    node_region: Dict[str, int],
+    st_region: Dict[int, int],
+):
+    """
+    Worker-Prozess einer Region. sim ist die (per fork geerbte) Kopie des
+    Master-Simulators; das Netz wird nur gelesen.
+    """
+    sim.vehicles = []
+    sim.lane_index = LaneOccupancy()
+    sim.owned_streets = {st_id for st_id, r in st_region.items() if r == region}
+    sim.outbox = []
+    # Eigene Streets, deren Startknoten in einer anderen Region liegt:
+    # dorthin fahren Fahrzeuge aus Nachbarregionen ein
+    boundary = [
+        st_id
+        for st_id in sorted(sim.owned_streets)
+        if node_region[sim.streets[st_id].start_node] != region
+    ]
+    boundary_lanes = [
+        (st_id, ln) for st_id in boundary for ln in range(sim.streets[st_id].num_lanes)
+    ]
+
+    while True:
+        msg = conn.recv()
+        cmd = msg[0]
+        if cmd == "prepare":
+            # Übergaben und neue Fahrzeuge einfügen, dann Grenz-Spuren melden
+            for state in msg[1]:
+                v = vehicle_from_state(state, sim)
+                sim.vehicles.append(v)
+                sim.lane_index.add(v)
+            rears = {}
+            for key in boundary_lanes:
+                rear = sim.lane_index.rear(*key)
+                if rear is not None:
+                    rears[key] = rear.position_s
+            conn.send(rears)
+        elif cmd == "step":
+            _, dt, foreign_rears = msg
+            sim.foreign_rears = foreign_rears
+            sim.time += dt
+            sim.update_traffic_lights(dt)
+            removed = sim._step_objects(dt)
+            outgoing = [vehicle_state(v) for v in sim.outbox]
+            sim.outbox = []
+            conn.send((outgoing, removed, len(sim.vehicles)))
+        elif cmd == "dump":
+            conn.send([vehicle_state(v) for v in sim.vehicles])
+        elif cmd == "stop":
+            conn.close()
+            return
+
+
+class PartitionedSimulator:
+    """
+    Partitionierter Betrieb: das Netz wird räumlich in Regionen geteilt,
+    jede Region läuft in einem eigenen Worker-Prozess (per fork, das Netz
+    wird nicht kopiert). Der Master behält Zufallsgenerator, Routing und
+    Spawning.
+
+    Ablauf pro Tick (deterministische Barrieren):
+    1) "prepare": Worker übernehmen übergebene/neue Fahrzeuge und melden
+       die hintersten Fahrzeuge ihrer Grenz-Spuren.
+    2) "step": Worker rechnen ihren Tick (mit den Grenz-Positionen der
+       Nachbarn für die Sicht über die Kreuzung) und geben Fahrzeuge ab,
+       die auf eine Street einer anderen Region gewechselt sind.
+    3) Master zählt fertige Fahrzeuge, spawnt nach und verteilt alles.
+
+    Da die Spurreihenfolge kanonisch ist (lane_order_key) und Vordermänner
+    über Kreuzungen mit Positionen vom Tick-Beginn rechnen, ist das Ergebnis
+    bei gleichem seed identisch zum Einzelprozess-Lauf.
+    """
+
+    def __init__(self, sim: Simulator, num_regions: int):
+        if sim.engine is not None:
+            raise ValueError("Partitionierter Betrieb nur mit der Objekt-Engine")
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("Partitionierter Betrieb benötigt fork-Prozesse")
+        self.sim = sim
+        self.num_regions = num_regions
+        self.node_region = partition_nodes(sim.intersections, num_regions)
+        self.street_region = street_regions(sim.streets, self.node_region)
+
+        # Bereits vorhandene Fahrzeuge werden beim ersten Tick verteilt
+        self._inbox: List[List[VehicleState]] = [[] for _ in range(num_regions)]
+        for v in sim.vehicles:
+            self._inbox[self.street_region[v.current_street_id()]].append(
+                vehicle_state(v)
+            )
+        template = copy.copy(sim)
+        template.vehicles = []
+        template.lane_index = LaneOccupancy()
+        sim.vehicles = []
+        sim.lane_index = LaneOccupancy()
+
+        ctx = multiprocessing.get_context("fork")
+        self._conns = []
+        self._procs = []
+        for region in range(num_regions):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(
+                target=_worker_main,
+                args=(child, template, region, self.node_region, self.street_region),
+                daemon=True,
+            )
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        self._count = sum(len(b) for b in self._inbox)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def vehicle_count(self) -> int:
+        return self._count + sum(len(b) for b in self._inbox)
+
+    def _distribute(self, spawns):
+        for vid, prof, lane, route in spawns:
+            st = self.sim.streets[route[0]]
+            # base_speed_limit wie im Vehicle-Konstruktor
+            base_limit = st.speed_limit * VEHICLE_PROFILES[prof][0]
+            self._inbox[self.street_region[st.id]].append(
+                (vid, prof, st.id, lane, 0.0, 0.0, route, 0, base_limit)
+            )
+
+    def spawn_vehicles(self, n: int, **kwargs) -> int:
+        spawns = self.sim._sample_spawns(n, **kwargs)
+        self._distribute(spawns)
+        return len(spawns)
+
+    def step(self, dt: float):
+        sim = self.sim
+        sim.time += dt
+        sim.update_traffic_lights(dt)
+
+        # 1) Barriere: Übergaben einspielen, Grenz-Spuren einsammeln
+        for conn, inbox in zip(self._conns, self._inbox):
+            conn.send(("prepare", inbox))
+        self._inbox = [[] for _ in range(self.num_regions)]
+        rears: Dict[Tuple[int, int], float] = {}
+        for conn in self._conns:
+            rears.update(conn.recv())
+
+        # 2) Barriere: Tick rechnen
+        for conn in self._conns:
+            conn.send(("step", dt, rears))
+        removed = 0
+        count = 0
+        for conn in self._conns:
+            outgoing, r, c = conn.recv()
+            removed += r
+            count += c
+            for state in outgoing:
+                self._inbox[self.street_region[state[2]]].append(state)
+        self._count = count
+
+        # 3) Nachspawnen (wie Simulator.step)
+        respawn = sum(1 for _ in range(removed) if sim.rng.random() < sim.respawn_rate)
+        if respawn:
+            self.spawn_vehicles(respawn)
+
+    def run(self, steps=100, dt=1.0):
+        self.spawn_vehicles(10)
+        for step in range(steps):
+            self.step(dt)
+            if step % 10 == 0:
+                print(f"Step {step} -> #Vehicles={self.vehicle_count()}")
+
+    def collect_vehicles(self) -> List[Vehicle]:
+        """Alle Fahrzeuge (inkl. noch nicht verteilter) als Objekte, nach ID sortiert."""
+        states = [s for inbox in self._inbox for s in inbox]
+        for conn in self._conns:
+            conn.send(("dump",))
+        for conn in self._conns:
+            states.extend(conn.recv())
+        states.sort(key=lambda s: s[0])
+        return [vehicle_from_state(s, self.sim) for s in states]
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._conns = []
+        self._procs = []
@@ -0,0 +1,214 @@
+import json
+import os
+
+import numpy as np
+
+from typing import Dict, List, Optional
+
+from .network_cache import CompiledNetwork
+
+# Version des Aufzeichnungsformats; bei Änderungen am Layout hochzählen
+RECORDING_FORMAT_VERSION = 1
+
+META_FILE = "recording.json"
+INDEX_FILE = "index.bin"
+NETWORK_DIR = "network"
+
+# Ein Eintrag je aufgezeichnetem Tick; index.bin wird nur angehängt und beim
+# Lesen memory-mapped
+INDEX_DTYPE = np.dtype(
+    [("time", "<f8"), ("chunk", "<i4"), ("start", "<i8"), ("count", "<i4")]
+)
+
+# Spalten je Fahrzeug und Tick (Speicherformat)
+COLUMN_DTYPES = {
+    "vid_delta": np.int64,  # Differenz zur vorherigen Zeile im Chunk
+    "street": np.int32,
+    "lane": np.int8,
+    "position_s": np.float32,
+    "speed": np.float32,
+}
+
+
+def chunk_file(index: int) -> str:
+    return f"chunk_{index:06d}.npz"
+
+
+class TrajectoryRecorder:
+    """
+    Zeichnet den Fahrzeugzustand jedes Ticks spaltenweise auf.
+
+    Ticks werden gepuffert und in Chunks (komprimierte .npz) geschrieben,
+    sobald chunk_ticks Ticks oder max_rows Zeilen erreicht sind; der
+    Speicherbedarf bleibt damit begrenzt. Je Tick werden die Fahrzeuge nach
+    ID sortiert, die IDs delta-kodiert (meist kleine Zahlen, komprimieren
+    gut), Position und Geschwindigkeit als float32 abgelegt.
+
+    Verwendung:
+        rec = TrajectoryRecorder("runs/test", sim)
+        sim.recorder = rec
+        ... sim.step(dt) ...
+        rec.close()
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sim,
+        chunk_ticks: int = 200,
+        max_rows: int = 2_000_000,
+        every: int = 1,
+    ):
+        self.directory = directory
+        self.chunk_ticks = chunk_ticks
+        self.max_rows = max_rows
+        self.every = max(1, every)
+        os.makedirs(directory, exist_ok=True)
+
+        # Netz referenzieren (kompilierter Cache) oder einmalig mitspeichern
+        if sim.network_path and os.path.isdir(sim.network_path):
+            network = os.path.abspath(sim.network_path)
+        else:
+            CompiledNetwork.from_maps(sim.intersections, sim.streets).save(
+                os.path.join(directory, NETWORK_DIR)
+            )
+            network = NETWORK_DIR
+        meta = {
+            "version": RECORDING_FORMAT_VERSION,
+            "network": network,
+            "chunk_ticks": chunk_ticks,
+            "every": self.every,
+        }
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        # Index neu beginnen
+        open(os.path.join(directory, INDEX_FILE), "wb").close()
+
+        self._calls = 0
+        self._chunk = 0
+        self._times: List[float] = []
+        self._parts: List[Dict[str, np.ndarray]] = []
+        self._rows = 0
+        self.ticks_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, sim):
+        """Nimmt den aktuellen Zustand von sim auf (jeden `every`-ten Aufruf)."""
+        self._calls += 1
+        if (self._calls - 1) % self.every:
+            return
+        cols = sim.vehicle_columns()
+        order = np.argsort(cols["vid"], kind="stable")
+        self._parts.append({name: arr[order] for name, arr in cols.items()})
+        self._times.append(sim.time)
+        self._rows += len(order)
+        if len(self._times) >= self.chunk_ticks or self._rows >= self.max_rows:
+            self.flush()
+
+    def flush(self):
+        """Schreibt gepufferte Ticks als Chunk und ergänzt den Index."""
+        if not self._times:
+            return
+        counts = np.array([len(p["vid"]) for p in self._parts], dtype=np.int64)
+        vid = np.concatenate([p["vid"] for p in self._parts]).astype(np.int64)
+        vid_delta = np.diff(vid, prepend=0)
+        arrays = {
+            "vid_delta": vid_delta,
+            "street": np.concatenate([p["street"] for p in self._parts]),
+            "lane": np.concatenate([p["lane"] for p in self._parts]),
+            "position_s": np.concatenate([p["position_s"] for p in self._parts]),
+            "speed": np.concatenate([p["speed"] for p in self._parts]),
+        }
+        arrays = {
+            name: arr.astype(COLUMN_DTYPES[name], copy=False)
+            for name, arr in arrays.items()
+        }
+        path = os.path.join(self.directory, chunk_file(self._chunk))
+        np.savez_compressed(path + ".tmp.npz", **arrays)
+        os.replace(path + ".tmp.npz", path)
+
+        index = np.zeros(len(counts), dtype=INDEX_DTYPE)
+        index["time"] = self._times
+        index["chunk"] = self._chunk
+        index["start"] = np.cumsum(counts) - counts
+        index["count"] = counts
+        with open(os.path.join(self.directory, INDEX_FILE), "ab") as f:
+            index.tofile(f)
+
+        self.ticks_written += len(counts)
+        self._chunk += 1
+        self._times = []
+        self._parts = []
+        self._rows = 0
+
+    def close(self):
+        self.flush()
+
+
+class TrajectoryReader:
+    """
+    Liest eine Aufzeichnung von TrajectoryRecorder. Der Index ist
+    memory-mapped, ein Sprung zu Tick i lädt nur den zugehörigen Chunk
+    (der zuletzt gelesene Chunk bleibt im Speicher).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != RECORDING_FORMAT_VERSION:
+            raise ValueError(
+                f"Aufzeichnung {directory} hat Version {self.meta.get('version')}, "
+                f"erwartet {RECORDING_FORMAT_VERSION}"
+            )
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.getsize(index_path):
+            self.index = np.memmap(index_path, dtype=INDEX_DTYPE, mode="r")
+        else:
+            self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self._chunk_id: Optional[int] = None
+        self._chunk: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def times(self) -> np.ndarray:
+        return self.index["time"]
+
+    @property
+    def network_path(self) -> str:
+        network = self.meta["network"]
+        return network if os.path.isabs(network) else os.path.join(self.directory, network)
+
+    def load_network(self):
+        """(intersections, streets) des aufgezeichneten Netzes."""
+        return CompiledNetwork.load(self.network_path).to_maps()
+
+    def _load_chunk(self, chunk_id: int):
+        if chunk_id == self._chunk_id:
+            return
+        with np.load(os.path.join(self.directory, chunk_file(chunk_id))) as data:
+            chunk = {name: data[name] for name in COLUMN_DTYPES}
+        chunk["vid"] = np.cumsum(chunk.pop("vid_delta"))
+        self._chunk = chunk
+        self._chunk_id = chunk_id
+
+    def tick(self, i: int) -> Dict[str, np.ndarray]:
+        """Zustand von Tick i: vid, street, lane, position_s, speed (+ time)."""
+        entry = self.index[i]
+        self._load_chunk(int(entry["chunk"]))
+        start = int(entry["start"])
+        sl = slice(start, start + int(entry["count"]))
+        result = {name: arr[sl] for name, arr in self._chunk.items()}
+        result["time"] = float(entry["time"])
+        return result
+
+    def seek_time(self, t: float) -> int:
+        """Index des letzten Ticks mit time <= t."""
+        return max(0, int(np.searchsorted(self.times, t, side="right")) - 1)
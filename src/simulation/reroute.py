@@ -0,0 +1,343 @@
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from .routing import RoutePool
+
+# Anfrage: (Fahrzeug-ID, aktuelle Street-ID, route_index bzw. route_ptr, OD-Paar)
+Request = Tuple[int, int, int, Tuple[str, str]]
+
+
+class Rerouter:
+    """
+    Staubewusstes Umrouten mit zeitabhängigen Kantenkosten.
+
+    Alle `interval` Sekunden werden die Kosten je Street aus den
+    beobachteten Reisezeiten (StreamingMetrics, letzte `windows` Fenster)
+    neu gesetzt:
+        Kosten = Länge * Faktor, Faktor = Reisezeit / freie Fahrzeit,
+    begrenzt auf [1, max_factor] und exponentiell geglättet. Da die Kosten
+    nie unter die Länge fallen, bleibt die A*-Heuristik (Luftlinie) gültig.
+
+    Als "deutlich schlechter" gilt eine Street, deren Kosten um mehr als
+    `threshold` über den zuletzt berücksichtigten liegen. Nur für diese
+    Streets werden Cache-Einträge verworfen, und nur Fahrzeuge, deren
+    Restroute über sie führt, kommen in Frage (höchstens `max_reroutes`,
+    die mit dem größten Kostenanstieg zuerst). Eine neue Route ab dem Ende
+    der aktuellen Street wird übernommen, wenn sie mindestens `min_gain`
+    günstiger ist als der Rest der alten. Routen werden dabei ersetzt,
+    nie verändert (sie sind geteilt, siehe RouteTable und fork).
+
+    Mit processes >= 1 rechnet ein Prozess-Pool die Routen im Hintergrund,
+    während die Simulation weiterläuft; übernommen wird beim ersten Tick
+    nach Fertigstellung, sofern das Fahrzeug noch auf derselben Street ist.
+    Ohne processes wird sofort zwischen zwei Ticks gerechnet. Fahrzeuge in
+    mesoskopischen Warteschlangen (meso.py) werden nicht umgeroutet.
+    """
+
+    def __init__(
+        self,
+        sim,
+        interval: float = 60.0,
+        windows: int = 2,
+        smoothing: float = 0.5,
+        max_factor: float = 10.0,
+        threshold: float = 0.5,
+        min_gain: float = 0.1,
+        max_reroutes: int = 1000,
+        processes: Optional[int] = None,
+    ):
+        if sim.metrics is None:
+            raise ValueError("Umrouten braucht Simulator.enable_metrics()")
+        self.sim = sim
+        self.interval = interval
+        self.windows = windows
+        self.smoothing = smoothing
+        self.max_factor = max_factor
+        self.threshold = threshold
+        self.min_gain = min_gain
+        self.max_reroutes = max_reroutes
+        self.processes = processes
+
+        metrics = sim.metrics
+        self.metrics = metrics
+        streets = list(sim.streets.values())
+        self.length = np.array([st.length for st in streets], dtype=np.float64)
+        self.end_node = [st.end_node for st in streets]
+        # Kosten je Street-Zeile: aktueller Faktor und Stand der letzten
+        # Prüfung (dagegen wird "deutlich schlechter" gemessen)
+        self.factor = np.ones(len(streets), dtype=np.float64)
+        self.reference = self.length.copy()
+        if sim.router.cache is not None:
+            sim.router.cache.track_streets()
+
+        self.next_update = sim.time + interval
+        self._pool: Optional[RoutePool] = None
+        self._pending: Optional[Tuple[list, List[Request], List[Tuple[str, str]]]] = None
+        self._version = 0
+        self._pending_version = 0
+
+        self.updates = 0
+        self.worsened = 0
+        self.candidates = 0
+        self.rerouted = 0
+        self.rejected = 0
+        self.stale = 0
+
+    @property
+    def weights(self) -> np.ndarray:
+        return self.length * self.factor
+
+    def restore(self, factor: np.ndarray, reference: np.ndarray, next_update: float):
+        """
+        Übernimmt gespeicherte Staufaktoren (siehe checkpoint.py) und setzt
+        die Kosten des Routers; der Cache wird geleert.
+        """
+        self.close()
+        self.factor = np.asarray(factor, dtype=np.float64).copy()
+        self.reference = np.asarray(reference, dtype=np.float64).copy()
+        self.next_update = next_update
+        sim = self.sim
+        sim.router.set_street_weights(self.weights)
+        if sim.router.cache is not None:
+            sim.router.cache.clear()
+        sim.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        self._pending = None
+
+    # ------------------------------------------------------------------
+    # Ablauf je Tick
+    # ------------------------------------------------------------------
+    def tick(self):
+        """Vom Simulator nach jedem Tick aufgerufen."""
+        if self._pending is not None and all(f.done() for f in self._pending[0]):
+            futures, requests, pairs = self._pending
+            self._pending = None
+            routes: List[Tuple[int, ...]] = []
+            for f in futures:
+                routes.extend(f.result())
+            found = dict(zip(pairs, routes))
+            cache = self.sim.router.cache
+            if cache is not None and self._pending_version == self._version:
+                for key, route in found.items():
+                    cache.put(key, route)
+            self._apply(requests, found)
+
+        if self.sim.time + 1e-9 < self.next_update:
+            return
+        while self.next_update <= self.sim.time + 1e-9:
+            self.next_update += self.interval
+        delta = self.update_weights()
+        if self._pending is not None:
+            return  # vorige Runde läuft noch im Hintergrund
+        requests = self._select(delta)
+        if requests:
+            self._route(requests)
+
+    def update_weights(self) -> np.ndarray:
+        """
+        Neue Kosten aus den beobachteten Reisezeiten. Gibt je Street-Zeile
+        den Kostenanstieg gegenüber dem letzten Stand zurück (0, wenn nicht
+        deutlich schlechter).
+        """
+        sim = self.sim
+        tt, vehicles = self.metrics.street_travel_times(self.windows)
+        observed = ~np.isnan(tt)
+        ratio = np.clip(tt[observed] / self.metrics.free_flow[observed], 1.0, self.max_factor)
+        a = self.smoothing
+        factor = self.factor.copy()
+        factor[observed] = (1.0 - a) * factor[observed] + a * ratio
+        # Leere Streets erholen sich; volle ohne Ausfahrt behalten ihren Faktor
+        empty = ~observed & (vehicles == 0)
+        factor[empty] = (1.0 - a) * factor[empty] + a
+        self.factor = factor
+
+        weights = self.weights
+        worse = weights > self.reference * (1.0 + self.threshold)
+        better = weights * (1.0 + self.threshold) < self.reference
+        delta = np.where(worse, weights - self.reference, 0.0)
+        self.reference[worse | better] = weights[worse | better]
+
+        sim.router.set_street_weights(weights)
+        self._version += 1
+        worse_ids = self.metrics.street_ids[worse]
+        invalidated = 0
+        if sim.router.cache is not None and len(worse_ids):
+            invalidated = sim.router.cache.invalidate_streets(worse_ids.tolist())
+        sim.close()  # Spawn-Worker (falls vorhanden) kennen die neuen Kosten nicht
+        self.updates += 1
+        self.worsened += int(worse.sum())
+        if sim.profiler is not None:
+            sim.profiler.count("reroute.updates")
+            sim.profiler.count("reroute.streets_worse", int(worse.sum()))
+            sim.profiler.count("reroute.cache_invalidated", invalidated)
+        return delta
+
+    # ------------------------------------------------------------------
+    # Auswahl
+    # ------------------------------------------------------------------
+    def _select(self, delta: np.ndarray) -> List[Request]:
+        """Fahrzeuge, deren Restroute über deutlich schlechtere Streets führt."""
+        if not delta.any():
+            return []
+        sim = self.sim
+        engine = sim.engine
+        if engine is not None:
+            n = engine.size
+            if n == 0:
+                return []
+            used = engine.route_used
+            # Präfixsummen des Anstiegs über den Routen-Puffer
+            cs = np.zeros(used + 1, dtype=np.float64)
+            np.cumsum(delta[engine.route_buf[:used]], out=cs[1:])
+            off = engine.route_off[:n]
+            ptr = engine.route_ptr[:n].astype(np.int64)
+            end = off + engine.route_len[:n]
+            start = np.minimum(off + ptr + 1, end)
+            rise = cs[end] - cs[start]
+            idx = np.flatnonzero(rise > 0)
+            idx = idx[np.argsort(-rise[idx], kind="stable")[: self.max_reroutes]]
+            cur = engine.street[idx]
+            goal = engine.route_buf[end[idx] - 1]
+            return [
+                (
+                    int(vid),
+                    int(engine.street_ids[c]),
+                    int(p),
+                    (self.end_node[c], self.end_node[g]),
+                )
+                for vid, c, p, g in zip(
+                    engine.vid[idx].tolist(), cur.tolist(), ptr[idx].tolist(), goal.tolist()
+                )
+            ]
+
+        # Objekt-Engine: Restanstieg je geteilter Route einmal berechnen
+        metrics = self.metrics
+        suffix: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        rising: List[Tuple[float, int]] = []
+        vehicles = sim.vehicles
+        for i, v in enumerate(vehicles):
+            route = v.route_streets
+            entry = suffix.get(id(route))
+            if entry is None:
+                rows = metrics.rows(route)
+                rise = np.zeros(len(rows) + 1, dtype=np.float64)
+                rise[:-1] = np.cumsum(delta[rows][::-1])[::-1]
+                entry = suffix[id(route)] = (rise, rows)
+            r = entry[0][v.route_index + 1] if v.route_index + 1 < len(route) else 0.0
+            if r > 0:
+                rising.append((-r, i))
+        rising.sort()
+        requests = []
+        for _, i in rising[: self.max_reroutes]:
+            v = vehicles[i]
+            rows = suffix[id(v.route_streets)][1]
+            requests.append(
+                (
+                    v.vehicle_id,
+                    v.current_street.id,
+                    v.route_index,
+                    (self.end_node[rows[v.route_index]], self.end_node[rows[-1]]),
+                )
+            )
+        return requests
+
+    # ------------------------------------------------------------------
+    # Routen berechnen und übernehmen
+    # ------------------------------------------------------------------
+    def _route(self, requests: List[Request]):
+        sim = self.sim
+        pairs = list(dict.fromkeys(req[3] for req in requests))
+        self.candidates += len(requests)
+        if sim.profiler is not None:
+            sim.profiler.count("reroute.candidates", len(requests))
+            sim.profiler.count("reroute.pairs", len(pairs))
+        if self.processes:
+            if self._pool is None:
+                self._pool = RoutePool(sim.router, self.processes)
+            futures = self._pool.submit(pairs, weights=self.weights)
+            self._pending = (futures, requests, pairs)
+            self._pending_version = self._version
+            return
+        found = {key: tuple(sim.router.route(*key)) for key in pairs}
+        self._apply(requests, found)
+
+    def _apply(self, requests: List[Request], found: Dict[Tuple[str, str], Tuple[int, ...]]):
+        sim = self.sim
+        metrics = self.metrics
+        weights = self.weights
+        engine = sim.engine
+        if engine is not None:
+            n = engine.size
+            sorter = np.argsort(engine.vid[:n], kind="stable")
+            sorted_vid = engine.vid[:n][sorter]
+        else:
+            by_vid = {req[0]: None for req in requests}
+            for v in sim.vehicles:
+                if v.vehicle_id in by_vid:
+                    by_vid[v.vehicle_id] = v
+
+        rerouted = rejected = stale = 0
+        for vid, st_id, index, key in requests:
+            path = found.get(key)
+            if engine is not None:
+                k = int(np.searchsorted(sorted_vid, vid))
+                i = int(sorter[k]) if k < len(sorted_vid) and sorted_vid[k] == vid else -1
+                if (
+                    i < 0
+                    or engine.street_ids[engine.street[i]] != st_id
+                    or engine.route_ptr[i] != index
+                ):
+                    stale += 1
+                    continue
+                off = int(engine.route_off[i])
+                rest = engine.route_buf[off + index + 1 : off + int(engine.route_len[i])]
+                old_cost = float(weights[rest].sum())
+            else:
+                v = by_vid.get(vid)
+                if v is None or v.done or v.current_street.id != st_id or v.route_index != index:
+                    stale += 1
+                    continue
+                rest = v.route_streets[index + 1 :]
+                old_cost = float(weights[metrics.rows(rest)].sum()) if len(rest) else 0.0
+            if not path:
+                rejected += 1
+                continue
+            new_cost = float(weights[metrics.rows(path)].sum())
+            if new_cost >= old_cost * (1.0 - self.min_gain):
+                rejected += 1
+                continue
+            route = (st_id,) + tuple(path)
+            if engine is not None:
+                engine.replace_route(i, route)
+            else:
+                v.route_streets = sim.route_table.intern(route)
+                v.route_index = 0
+                v.plan_turn()
+                # Neue Abbiegung / neuer Vordermann über die Kreuzung
+                sim.lane_index.wake([(st_id, v.lane_index)])
+            rerouted += 1
+
+        self.rerouted += rerouted
+        self.rejected += rejected
+        self.stale += stale
+        if sim.profiler is not None:
+            sim.profiler.count("reroute.applied", rerouted)
+            sim.profiler.count("reroute.rejected", rejected)
+            sim.profiler.count("reroute.stale", stale)
+
+    def stats(self) -> dict:
+        return {
+            "updates": self.updates,
+            "streets_worse": self.worsened,
+            "candidates": self.candidates,
+            "rerouted": self.rerouted,
+            "rejected": self.rejected,
+            "stale": self.stale,
+            "mean_factor": float(self.factor.mean()),
+            "max_factor": float(self.factor.max()),
+        }
@@ -0,0 +1,51 @@
+import weakref
+
+from array import array
+from typing import Sequence
+
+
+class RouteTable:
+    """
+    Gemeinsame Ablage der Fahrzeug-Routen (Street-IDs).
+
+    Viele Fahrzeuge fahren dieselbe Quelle-Ziel-Strecke; intern() liefert
+    für gleiche Routen dasselbe gepackte int32-Array (4 Byte je Street statt
+    Liste + int-Objekte), das alle Fahrzeuge teilen. Routen werden deshalb
+    nie verändert, sondern nur ersetzt.
+
+    Einträge verschwinden von selbst, sobald kein Fahrzeug die Route mehr
+    referenziert (schwache Referenzen).
+    """
+
+    TYPECODE = "i"
+
+    def __init__(self):
+        self._routes: "weakref.WeakValueDictionary[bytes, array]" = (
+            weakref.WeakValueDictionary()
+        )
+        self.requests = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def intern(self, route: Sequence[int]) -> array:
+        """Geteilte, gepackte Fassung von route (Street-IDs)."""
+        packed = array(self.TYPECODE, route)
+        key = packed.tobytes()
+        self.requests += 1
+        shared = self._routes.get(key)
+        if shared is not None:
+            self.hits += 1
+            return shared
+        self._routes[key] = packed
+        return packed
+
+    def stats(self) -> dict:
+        routes = list(self._routes.values())
+        return {
+            "routes": len(routes),
+            "streets": sum(len(r) for r in routes),
+            "requests": self.requests,
+            "hits": self.hits,
+        }
@@ -0,0 +1,540 @@
+import copy
+import heapq
+import math
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple
+
+from .intersection import Intersection
+from .street import Street
+
+
+class CSRGraph:
+    """
+    Kompakter gerichteter Straßengraph im CSR-Format.
+
+    Knoten sind durchnummeriert (node_ids[i] <-> Index i). Die ausgehenden
+    Kanten von Knoten i liegen in indptr[i]:indptr[i+1] von targets
+    (Zielknoten), weights (Kosten, anfangs Street.length) und edge_street
+    (zugehörige Street-ID). Für die Suche werden zusätzlich Listen-Kopien
+    gehalten, da Skalarzugriffe auf Python-Listen schneller sind als auf
+    NumPy-Arrays.
+
+    edge_row ordnet jeder CSR-Kante ihre Eingabe-Kante zu (bei
+    from_network = Street-Zeile in der Reihenfolge von streets), sodass
+    Kosten als Array je Street gesetzt werden können (set_street_weights).
+    """
+
+    def __init__(
+        self,
+        node_ids: List[str],
+        xy: np.ndarray,
+        edge_u: np.ndarray,
+        edge_v: np.ndarray,
+        weights: np.ndarray,
+        edge_street: np.ndarray,
+    ):
+        self.node_ids = list(node_ids)
+        self.node_index: Dict[str, int] = {nid: i for i, nid in enumerate(self.node_ids)}
+        self.num_nodes = len(self.node_ids)
+        self.xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+
+        self.base_weights = np.asarray(weights, dtype=np.float64).copy()
+        (
+            self.indptr,
+            self.targets,
+            self.weights,
+            self.edge_street,
+            self.edge_row,
+        ) = self._to_csr(edge_u, edge_v, weights, edge_street)
+        # Rückwärts-Graph (für die bidirektionale Suche)
+        (
+            self.r_indptr,
+            self.r_targets,
+            self.r_weights,
+            self.r_edge_street,
+            self.r_edge_row,
+        ) = self._to_csr(edge_v, edge_u, weights, edge_street)
+
+        self._indptr = self.indptr.tolist()
+        self._targets = self.targets.tolist()
+        self._weights = self.weights.tolist()
+        self._edge_street = self.edge_street.tolist()
+        self._r_indptr = self.r_indptr.tolist()
+        self._r_targets = self.r_targets.tolist()
+        self._r_weights = self.r_weights.tolist()
+        self._r_edge_street = self.r_edge_street.tolist()
+        # Quellknoten je CSR-Kante (zum Zurückverfolgen der Vorgänger-Kanten)
+        self._sources = np.repeat(
+            np.arange(self.num_nodes), np.diff(self.indptr)
+        ).tolist()
+        self._r_sources = np.repeat(
+            np.arange(self.num_nodes), np.diff(self.r_indptr)
+        ).tolist()
+        self._x = self.xy[:, 0].tolist()
+        self._y = self.xy[:, 1].tolist()
+
+    def _to_csr(self, src, dst, weights, edge_street):
+        src = np.asarray(src, dtype=np.int64)
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.add.at(indptr, src + 1, 1)
+        indptr = np.cumsum(indptr)
+        return (
+            indptr,
+            np.asarray(dst, dtype=np.int64)[order],
+            np.asarray(weights, dtype=np.float64)[order],
+            np.asarray(edge_street, dtype=np.int64)[order],
+            order,
+        )
+
+    @classmethod
+    def from_network(
+        cls, intersections: Dict[str, Intersection], streets: Dict[int, Street]
+    ) -> "CSRGraph":
+        node_ids = list(intersections.keys())
+        node_index = {nid: i for i, nid in enumerate(node_ids)}
+        xy = [(inter.x_coord, inter.y_coord) for inter in intersections.values()]
+        st_list = list(streets.values())
+        return cls(
+            node_ids,
+            np.array(xy, dtype=np.float64),
+            np.array([node_index[st.start_node] for st in st_list], dtype=np.int64),
+            np.array([node_index[st.end_node] for st in st_list], dtype=np.int64),
+            np.array([st.length for st in st_list], dtype=np.float64),
+            np.array([st.id for st in st_list], dtype=np.int64),
+        )
+
+    def out_degree(self, node: int) -> int:
+        return self._indptr[node + 1] - self._indptr[node]
+
+    @property
+    def street_weights(self) -> np.ndarray:
+        """Aktuelle Kosten in Eingabe-Reihenfolge (je Street-Zeile)."""
+        w = np.empty(len(self.weights), dtype=np.float64)
+        w[self.edge_row] = self.weights
+        return w
+
+    def set_street_weights(self, weights: np.ndarray):
+        """
+        Neue Kosten je Eingabe-Kante (Street-Zeile). Arrays und Listen werden
+        ersetzt, nicht verändert: eine flache Kopie des Graphen (Router.branch)
+        behält ihre Kosten.
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        if len(weights) != len(self.weights):
+            raise ValueError(
+                f"{len(weights)} Kosten für {len(self.weights)} Kanten übergeben"
+            )
+        self.weights = weights[self.edge_row]
+        self.r_weights = weights[self.r_edge_row]
+        self._weights = self.weights.tolist()
+        self._r_weights = self.r_weights.tolist()
+
+
+class RouteCache:
+    """
+    Begrenzter LRU-Cache für Routen, Schlüssel (start, goal).
+
+    Nach track_streets() wird zusätzlich je Street gemerkt, welche Einträge
+    über sie führen; invalidate_streets() entfernt dann nur diese Einträge
+    (z. B. wenn sich die Kosten einzelner Streets verschlechtert haben).
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str], Tuple[int, ...]]" = OrderedDict()
+        self._by_street: Optional[Dict[int, set]] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def get(self, key: Tuple[str, str]) -> Optional[Tuple[int, ...]]:
+        route = self._data.get(key)
+        if route is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return route
+
+    def put(self, key: Tuple[str, str], route: Tuple[int, ...]):
+        by_street = self._by_street
+        if by_street is not None:
+            old = self._data.get(key)
+            if old is not None:
+                self._unindex(key, old)
+            for st_id in route:
+                by_street.setdefault(st_id, set()).add(key)
+        self._data[key] = route
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            old_key, old = self._data.popitem(last=False)
+            if by_street is not None:
+                self._unindex(old_key, old)
+
+    def clear(self):
+        self._data.clear()
+        if self._by_street is not None:
+            self._by_street = {}
+
+    def _unindex(self, key: Tuple[str, str], route: Tuple[int, ...]):
+        by_street = self._by_street
+        for st_id in route:
+            keys = by_street.get(st_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del by_street[st_id]
+
+    def track_streets(self):
+        """Baut den Street-Index auf (danach bei jedem put gepflegt)."""
+        if self._by_street is not None:
+            return
+        self._by_street = {}
+        for key, route in self._data.items():
+            for st_id in route:
+                self._by_street.setdefault(st_id, set()).add(key)
+
+    def invalidate_streets(self, street_ids) -> int:
+        """Entfernt alle Einträge, deren Route eine der Streets enthält."""
+        self.track_streets()
+        keys = set()
+        for st_id in street_ids:
+            keys.update(self._by_street.get(st_id, ()))
+        for key in keys:
+            self._unindex(key, self._data.pop(key))
+        self.invalidated += len(keys)
+        return len(keys)
+
+
+class Router:
+    """
+    Kürzeste Wege auf einem CSRGraph.
+
+    Dijkstra und A* arbeiten mit Vorgänger-Arrays statt kopierter Pfadlisten;
+    die Arrays werden zwischen Anfragen wiederverwendet und nur an den
+    berührten Knoten zurückgesetzt. Ergebnisse landen in einem LRU-Cache.
+    """
+
+    METHODS = ("astar", "dijkstra", "bidirectional", "ch")
+
+    def __init__(
+        self,
+        graph: CSRGraph,
+        cache_size: int = 10000,
+        method: str = "astar",
+        ch=None,
+    ):
+        if method not in self.METHODS:
+            raise ValueError(f"Unbekannte Routing-Methode: {method}")
+        if method == "ch" and ch is None:
+            raise ValueError("Routing-Methode 'ch' braucht eine ContractionHierarchy")
+        self.graph = graph
+        self.method = method
+        # Optional: Contraction Hierarchy (siehe contraction.py)
+        self.ch = ch
+        # Nach set_street_weights passt die Hierarchie nicht mehr zu den
+        # Kosten; "ch" sucht dann per A*
+        self.ch_stale = False
+        self.cache = RouteCache(cache_size) if cache_size > 0 else None
+
+        n = graph.num_nodes
+        inf = math.inf
+        self._dist = [inf] * n
+        self._pred = [-1] * n  # Kanten-Index in targets/edge_street
+        self._r_dist = [inf] * n
+        self._r_pred = [-1] * n
+        self._touched: List[int] = []
+        self._r_touched: List[int] = []
+        # Zähler (Suchen ohne Cache-Treffer, dabei berührte Knoten)
+        self.searches = 0
+        self.nodes_touched = 0
+
+    @classmethod
+    def from_network(
+        cls,
+        intersections: Dict[str, Intersection],
+        streets: Dict[int, Street],
+        **kwargs,
+    ) -> "Router":
+        return cls(CSRGraph.from_network(intersections, streets), **kwargs)
+
+    def route(self, start_n: str, goal_n: str) -> List[int]:
+        """
+        Gibt eine Liste von Street-IDs zurück, die vom Start- zum Ziel-Knoten
+        führen (leer, falls unerreichbar oder start == goal).
+        """
+        key = (start_n, goal_n)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return list(cached)
+        route = self.search(start_n, goal_n)
+        if self.cache is not None:
+            self.cache.put(key, route)
+        return list(route)
+
+    def search(self, start_n: str, goal_n: str) -> Tuple[int, ...]:
+        """Wie route, aber ohne Cache (weder nachsehen noch eintragen)."""
+        g = self.graph
+        s = g.node_index.get(start_n)
+        t = g.node_index.get(goal_n)
+        if s is None or t is None or s == t:
+            route: Tuple[int, ...] = ()
+        elif self.method == "astar" or (self.method == "ch" and self.ch_stale):
+            route = self.astar(s, t)
+        elif self.method == "ch":
+            route = self.ch.route(s, t)
+        elif self.method == "bidirectional":
+            route = self.bidirectional(s, t)
+        else:
+            route = self.dijkstra(s, t)
+        self.searches += 1
+        self.nodes_touched += len(self._touched) + len(self._r_touched)
+        return route
+
+    def set_street_weights(self, weights: np.ndarray):
+        """
+        Neue Kantenkosten je Street-Zeile (siehe CSRGraph.set_street_weights).
+        Der Cache bleibt bestehen; betroffene Einträge mit
+        cache.invalidate_streets entfernen. Für A* dürfen die Kosten die
+        Länge nicht unterschreiten (Heuristik = Luftlinie).
+        """
+        self.graph.set_street_weights(weights)
+        if self.ch is not None:
+            self.ch_stale = True
+
+    def branch(self) -> "Router":
+        """
+        Unabhängige Kopie für Simulator.fork(): eigener Graph-Kopf (CSR-
+        Arrays geteilt, Kosten danach getrennt) und eigener Cache-Inhalt.
+        """
+        other = copy.copy(self)
+        other.graph = copy.copy(self.graph)
+        if self.cache is not None:
+            other.cache = RouteCache(self.cache.maxsize)
+            for key, route in self.cache._data.items():
+                other.cache.put(key, route)
+        n = self.graph.num_nodes
+        other._dist = [math.inf] * n
+        other._pred = [-1] * n
+        other._r_dist = [math.inf] * n
+        other._r_pred = [-1] * n
+        other._touched = []
+        other._r_touched = []
+        return other
+
+    def _reset(self):
+        inf = math.inf
+        dist, pred = self._dist, self._pred
+        for i in self._touched:
+            dist[i] = inf
+            pred[i] = -1
+        self._touched = []
+        r_dist, r_pred = self._r_dist, self._r_pred
+        for i in self._r_touched:
+            r_dist[i] = inf
+            r_pred[i] = -1
+        self._r_touched = []
+
+    def _unwind(self, t: int) -> Tuple[int, ...]:
+        """Pfad über die Vorgänger-Kanten von t zurück bis zum Start."""
+        g = self.graph
+        pred = self._pred
+        sources = g._sources
+        edge_street = g._edge_street
+        path = []
+        e = pred[t]
+        while e >= 0:
+            path.append(edge_street[e])
+            e = pred[sources[e]]
+        path.reverse()
+        return tuple(path)
+
+    def dijkstra(self, s: int, t: int) -> Tuple[int, ...]:
+        return self._search(s, t, use_heuristic=False)
+
+    def astar(self, s: int, t: int) -> Tuple[int, ...]:
+        return self._search(s, t, use_heuristic=True)
+
+    def _search(self, s: int, t: int, use_heuristic: bool) -> Tuple[int, ...]:
+        self._reset()
+        g = self.graph
+        indptr, targets, weights = g._indptr, g._targets, g._weights
+        dist, pred, touched = self._dist, self._pred, self._touched
+        xs, ys = g._x, g._y
+        tx, ty = xs[t], ys[t]
+        hypot = math.hypot
+
+        dist[s] = 0.0
+        touched.append(s)
+        h0 = hypot(xs[s] - tx, ys[s] - ty) if use_heuristic else 0.0
+        heap = [(h0, 0.0, s)]
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            if u == t:
+                return self._unwind(t)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = targets[e]
+                nd = d + weights[e]
+                if nd < dist[v]:
+                    if dist[v] == math.inf:
+                        touched.append(v)
+                    dist[v] = nd
+                    pred[v] = e
+                    h = hypot(xs[v] - tx, ys[v] - ty) if use_heuristic else 0.0
+                    heapq.heappush(heap, (nd + h, nd, v))
+        return ()
+
+    def bidirectional(self, s: int, t: int) -> Tuple[int, ...]:
+        """
+        Bidirektionaler Dijkstra: vorwärts ab s, rückwärts ab t, bis die
+        Summe der Heap-Minima den besten Treffpunkt nicht mehr verbessern kann.
+        """
+        self._reset()
+        g = self.graph
+        inf = math.inf
+        dist, pred, touched = self._dist, self._pred, self._touched
+        r_dist, r_pred, r_touched = self._r_dist, self._r_pred, self._r_touched
+        dist[s] = 0.0
+        touched.append(s)
+        r_dist[t] = 0.0
+        r_touched.append(t)
+        f_heap = [(0.0, s)]
+        b_heap = [(0.0, t)]
+        best = inf
+        meet = -1
+
+        while f_heap and b_heap:
+            if f_heap[0][0] + b_heap[0][0] >= best:
+                break
+            forward = f_heap[0][0] <= b_heap[0][0]
+            if forward:
+                heap, d_own, p_own, t_own, d_other = f_heap, dist, pred, touched, r_dist
+                indptr, targets, weights = g._indptr, g._targets, g._weights
+            else:
+                heap, d_own, p_own, t_own, d_other = b_heap, r_dist, r_pred, r_touched, dist
+                indptr, targets, weights = g._r_indptr, g._r_targets, g._r_weights
+            d, u = heapq.heappop(heap)
+            if d > d_own[u]:
+                continue
+            for e in range(indptr[u], indptr[u + 1]):
+                v = targets[e]
+                nd = d + weights[e]
+                if nd < d_own[v]:
+                    if d_own[v] == inf:
+                        t_own.append(v)
+                    d_own[v] = nd
+                    p_own[v] = e
+                    heapq.heappush(heap, (nd, v))
+                if d_other[v] < inf and nd + d_other[v] < best:
+                    best = nd + d_other[v]
+                    meet = v
+
+        if meet < 0:
+            return ()
+        # Vorwärtsteil s -> meet, Rückwärtsteil meet -> t
+        head = self._unwind(meet) if meet != s else ()
+        tail = []
+        e = r_pred[meet]
+        while e >= 0:
+            tail.append(g._r_edge_street[e])
+            e = r_pred[g._r_sources[e]]
+        return head + tuple(tail)
+
+
+# Router der Worker-Prozesse (per fork geerbt bzw. per Initializer gesetzt)
+_WORKER_ROUTER: Optional[Router] = None
+
+
+def _init_route_worker(router: Optional[Router]):
+    global _WORKER_ROUTER
+    if router is not None:
+        _WORKER_ROUTER = router
+
+
+def _route_chunk(
+    pairs: List[Tuple[str, str]], weights: Optional[np.ndarray] = None
+) -> List[Tuple[int, ...]]:
+    router = _WORKER_ROUTER
+    if weights is not None:
+        # Kosten des Eltern-Prozesses übernehmen; eigener Cache ist dann veraltet
+        router.set_street_weights(weights)
+        if router.cache is not None:
+            router.cache.clear()
+    return [tuple(router.route(s, g)) for s, g in pairs]
+
+
+class RoutePool:
+    """
+    Prozess-Pool, der viele (start, goal)-Paare parallel routet.
+
+    Unter Linux werden die Worker per fork gestartet und erben den Router
+    (CSR-Arrays, ggf. Contraction Hierarchy) read-only, ohne ihn zu
+    serialisieren. Sonst wird der Router einmal pro Worker übergeben.
+    Ergebnisse werden in den Cache des Eltern-Routers übernommen.
+    """
+
+    def __init__(self, router: Router, processes: Optional[int] = None):
+        global _WORKER_ROUTER
+        self.router = router
+        self.processes = processes or os.cpu_count() or 1
+        methods = multiprocessing.get_all_start_methods()
+        if "fork" in methods:
+            _WORKER_ROUTER = router
+            ctx = multiprocessing.get_context("fork")
+            initargs = (None,)
+        else:
+            ctx = multiprocessing.get_context()
+            initargs = (router,)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=ctx,
+            initializer=_init_route_worker,
+            initargs=initargs,
+        )
+
+    def submit(
+        self,
+        pairs: List[Tuple[str, str]],
+        weights: Optional[np.ndarray] = None,
+        chunk_size: int = 256,
+    ) -> List[Future]:
+        """
+        Routet im Hintergrund (ohne zu warten); ein Future je Chunk. Mit
+        weights rechnen die Worker mit diesen Kosten je Street-Zeile.
+        Ergebnisse werden nicht in den Cache übernommen.
+        """
+        return [
+            self._executor.submit(_route_chunk, pairs[i : i + chunk_size], weights)
+            for i in range(0, len(pairs), chunk_size)
+        ]
+
+    def route_many(
+        self, pairs: List[Tuple[str, str]], chunk_size: int = 256
+    ) -> List[Tuple[int, ...]]:
+        chunks = [pairs[i : i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+        result: List[Tuple[int, ...]] = []
+        for part in self._executor.map(_route_chunk, chunks):
+            result.extend(part)
+        if self.router.cache is not None:
+            for key, route in zip(pairs, result):
+                self.router.cache.put(key, route)
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=True)
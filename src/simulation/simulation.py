@@ -1,64 +1,287 @@
+import copy
 import random
 import math
 import heapq
 import time
 import logging
-import osmnx as ox
-import networkx as nx
-import shapely
-import shapely.geometry
-import shapely.ops
+import os
+import numpy as np
 
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Sequence, Tuple, Optional
 
-from .TrafficLight import TrafficLightController
+from .checkpoint import load_checkpoint, save_checkpoint
 from .intersection import Intersection
+from .lane_index import LaneOccupancy, lane_order_key
+from .light_scheduler import TrafficLightScheduler
+from .meso import MesoModel, streets_near
+from .metrics import StreamingMetrics
+from .contraction import CH_FILE, ContractionHierarchy
+from .demand import Demand
+from .network_cache import (
+    DEFAULT_CACHE_DIR,
+    CompiledNetwork,
+    cache_is_current,
+    load_network,
+    network_key,
+    network_path,
+)
+from .osm_import import graph_to_network, import_osmnx, parse_turn_lanes
+from .reroute import Rerouter
+from .route_table import RouteTable
+from .routing import CSRGraph, RoutePool, Router
 from .street import Street
+from .turns import build_turn_table
+from .vectorized import VectorizedEngine
 from .vehicle import VEHICLE_PROFILES, Vehicle
+from ..utils.profiling import Profiler, null_phase
 
+# Standard-Mittelpunkt: Berlin-Mitte
+BERLIN_CENTER = (52.52, 13.405)
 
-class Simulator:
-    ox.settings.timeout = 300
-    ox.settings.log_console = True
-    ox.settings.use_cache = True
 
-    def __init__(self, place_name: str, dist_m=5000):
-        # 1) Baue City Graph
-        self.intersections, self.streets = self.build_city_graph(dist_m)
+class Simulator:
+    def __init__(
+        self,
+        place_name: str,
+        dist_m=5000,
+        center: Tuple[float, float] = BERLIN_CENTER,
+        network_type: str = "drive",
+        network_file: Optional[str] = None,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        engine: str = "objects",
+        route_method: str = "astar",
+        route_cache_size: int = 10000,
+        seed: Optional[int] = None,
+        network: Optional[Tuple[Dict[str, Intersection], Dict[int, Street]]] = None,
+        sleep_idle: bool = False,
+    ):
+        # 1) Baue City Graph (fertige Maps, lokale Datei/Cache oder Download)
+        if network is not None:
+            self.intersections, self.streets = network
+        elif network_file:
+            self.intersections, self.streets = load_network(
+                network_file, cache_dir=cache_dir
+            )
+        else:
+            self.intersections, self.streets = self.build_city_graph(
+                dist_m, center=center, network_type=network_type, cache_dir=cache_dir
+            )
         # 2) adjacency
         self.adjacency = self.build_adjacency(
             self.intersections, self.streets, bidir=False
         )
+        # Abbiege-Richtungen je verbundenem Street-Paar (für Vehicle.plan_turn)
+        build_turn_table(self.streets)
+
+        # Verzeichnis des kompilierten Netzes (None = kein Cache)
+        self.network_path = (
+            network_path(cache_dir, network_file, center, dist_m, network_type)
+            if network is None
+            else None
+        )
+
+        # 2b) Routing auf kompaktem CSR-Graph (A*/Dijkstra/CH + LRU-Cache)
+        graph = CSRGraph.from_network(self.intersections, self.streets)
+        ch = None
+        if route_method == "ch":
+            ch_path = (
+                os.path.join(self.network_path, CH_FILE) if self.network_path else None
+            )
+            ch = ContractionHierarchy.load_or_build(graph, ch_path)
+        self.router = Router(
+            graph, cache_size=route_cache_size, method=route_method, ch=ch
+        )
 
         # 3) Finde Randknoten (Spawn)
         self.spawn_nodes = self._find_boundary_nodes()
 
-        # Liste Fahrzeuge
+        # Liste Fahrzeuge; gleiche Routen teilen sich ein gepacktes Array
         self.vehicles: List[Vehicle] = []
+        self.route_table = RouteTable()
         self.next_vid = 1000
+        # Persistente Spurbelegung (street_id, lane) -> Fahrzeuge von vorne nach hinten
+        self.lane_index = LaneOccupancy()
+        # Stehende Fahrzeuge schlafen lassen (nur Objekt-Engine, siehe
+        # _update_lanes_sleeping); dt des letzten Ticks
+        self.sleep_idle = sleep_idle
+        self._sleep_dt: Optional[float] = None
+
+        # Nur für den partitionierten Betrieb (siehe partition.py):
+        # eigene Streets, Übergaben an andere Regionen, deren hinterste
+        # Fahrzeuge auf Grenz-Streets
+        self.owned_streets: Optional[set] = None
+        self.outbox: List[Vehicle] = []
+        self.foreign_rears: Optional[Dict[Tuple[int, int], float]] = None
+
+        # Eigener Zufallsgenerator (reproduzierbar über seed)
+        self.rng = random.Random(seed)
+        # Standardwerte für spawn_vehicles (gelten auch fürs Nachspawnen in step)
+        self.profile_mix: Optional[Dict[str, float]] = None
+        self.spawn_processes: Optional[int] = None
+        # Anteil fertiger Fahrzeuge, die in step neu gespawnt werden
+        self.respawn_rate = 0.7
+        # Optionale Nachfrage aus Dateien (siehe load_demand)
+        self.demand: Optional[Demand] = None
+        # Prozess-Pool fürs Routing in spawn_vehicles (lazy)
+        self._route_pool: Optional[RoutePool] = None
+
+        # Optionaler Trajektorien-Recorder (wird nach jedem step aufgerufen)
+        self.recorder = None
+        # Optionale Messungen (siehe enable_profiling) und Tick-Zähler
+        self.profiler: Optional[Profiler] = None
+        self.ticks = 0
+        # Im letzten Tick beendete Fahrten (auch ohne Profiler, z. B. für sweep.py)
+        self.last_removed = 0
+        # Optionale laufende Verkehrskennzahlen (siehe enable_metrics)
+        self.metrics: Optional[StreamingMetrics] = None
+        # Optionales staubewusstes Umrouten (siehe enable_rerouting)
+        self.rerouter: Optional[Rerouter] = None
+        # Optionale mesoskopische Streets (siehe enable_meso)
+        self.meso: Optional[MesoModel] = None
+
+        # Simulationszeit (s) und ereignisgesteuerte Ampelsteuerung
+        self.time = 0.0
+        self.light_scheduler = TrafficLightScheduler(
+            [
+                inter.traffic_lights
+                for inter in self.intersections.values()
+                if inter.traffic_lights
+            ],
+            now=self.time,
+        )
+
+        # Optional: vektorisierte Engine (Fahrzeuge in NumPy-Arrays statt Objekten)
+        self.engine: Optional[VectorizedEngine] = None
+        if engine == "vectorized":
+            self.engine = VectorizedEngine(
+                self.intersections, self.streets, scheduler=self.light_scheduler
+            )
+        elif engine != "objects":
+            raise ValueError(f"Unbekannte Engine: {engine}")
+
+    @classmethod
+    def from_network(
+        cls,
+        intersections: Dict[str, Intersection],
+        streets: Dict[int, Street],
+        place_name: str = "custom",
+        **kwargs,
+    ) -> "Simulator":
+        """
+        Simulator auf bereits vorhandenen Intersection-/Street-Maps
+        (z. B. aus synthetic.py), ohne osmnx-Download oder Netz-Cache.
+        """
+        return cls(place_name, network=(intersections, streets), **kwargs)
+
+    def vehicle_count(self) -> int:
+        meso = len(self.meso) if self.meso is not None else 0
+        if self.engine is not None:
+            return len(self.engine) + meso
+        return len(self.vehicles) + meso
+
+    def vehicle_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Momentaufnahme aller Fahrzeuge als Spalten (vid, street, lane,
+        position_s, speed), für beide Engines ohne Vehicle-Objekte zu bauen.
+        Fahrzeuge auf mesoskopischen Streets stehen am Ende, ihre Position
+        ist aus der Reisezeit interpoliert.
+        """
+        cols = self._micro_columns()
+        if self.meso is not None and len(self.meso):
+            meso = self.meso.columns(self.time)
+            cols = {
+                name: np.concatenate([col, meso[name].astype(col.dtype)])
+                for name, col in cols.items()
+            }
+        return cols
+
+    def _micro_columns(self) -> Dict[str, np.ndarray]:
+        engine = self.engine
+        if engine is not None:
+            n = engine.size
+            return {
+                "vid": engine.vid[:n].copy(),
+                "street": engine.street_ids[engine.street[:n]],
+                "lane": engine.lane[:n].copy(),
+                "position_s": engine.position_s[:n].copy(),
+                "speed": engine.speed[:n].copy(),
+            }
+        vehicles = self.vehicles
+        n = len(vehicles)
+        return {
+            "vid": np.fromiter(
+                (v.vehicle_id for v in vehicles), dtype=np.int64, count=n
+            ),
+            "street": np.fromiter(
+                (v.current_street.id for v in vehicles), dtype=np.int64, count=n
+            ),
+            "lane": np.fromiter(
+                (v.lane_index for v in vehicles), dtype=np.int32, count=n
+            ),
+            "position_s": np.fromiter(
+                (v.position_s for v in vehicles), dtype=np.float64, count=n
+            ),
+            "speed": np.fromiter((v.speed for v in vehicles), dtype=np.float64, count=n),
+        }
 
     def dijkstra_route(
         self, adj: Dict[str, List[Tuple[str, float, int]]], start_n: str, goal_n: str
     ) -> List[int]:
         """
         Gibt eine Liste von Street-IDs zurück, die vom Start- zum Ziel-Knoten führen.
+        Merkt sich pro Knoten nur die Vorgänger-Kante; der Pfad wird erst am
+        Ziel zurückverfolgt (für schnelles Routing siehe self.router).
         """
-        heap = [(0.0, start_n, [])]
-        visited = set()
+        prof = self.profiler
+        if prof is None:
+            return self._dijkstra_route(adj, start_n, goal_n)
+        visited: set = set()
+        with prof.phase("dijkstra_route"):
+            route = self._dijkstra_route(adj, start_n, goal_n, visited)
+        prof.count("dijkstra.routes")
+        prof.count("dijkstra.nodes_expanded", len(visited))
+        prof.observe("dijkstra.nodes_expanded", len(visited))
+        return route
+
+    def _dijkstra_route(
+        self,
+        adj: Dict[str, List[Tuple[str, float, int]]],
+        start_n: str,
+        goal_n: str,
+        visited: Optional[set] = None,
+    ) -> List[int]:
+        heap = [(0.0, start_n)]
+        best = {start_n: 0.0}
+        pred: Dict[str, Tuple[str, int]] = {}
+        if visited is None:
+            visited = set()
         while heap:
-            dist, node, path_st = heapq.heappop(heap)
+            dist, node = heapq.heappop(heap)
             if node in visited:
                 continue
             visited.add(node)
             if node == goal_n:
+                path_st = []
+                while node != start_n:
+                    node, st_id = pred[node]
+                    path_st.append(st_id)
+                path_st.reverse()
                 return path_st
             for nbr, cost, st_id in adj[node]:
                 if nbr not in visited:
                     new_dist = dist + cost
-                    new_path = path_st + [st_id]
-                    heapq.heappush(heap, (new_dist, nbr, new_path))
+                    if new_dist < best.get(nbr, math.inf):
+                        best[nbr] = new_dist
+                        pred[nbr] = (node, st_id)
+                        heapq.heappush(heap, (new_dist, nbr))
         return []
 
+    def route(self, start_n: str, goal_n: str) -> List[int]:
+        """
+        Route (Street-IDs) von start_n nach goal_n über den Router (mit Cache).
+        """
+        return self.router.route(start_n, goal_n)
+
     def _find_boundary_nodes(self) -> List[str]:
         """
         Wähle Knoten, die potenziell am Rand sind (out_degree=1 in adjacency).
@@ -69,78 +292,763 @@ class Simulator:
                 boundary.append(node)
         return boundary
 
-    def update_traffic_lights(self, dt: float):
-        for inter in self.intersections.values():
-            if inter.traffic_lights:
-                inter.traffic_lights.update(dt)
+    def update_traffic_lights(self, dt: float) -> List[int]:
+        """
+        Ampeln auf die aktuelle Simulationszeit bringen. Der Scheduler fasst
+        nur Kreuzungen an, deren Phase jetzt wechselt (Indizes als Rückgabe).
+        Mit sleep_idle werden die Zufahrtsspuren dieser Kreuzungen geweckt.
+        """
+        changed = self.light_scheduler.advance(self.time)
+        if self.sleep_idle and changed:
+            controllers = self.light_scheduler.controllers
+            for c in changed:
+                self.lane_index.wake(controllers[c].spurs)
+        return changed
+
+    def set_timing_plan(
+        self,
+        node_id: str,
+        durations: Optional[Dict[int, float]] = None,
+        offset: Optional[float] = None,
+    ):
+        """
+        Eigener Ampel-Zeitplan für eine Kreuzung (Dauer je Phase wie
+        PHASE_DURATIONS) und/oder Versatz des Umlaufs in Sekunden.
+        """
+        tl = self.intersections[node_id].traffic_lights
+        if tl is None:
+            raise KeyError(f"Kreuzung {node_id} hat keine Ampel")
+        self.light_scheduler.set_plan(tl._index, durations, offset)
 
     def spawn_vehicle(self):
+        prof = self.profiler
+        if prof is None:
+            self._spawn_vehicle()
+            return
+        before = self.next_vid
+        with prof.phase("spawn_vehicle"):
+            self._spawn_vehicle()
+        prof.count("vehicles.spawned", self.next_vid - before)
+
+    def _spawn_vehicle(self):
         if not self.spawn_nodes:
             return
-        start_n = random.choice(self.spawn_nodes)
-        goal_n = random.choice(self.spawn_nodes)
+        start_n = self.rng.choice(self.spawn_nodes)
+        goal_n = self.rng.choice(self.spawn_nodes)
         while goal_n == start_n:
-            goal_n = random.choice(self.spawn_nodes)
-        route_st = self.dijkstra_route(self.adjacency, start_n, goal_n)
+            goal_n = self.rng.choice(self.spawn_nodes)
+        route_st = self.route(start_n, goal_n)
         if not route_st:
             return
         # Hole die erste Street
         first_st_id = route_st[0]
         st_obj = self.streets[first_st_id]
         # Lane
-        lane_idx = random.randint(0, st_obj.num_lanes - 1)
+        lane_idx = self.rng.randint(0, st_obj.num_lanes - 1)
         # Profile
-        prof = random.choice(list(VEHICLE_PROFILES.keys()))
+        prof = self.rng.choice(list(VEHICLE_PROFILES.keys()))
+        if self.metrics is not None:
+            self.metrics.on_spawn([self.next_vid], [first_st_id], self.time)
+        if self.meso is not None and first_st_id in self.meso.meso_ids:
+            self.meso.enter([self.next_vid], [prof], [lane_idx], [route_st], [0], self.time)
+            self.next_vid += 1
+            return
+        if self.engine is not None:
+            self.engine.add_vehicle(self.next_vid, prof, first_st_id, lane_idx, route_st)
+            self.next_vid += 1
+            return
         v = Vehicle(
             vehicle_id=self.next_vid,
             profile=prof,
             current_street=st_obj,
             lane_index=lane_idx,
-            route_streets=route_st,
+            route_streets=self.route_table.intern(route_st),
             streets_map=self.streets,
             intersections_map=self.intersections,
         )
         self.next_vid += 1
         self.vehicles.append(v)
+        self.lane_index.add(v)
+
+    def spawn_vehicles(
+        self,
+        n: int,
+        profile_mix: Optional[Dict[str, float]] = None,
+        processes: Optional[int] = None,
+        min_parallel: int = 500,
+    ) -> int:
+        """
+        Spawnt n Fahrzeuge gebündelt:
+        1) OD-Paare und Profile auf einmal ziehen (profile_mix = Gewichte je
+           Profil, Standard: self.profile_mix, sonst
+           gleichverteilt über VEHICLE_PROFILES).
+        2) Doppelte OD-Paare nur einmal routen; nicht gecachte Routen ab
+           min_parallel Stück im Prozess-Pool (processes=1 => ohne Pool).
+        3) Alle Fahrzeuge in einem Rutsch einfügen.
+        Gibt die Anzahl tatsächlich gespawnter Fahrzeuge zurück
+        (unerreichbare Ziele werden übersprungen).
+        """
+        phase = self.profiler.phase if self.profiler is not None else null_phase
+        with phase("spawn_vehicles.sample"):
+            spawns = self._sample_spawns(n, profile_mix, processes, min_parallel)
+        with phase("spawn_vehicles.insert"):
+            self._insert_spawns(spawns)
+        if self.profiler is not None:
+            self.profiler.count("vehicles.spawned", len(spawns))
+            for _, _, _, route_st in spawns:
+                self.profiler.observe("route.streets", len(route_st))
+        return len(spawns)
+
+    def _sample_spawns(
+        self,
+        n: int,
+        profile_mix: Optional[Dict[str, float]] = None,
+        processes: Optional[int] = None,
+        min_parallel: int = 500,
+    ) -> List[Tuple[int, str, int, Sequence[int]]]:
+        """
+        Zieht und routet n neue Fahrzeuge, ohne sie einzufügen.
+        Liefert (vehicle_id, profile, lane_index, route_streets) je Fahrzeug.
+        """
+        if n <= 0 or len(self.spawn_nodes) < 2:
+            return []
+        if profile_mix is None:
+            profile_mix = self.profile_mix
+        if processes is None:
+            processes = self.spawn_processes
+        rng = self.rng
+        starts = rng.choices(self.spawn_nodes, k=n)
+        goals = rng.choices(self.spawn_nodes, k=n)
+        for i in range(n):
+            while goals[i] == starts[i]:
+                goals[i] = rng.choice(self.spawn_nodes)
+        names = list(VEHICLE_PROFILES.keys())
+        weights = [profile_mix.get(p, 0.0) for p in names] if profile_mix else None
+        profiles = rng.choices(names, weights=weights, k=n)
+
+        routes = self._route_pairs(list(zip(starts, goals)), processes, min_parallel)
+
+        spawns: List[Tuple[int, str, int, Sequence[int]]] = []
+        for route_st, prof in zip(routes, profiles):
+            if not route_st:
+                continue
+            st_obj = self.streets[route_st[0]]
+            lane_idx = rng.randint(0, st_obj.num_lanes - 1)
+            spawns.append(
+                (self.next_vid, prof, lane_idx, self.route_table.intern(route_st))
+            )
+            self.next_vid += 1
+        return spawns
+
+    def _insert_spawns(self, spawns: List[Tuple[int, str, int, Sequence[int]]]):
+        """Fügt mit _sample_spawns gezogene Fahrzeuge in einem Rutsch ein."""
+        if not spawns:
+            return
+        if self.metrics is not None:
+            self.metrics.on_spawn(
+                [sp[0] for sp in spawns], [sp[3][0] for sp in spawns], self.time
+            )
+        if self.meso is not None:
+            spawns = self.meso.take_spawns(spawns, self.time)
+            if not spawns:
+                return
+        if self.engine is not None:
+            vids, profiles, lanes, routes = map(list, zip(*spawns))
+            self.engine.add_vehicles(vids, profiles, lanes, routes)
+            return
+        new_vehicles = [
+            Vehicle(
+                vehicle_id=vid,
+                profile=prof,
+                current_street=self.streets[route_st[0]],
+                lane_index=ln,
+                route_streets=route_st,
+                streets_map=self.streets,
+                intersections_map=self.intersections,
+            )
+            for vid, prof, ln, route_st in spawns
+        ]
+        self.vehicles.extend(new_vehicles)
+        for v in new_vehicles:
+            self.lane_index.add(v)
+
+    def _route_pairs(
+        self,
+        pairs: List[Tuple[str, str]],
+        processes: Optional[int],
+        min_parallel: int,
+    ) -> List[Tuple[int, ...]]:
+        """
+        Routen für viele OD-Paare: erst Cache, dann (dedupliziert) lokal
+        oder im Prozess-Pool.
+        """
+        cache = self.router.cache
+        found: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+        missing: List[Tuple[str, str]] = []
+        for key in pairs:
+            if key in found:
+                continue
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                found[key] = cached
+            else:
+                found[key] = ()
+                missing.append(key)
+
+        if missing:
+            procs = processes or os.cpu_count() or 1
+            if procs > 1 and len(missing) >= min_parallel:
+                if self._route_pool is None or self._route_pool.processes != procs:
+                    self.close()
+                    self._route_pool = RoutePool(self.router, procs)
+                computed = self._route_pool.route_many(missing)
+            else:
+                # Cache wurde oben schon befragt: direkt suchen, dann eintragen
+                router = self.router
+                computed = [router.search(s, g) for s, g in missing]
+                if cache is not None:
+                    for key, route in zip(missing, computed):
+                        cache.put(key, route)
+            for key, route in zip(missing, computed):
+                found[key] = route
+        if self.profiler is not None:
+            self.profiler.count("routes.requested", len(pairs))
+            self.profiler.count("routes.computed", len(missing))
+        return [found[key] for key in pairs]
+
+    def load_demand(
+        self,
+        source,
+        kind: str = "trips",
+        lookahead: float = 300.0,
+        seed: Optional[int] = None,
+        processes: Optional[int] = None,
+    ) -> Demand:
+        """
+        Nachfrage aus einer Datei (kind = "trips": Fahrtenliste, "od":
+        OD-Matrizen je Zeitscheibe) oder einem nach Abfahrt sortierten
+        Iterator von (depart, origin, destination, profile), siehe demand.py.
+        Schaltet das zufällige Nachspawnen ab (respawn_rate = 0).
+        """
+        if isinstance(source, str):
+            demand = Demand.from_file(
+                self, source, kind=kind, seed=seed, lookahead=lookahead, processes=processes
+            )
+        else:
+            demand = Demand(
+                self, source, lookahead=lookahead, seed=seed, processes=processes
+            )
+        self.demand = demand
+        self.respawn_rate = 0.0
+        return demand
+
+    def close(self):
+        """Beendet den Routing-Pool (falls gestartet)."""
+        if self._route_pool is not None:
+            self._route_pool.close()
+            self._route_pool = None
+
+    def enable_profiling(self, trace: bool = False) -> Profiler:
+        """
+        Schaltet Messungen in step/spawn/dijkstra_route ein (Phasen-Timer,
+        Zähler, Histogramme; mit trace=True auch als Chrome-Trace).
+        """
+        self.profiler = Profiler(trace=trace)
+        self._router_baseline = (self.router.searches, self.router.nodes_touched)
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
+
+    def enable_metrics(
+        self,
+        window: float = 60.0,
+        history: int = 60,
+        path: Optional[str] = None,
+        chunk_windows: int = 10,
+    ) -> StreamingMetrics:
+        """
+        Schaltet laufende Kennzahlen je Street/Kreuzung ein (Fluss, Dichte,
+        Tempo, Warteschlange, Verlust- und Reisezeiten in Zeitfenstern),
+        optional blockweise nach `path` (.csv/.parquet) geschrieben, siehe
+        metrics.py. Reisezeiten gibt es nur für danach gespawnte Fahrzeuge.
+        """
+        self.metrics = StreamingMetrics(
+            self.intersections,
+            self.streets,
+            window=window,
+            history=history,
+            path=path,
+            chunk_windows=chunk_windows,
+            start_time=self.time,
+        )
+        if self.engine is not None:
+            self.engine.transitions = []
+        return self.metrics
+
+    def disable_metrics(self):
+        """Schaltet die Kennzahlen ab und schreibt offene Fenster."""
+        self.disable_rerouting()
+        if self.metrics is not None:
+            self.metrics.close()
+        self.metrics = None
+        if self.engine is not None:
+            self.engine.transitions = None
+
+    def enable_rerouting(self, interval: float = 60.0, **kwargs) -> Rerouter:
+        """
+        Schaltet das Umrouten nach beobachteten Reisezeiten ein (siehe
+        reroute.py; kwargs gehen an Rerouter). Schaltet bei Bedarf die
+        Kennzahlen mit Fenstern von `interval` Sekunden ein. Der Router
+        bekommt eigene Kosten, damit Verzweigungen (fork) unberührt bleiben.
+        """
+        if self.metrics is None:
+            self.enable_metrics(window=interval)
+        self.disable_rerouting()
+        self.close()
+        self.router = self.router.branch()
+        self.rerouter = Rerouter(self, interval=interval, **kwargs)
+        return self.rerouter
+
+    def disable_rerouting(self):
+        """Beendet das Umrouten; die zuletzt gesetzten Kosten bleiben."""
+        if self.rerouter is not None:
+            self.rerouter.close()
+        self.rerouter = None
+
+    def enable_meso(
+        self,
+        streets: Optional[Iterable[int]] = None,
+        micro_nodes: Optional[Iterable[str]] = None,
+        radius: float = 300.0,
+        **kwargs,
+    ) -> MesoModel:
+        """
+        Schaltet das mesoskopische Warteschlangenmodell (siehe meso.py) für
+        einen Teil des Netzes ein: entweder für die angegebenen Streets oder,
+        mit micro_nodes, für alle Streets außer denen im Umkreis radius (m)
+        um diese Kreuzungen. Fahrzeuge, die schon dort sind, wechseln sofort.
+        kwargs gehen an MesoModel.
+        """
+        if self.meso is not None:
+            raise ValueError("Mesoskopischer Betrieb ist bereits eingeschaltet")
+        if self.owned_streets is not None:
+            raise ValueError("Mesoskopischer Betrieb nicht im partitionierten Simulator")
+        if streets is None:
+            if micro_nodes is None:
+                raise ValueError("streets oder micro_nodes angeben")
+            micro = streets_near(self.intersections, self.streets, micro_nodes, radius)
+            streets = [st_id for st_id in self.streets if st_id not in micro]
+        self.meso = MesoModel(self, streets, **kwargs)
+        self.meso.absorb()
+        print(
+            f"[Simulator] Mesoskopisch: {int(self.meso.is_meso.sum())} von "
+            f"{len(self.streets)} Streets"
+        )
+        return self.meso
+
+    def stats(self) -> dict:
+        """Messwerte des Profilers plus Router-Zähler seit enable_profiling."""
+        if self.profiler is None:
+            return {}
+        data = self.profiler.stats()
+        searches0, touched0 = self._router_baseline
+        cache = self.router.cache
+        data["router"] = {
+            "method": self.router.method,
+            "searches": self.router.searches - searches0,
+            "nodes_touched": self.router.nodes_touched - touched0,
+            "cache_hits": cache.hits if cache is not None else 0,
+            "cache_misses": cache.misses if cache is not None else 0,
+        }
+        data["route_table"] = self.route_table.stats()
+        data["ticks"] = self.ticks
+        data["time"] = self.time
+        return data
+
+    def save_checkpoint(self, path: str):
+        """
+        Speichert den dynamischen Zustand (Fahrzeuge, Ampel-Zeitpläne, Zeit,
+        Zufallsgenerator, next_vid) kompakt als .npz, siehe checkpoint.py.
+        """
+        save_checkpoint(self, path)
+
+    def load_checkpoint(self, path: str):
+        """Stellt einen Checkpoint wieder her, ohne das Netz neu zu laden."""
+        load_checkpoint(self, path)
+
+    def fork(self) -> "Simulator":
+        """
+        Verzweigt den aktuellen Zustand in einen unabhängigen Simulator.
+        Netz, Router und Routen-Listen werden geteilt; kopiert werden nur
+        Fahrzeuge (flach), Ampel-Controller und Zufallsgenerator.
+        Routen werden nie in-place verändert, daher ist das Teilen sicher.
+        """
+        other = copy.copy(self)
+
+        # Ampeln: eigene Controller + Scheduler (gleiche Reihenfolge)
+        intersections = dict(self.intersections)
+        controllers = [copy.copy(tl) for tl in self.light_scheduler.controllers]
+        by_old = {
+            id(old): new
+            for old, new in zip(self.light_scheduler.controllers, controllers)
+        }
+        for nid, inter in self.intersections.items():
+            if inter.traffic_lights is not None:
+                branch = copy.copy(inter)
+                branch.traffic_lights = by_old[id(inter.traffic_lights)]
+                intersections[nid] = branch
+        other.intersections = intersections
+        other.light_scheduler = TrafficLightScheduler(controllers, now=self.time)
+
+        other.rng = random.Random()
+        other.rng.setstate(self.rng.getstate())
+        other._route_pool = None
+        other.recorder = None
+        other.profiler = None
+        other.metrics = None
+        other.rerouter = None
+        other.demand = None  # liest einen Datenstrom, nicht verzweigbar
+        if self.rerouter is not None:
+            # Eigene Kosten (eingefroren), sonst änderte das Original sie mit
+            other.router = self.router.branch()
+        other.outbox = []
+
+        if self.engine is not None:
+            other.engine = self.engine.branch(intersections, other.light_scheduler)
+            other.vehicles = []
+            other.lane_index = LaneOccupancy()
+        else:
+            vehicles = []
+            for v in self.vehicles:
+                w = copy.copy(v)
+                w.intersections_map = intersections
+                vehicles.append(w)
+            other.vehicles = vehicles
+            other.lane_index = LaneOccupancy.from_vehicles(vehicles)
+        if self.meso is not None:
+            other.meso = self.meso.branch(other)
+        return other
 
     def step(self, dt: float):
+        prof = self.profiler
+        self.ticks += 1
+        if prof is None:
+            self._step(dt, null_phase)
+            return
+        with prof.tick_context(self.ticks), prof.phase("step"):
+            self._step(dt, prof.phase)
+        prof.count("ticks")
+        prof.observe("tick.vehicles", self.vehicle_count())
+        prof.count("vehicles.blocked_at_red", self.blocked_at_end())
+
+    def _step(self, dt: float, phase):
         # 1) Ampeln
-        self.update_traffic_lights(dt)
-
-        # 2) Pro (street, lane) => sort vehicles
-        street_lane_map: Dict[Tuple[int, int], List[Vehicle]] = {}
-        for v in self.vehicles:
-            key = (v.current_street_id(), v.lane_index)
-            if key not in street_lane_map:
-                street_lane_map[key] = []
-            street_lane_map[key].append(v)
-
-        for key, vlist in street_lane_map.items():
-            vlist.sort(key=lambda x: x.position_s)
-            for i, veh in enumerate(vlist):
-                leader = vlist[i - 1] if i > 0 else None
-                veh.update(dt, leader)
-
-        # 3) Entferne fertige
-        before = len(self.vehicles)
-        self.vehicles = [v for v in self.vehicles if not v.done]
-        after = len(self.vehicles)
-
-        # 4) Optional: spawn bei vielen entfernten
-        removed = before - after
-        for _ in range(removed):
-            if random.random() < 0.7:
-                self.spawn_vehicle()
+        self.time += dt
+        with phase("step.lights"):
+            self.update_traffic_lights(dt)
+
+        if self.engine is not None:
+            # 2+3) Vektorisiert: alle Fahrzeuge gebündelt, Fertige entfernt
+            with phase("step.engine"):
+                removed = self.engine.step(dt)
+            if self.profiler is not None:
+                self.profiler.count("vehicles.moved", self.engine.last_moved)
+        else:
+            removed = self._step_objects(dt, phase)
+        if self.meso is not None:
+            # 3b) Mesoskopische Streets: Übernahmen, Ausfahrten nach Kapazität
+            with phase("step.meso"):
+                if self.engine is not None:
+                    self.meso.take_from_engine(self.time)
+                removed += self.meso.step(dt, self.time)
+        if self.metrics is not None:
+            with phase("step.metrics"):
+                self._sample_metrics(dt)
+        if self.rerouter is not None:
+            with phase("step.reroute"):
+                self.rerouter.tick()
+
+        # 4a) Nachfrage aus Datei: fällige Fahrzeuge gebündelt einfügen
+        if self.demand is not None:
+            with phase("step.demand"):
+                self.demand.inject()
+
+        # 4b) Optional: spawn bei vielen entfernten (gebündelt)
+        self.last_removed = removed
+        respawn = sum(1 for _ in range(removed) if self.rng.random() < self.respawn_rate)
+        if respawn:
+            with phase("step.respawn"):
+                self.spawn_vehicles(respawn)
+        if self.profiler is not None:
+            self.profiler.count("vehicles.removed", removed)
+            self.profiler.count("vehicles.respawned", respawn)
+
+        # 5) Optional: Zustand aufzeichnen (siehe recorder.py)
+        if self.recorder is not None:
+            with phase("step.record"):
+                self.recorder.record(self)
+
+    def blocked_at_end(self) -> int:
+        """Fahrzeuge, die am Street-Ende vor Rot stehen (nur für Statistiken)."""
+        engine = self.engine
+        if engine is not None:
+            n = engine.size
+            st = engine.street[:n]
+            return int((engine.position_s[:n] >= engine.st_length[st]).sum())
+        return sum(1 for v in self.vehicles if v.position_s >= v.current_street.length)
+
+    def _step_objects(self, dt: float, phase=null_phase) -> int:
+        """
+        Objekt-basierter Tick über die persistente Spurbelegung: pro Spur
+        von vorne nach hinten, jeder Vordermann ist bereits aktualisiert.
+        Spur-/Street-Wechsel und fertige Fahrzeuge werden gesammelt und erst
+        am Tick-Ende in den Index übernommen. Gibt die Anzahl entfernter
+        Fahrzeuge zurück.
+        """
+        lanes = self.lane_index
+        # 2) Fahrzeuge hinter der Kreuzung (Stand zu Tick-Beginn)
+        rears = self.foreign_rears
+        if self.meso is not None:
+            rears = self.meso.rears
+        with phase("step.leaders"):
+            next_leader = lanes.next_leader_positions(self.streets, rears)
+
+        moved: List[Tuple[Vehicle, Tuple[int, int]]] = []
+        dirty: List[Tuple[int, int]] = []
+        with phase("step.update"):
+            if self.sleep_idle:
+                removed = self._update_lanes_sleeping(dt, next_leader, moved, dirty)
+            else:
+                removed = self._update_lanes(dt, next_leader, moved, dirty)
+        if self.metrics is not None:
+            self._metrics_moves(moved)
+        with phase("step.regroup"):
+            arrivals = lanes.apply_moves(moved, dirty)
+        if self.profiler is not None:
+            self.profiler.count("vehicles.moved", len(moved) - removed)
+
+        # Partitionierter Betrieb: Fahrzeuge auf fremden Streets abgeben
+        if self.owned_streets is not None:
+            for v in arrivals:
+                if v.current_street_id() not in self.owned_streets:
+                    lanes.remove_many((v.current_street_id(), v.lane_index), [v])
+                    self.outbox.append(v)
+
+        # Mesoskopische Streets: Fahrzeuge an die Warteschlangen abgeben
+        to_meso: List[Vehicle] = []
+        if self.meso is not None:
+            to_meso = self.meso.take_arrivals(arrivals, self.time)
+
+        # 3) Entferne fertige (und abgegebene)
+        if removed or self.outbox or to_meso:
+            with phase("step.remove"):
+                handed = set(map(id, self.outbox))
+                handed.update(map(id, to_meso))
+                self.vehicles = [
+                    v for v in self.vehicles if not v.done and id(v) not in handed
+                ]
+        return removed
+
+    def _metrics_moves(self, moved: List[Tuple[Vehicle, Tuple[int, int]]]):
+        """Street-Wechsel und beendete Fahrten eines Ticks an die Kennzahlen."""
+        vids = []
+        from_ids = []
+        to_ids = []
+        for v, key in moved:
+            if v.done:
+                to_ids.append(-1)
+            elif v.current_street.id != key[0]:
+                to_ids.append(v.current_street.id)
+            else:
+                continue  # nur Spurwechsel
+            vids.append(v.vehicle_id)
+            from_ids.append(key[0])
+        if not vids:
+            return
+        metrics = self.metrics
+        to_ids = np.array(to_ids, dtype=np.int64)
+        to_rows = np.full(len(to_ids), -1, dtype=np.int64)
+        entering = to_ids >= 0
+        to_rows[entering] = metrics.rows(to_ids[entering])
+        metrics.on_transitions(
+            np.array(vids, dtype=np.int64), metrics.rows(from_ids), to_rows, self.time
+        )
+
+    def _sample_metrics(self, dt: float):
+        """Übergibt Ereignisse (vektorisierte Engine) und Zustand des Ticks."""
+        metrics = self.metrics
+        engine = self.engine
+        if engine is not None:
+            events = engine.transitions
+            if events:
+                vids, from_rows, to_rows = (np.concatenate(col) for col in zip(*events))
+                events.clear()
+                metrics.on_transitions(vids, from_rows, to_rows, self.time)
+            n = engine.size
+            rows = engine.street[:n]
+            speed = engine.speed[:n]
+            at_line = engine.position_s[:n] >= engine.st_length[rows]
+        else:
+            # Spur für Spur: Street-Zeile einmal je Spur statt je Fahrzeug
+            lanes = self.lane_index.lanes
+            counts = [len(vlist) for vlist in lanes.values()]
+            n = sum(counts)
+            rows = np.repeat(metrics.rows([key[0] for key in lanes]), counts)
+            speed = np.fromiter(
+                (v.speed for vlist in lanes.values() for v in vlist), np.float64, n
+            )
+            position = np.fromiter(
+                (v.position_s for vlist in lanes.values() for v in vlist), np.float64, n
+            )
+            at_line = position >= metrics.length[rows]
+        if self.meso is not None and len(self.meso):
+            m_rows, m_speed, m_line = self.meso.metrics_state(self.time)
+            rows = np.concatenate([rows, m_rows])
+            speed = np.concatenate([speed, m_speed])
+            at_line = np.concatenate([at_line, m_line])
+        metrics.sample(rows, speed, at_line, dt, self.time)
+
+    def _update_lanes(
+        self,
+        dt: float,
+        next_leader: Dict[Tuple[int, int], float],
+        moved: List[Tuple[Vehicle, Tuple[int, int]]],
+        dirty: List[Tuple[int, int]],
+    ) -> int:
+        """
+        Aktualisiert alle Fahrzeuge, Spur für Spur. Sammelt Wechsel und
+        fertige Fahrzeuge in `moved`, Spuren mit gestörter Reihenfolge in
+        `dirty`. Gibt die Anzahl fertiger Fahrzeuge zurück.
+        """
+        removed = 0
+        for key, vlist in self.lane_index.items():
+            leader = None
+            prev_stayed = None
+            for veh in vlist:
+                if leader is None:
+                    veh.update(dt, None, next_leader.get(key))
+                else:
+                    veh.update(dt, leader)
+                leader = veh
+                if veh.done:
+                    removed += 1
+                    moved.append((veh, key))
+                elif veh.lane_index != key[1] or veh.current_street_id() != key[0]:
+                    moved.append((veh, key))
+                else:
+                    if prev_stayed is not None and (
+                        lane_order_key(prev_stayed) > lane_order_key(veh)
+                    ):
+                        if not dirty or dirty[-1] != key:
+                            dirty.append(key)
+                    prev_stayed = veh
+        return removed
+
+    def _update_lanes_sleeping(
+        self,
+        dt: float,
+        next_leader: Dict[Tuple[int, int], float],
+        moved: List[Tuple[Vehicle, Tuple[int, int]]],
+        dirty: List[Tuple[int, int]],
+    ) -> int:
+        """
+        Wie _update_lanes, überspringt aber schlafende Fahrzeuge.
+
+        Ein Fahrzeug schläft ein, wenn sein update nichts verändert hat
+        (steht vor Rot oder im Stau). update hängt nur vom eigenen Zustand,
+        dem Vordermann (bzw. next_leader_s), der Ampel am Street-Ende und dt
+        ab; solange davon nichts wechselt, bliebe es ein No-op. Geweckt wird
+        daher, wenn der Vordermann ein anderer ist oder sich bewegt hat,
+        next_leader_s sich ändert, die Ampel der Spur umschaltet
+        (LaneOccupancy.wake) oder dt sich ändert. Spuren, deren Fahrzeuge
+        alle schlafen, kosten je Tick nur einen Vergleich.
+        """
+        lanes = self.lane_index
+        if dt != self._sleep_dt:
+            lanes.wake_all()
+            self._sleep_dt = dt
+        idle = lanes.idle
+        woken = lanes.woken
+        removed = 0
+        skipped = 0
+        for key, vlist in lanes.items():
+            head_s = next_leader.get(key)
+            if key in idle:
+                if vlist[0].sleep_next_s == head_s:
+                    skipped += len(vlist)
+                    continue
+                idle.discard(key)
+            forced = key in woken
+            all_asleep = True
+            leader = None
+            prev_stayed = None
+            for veh in vlist:
+                if (
+                    veh.asleep
+                    and not forced
+                    and veh.sleep_leader is leader
+                    and (
+                        veh.sleep_next_s == head_s
+                        if leader is None
+                        else not leader.changed
+                    )
+                ):
+                    skipped += 1
+                else:
+                    s, speed, lane, st = (
+                        veh.position_s,
+                        veh.speed,
+                        veh.lane_index,
+                        veh.current_street,
+                    )
+                    if leader is None:
+                        veh.update(dt, None, head_s)
+                    else:
+                        veh.update(dt, leader)
+                    asleep = (
+                        not veh.done
+                        and veh.position_s == s
+                        and veh.speed == speed
+                        and veh.lane_index == lane
+                        and veh.current_street is st
+                    )
+                    veh.asleep = asleep
+                    veh.changed = not asleep
+                    if asleep:
+                        veh.sleep_leader = leader
+                        veh.sleep_next_s = head_s if leader is None else None
+                    else:
+                        veh.sleep_leader = None
+                        all_asleep = False
+                leader = veh
+                if veh.done:
+                    removed += 1
+                    moved.append((veh, key))
+                elif veh.lane_index != key[1] or veh.current_street_id() != key[0]:
+                    moved.append((veh, key))
+                else:
+                    if prev_stayed is not None and (
+                        lane_order_key(prev_stayed) > lane_order_key(veh)
+                    ):
+                        if not dirty or dirty[-1] != key:
+                            dirty.append(key)
+                    prev_stayed = veh
+            if all_asleep:
+                idle.add(key)
+        woken.clear()
+        if self.profiler is not None:
+            self.profiler.count("vehicles.skipped", skipped)
+        return removed
 
     def run(self, steps=100, dt=1.0):
         # initial spawn
-        for _ in range(10):
-            self.spawn_vehicle()
+        self.spawn_vehicles(10)
 
         for step in range(steps):
             self.step(dt)
             if step % 10 == 0:
-                print(f"Step {step} -> #Vehicles={len(self.vehicles)}")
+                print(f"Step {step} -> #Vehicles={self.vehicle_count()}")
 
     def build_adjacency(
         self,
@@ -172,35 +1080,56 @@ class Simulator:
     def build_city_graph(
         self,
         dist_m: float = 2000,
+        center: Tuple[float, float] = BERLIN_CENTER,
+        network_type: str = "drive",
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
     ) -> Tuple[Dict[str, "Intersection"], Dict[int, "Street"]]:
         """
         Lädt einen Ausschnitt (Umkreis dist_m) rund um feste Koordinaten in Berlin
         und erzeugt daraus Intersection-/Street-Objekte (mit turn:lanes, Ampeln etc.).
 
+        0) Liegt unter cache_dir schon ein kompiliertes Netz für
+           (center, dist_m, network_type) im aktuellen Format, wird nur
+           dieses geladen (kein osmnx, kein shapely); ein veralteter Cache
+           wird neu gebaut und überschrieben.
         1) Nutzt `ox.graph_from_point`, anstatt geocode_to_gdf.
         2) Projiziert den Graph in Meter-Koordinaten.
         3) Liest Knoten und Kanten aus und baut:
         - Intersection-Objekte (einfache Knoten)
         - Street-Objekte (Kanten)
         - Ampeln, falls 'turn:lanes' oder 'lanes' existieren.
-        4) Gibt intersection_map, streets_map zurück.
+        4) Speichert das Ergebnis kompiliert im Cache.
+        5) Gibt intersection_map, streets_map zurück.
         """
+        key = network_key(center, dist_m, network_type)
+        cache_path = os.path.join(cache_dir, key) if cache_dir else None
+        if cache_path and cache_is_current(cache_path):
+            t0 = time.perf_counter()
+            intersection_map, streets_map = CompiledNetwork.load(cache_path).to_maps()
+            print(
+                f"[build_city_graph] Netz aus Cache {cache_path} geladen "
+                f"({time.perf_counter() - t0:.3f} s). Intersections: "
+                f"{len(intersection_map)} Streets: {len(streets_map)}"
+            )
+            return intersection_map, streets_map
+        if cache_path and os.path.isdir(cache_path):
+            print(f"[build_city_graph] Veralteter Netz-Cache {cache_path}, baue neu")
 
-        # 1) Feste Koordinaten für Berlin-Mitte, z.B. Brandenburger Tor
-        berlin_lat = 52.52
-        berlin_lon = 13.405
+        # 1) Feste Koordinaten, z.B. Berlin-Mitte
+        center_lat, center_lon = center
 
         print(
-            f"[build_city_graph] Lade Graph für Berlin-Koords ({berlin_lat}, {berlin_lon}), dist={dist_m} m"
+            f"[build_city_graph] Lade Graph für Koords ({center_lat}, {center_lon}), dist={dist_m} m"
         )
 
-        # 2) Laden via graph_from_point
+        # 2) Laden via graph_from_point (osmnx erst hier importieren)
+        ox = import_osmnx()
         G = ox.graph_from_point(
-            center_point=(berlin_lat, berlin_lon),
+            center_point=(center_lat, center_lon),
             dist=dist_m,
             dist_type="bbox",  # oder 'network'
             simplify=True,
-            network_type="drive",
+            network_type=network_type,
         )
         print(f"   -> Geladener Graph: #Nodes={len(G.nodes)}, #Edges={len(G.edges)}")
 
@@ -211,107 +1140,21 @@ class Simulator:
             f"   -> Projektierter Graph: #Nodes={len(G.nodes)}, #Edges={len(G.edges)}"
         )
 
-        # Jetzt bauen wir unsere Strukturen:
-        intersection_map: Dict[str, "Intersection"] = {}
-        streets_map: Dict[int, "Street"] = {}
-
-        # 4) Alle Knoten in Intersection-Objekte fassen
-        for node_id, data in G.nodes(data=True):
-            # node_id ist meist eine Zahl, wir machen zur Sicherheit einen String draus
-            str_id = str(node_id)
-            x_val = data.get("x", 0.0)
-            y_val = data.get("y", 0.0)
-            # Intersection ist eine einfache Klasse, die nur 'id' speichert und ggf. Ampel
-            intersection_map[str_id] = Intersection(str_id, x=x_val, y=y_val)
-
-        # 5) Alle Kanten auswerten
-        street_id_counter = 1
-        for u, v, key, edata in G.edges(keys=True, data=True):
-            # Koordinaten der Polylinie (falls geometry fehlt, nur direkter Start->End)
-            geom_line = edata.get("geometry", None)
-            if geom_line is None:
-                x1, y1 = G.nodes[u]["x"], G.nodes[u]["y"]
-                x2, y2 = G.nodes[v]["x"], G.nodes[v]["y"]
-                geom_line = shapely.geometry.LineString([(x1, y1), (x2, y2)])
-
-            coords_list = list(geom_line.coords)
-
-            # Geschwindigkeitslimit
-            maxspeed = edata.get("maxspeed", "50")
-            if isinstance(maxspeed, list):
-                maxspeed = maxspeed[0]
-            try:
-                ms_val = float(maxspeed)
-            except:
-                ms_val = 50.0
-            speed_limit = ms_val / 3.6  # km/h -> m/s
-
-            # turn:lanes
-            tlanes = edata.get("turn:lanes", "")
-            if isinstance(tlanes, list):
-                tlanes = tlanes[0]
-
-            # lanes
-            lanes_tag = edata.get("lanes", 1)
-            try:
-                lanes_tag = int(lanes_tag)
-            except:
-                lanes_tag = 1
-
-            parsed = self.parse_turn_lanes(tlanes)
-            nlanes = max(lanes_tag, len(parsed))
-            # Wenn turn:lanes weniger Spuren angibt als "lanes", füllen wir 'through' auf:
-            while len(parsed) < nlanes:
-                parsed.append(["through"])
-
-            # Street-Objekt anlegen
-            str_u = str(u)
-            str_v = str(v)
-
-            st = Street(
-                st_id=street_id_counter,
-                start_node=str_u,
-                end_node=str_v,
-                coords=coords_list,
-                speed_limit=speed_limit,
-                lane_dirs=parsed,
+        # 4) Intersections, Streets und Ampeln bauen
+        intersection_map, streets_map = graph_to_network(G)
+
+        # 5) Kompiliert ablegen
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            meta = {
+                "center": [center_lat, center_lon],
+                "dist_m": dist_m,
+                "network_type": network_type,
+            }
+            CompiledNetwork.from_maps(intersection_map, streets_map, meta).save(
+                cache_path
             )
-            streets_map[street_id_counter] = st
-            street_id_counter += 1
-
-            # Prüfen, ob die Straße bidirektional ist
-            oneway = edata.get("oneway", False)
-            # Falls oneway == False (oder "False", "0"), legen wir eine Rückrichtung an
-            if oneway in [False, "False", 0, "0"]:
-                rev_coords = list(reversed(coords_list))
-                st2 = Street(
-                    st_id=street_id_counter,
-                    start_node=str_v,
-                    end_node=str_u,
-                    coords=rev_coords,
-                    speed_limit=speed_limit,
-                    lane_dirs=parsed,  # gleiche Spur-Infos
-                )
-                streets_map[street_id_counter] = st2
-                street_id_counter += 1
-
-        # 6) Ampeln an den Knoten anlegen
-        # Dazu sammeln wir: pro Node => Liste aller (street_id, lane_index),
-        # die dort enden.
-        in_spurs: Dict[str, List[Tuple[int, int]]] = {}
-        for st_id, st_obj in streets_map.items():
-            end_n = st_obj.end_node
-            if end_n not in in_spurs:
-                in_spurs[end_n] = []
-            for ln in range(st_obj.num_lanes):
-                in_spurs[end_n].append((st_id, ln))
-
-        # Für jeden Knoten (Intersection) schauen wir, ob er eingehende Spuren hat
-        for n_id, inter in intersection_map.items():
-            if n_id in in_spurs:
-                inc = in_spurs[n_id]
-                tl = TrafficLightController(inc)
-                inter.set_traffic_lights(tl)
+            print(f"[build_city_graph] Netz kompiliert nach {cache_path}")
 
         print(
             "[build_city_graph] Fertig. Intersections:",
@@ -325,28 +1168,6 @@ class Simulator:
         """
         Parst z. B. "left|through;right" in:
         [ ["left"], ["through","right"] ]
-        d. h. pro Spur eine Liste an erlaubten Richtungen.
-        Mögliche Werte in OSM: left, right, through, slight_left, slight_right usw.
-        Hier behandeln wir "slight_left" als "left" und "slight_right" als "right".
+        (siehe osm_import.parse_turn_lanes)
         """
-        if not turn_lanes_str:
-            return []
-        # Spur-Einträge durch "|"
-        lane_entries = turn_lanes_str.split("|")
-        result = []
-        for lane_entry in lane_entries:
-            # z. B. "through;right"
-            directions = []
-            for d in lane_entry.split(";"):
-                # Normalisieren slight_left -> left
-                if "left" in d:
-                    directions.append("left")
-                elif "right" in d:
-                    directions.append("right")
-                elif "through" in d:
-                    directions.append("through")
-                else:
-                    # Unbekannte Einträge
-                    directions.append(d)
-            result.append(directions)
-        return result
+        return parse_turn_lanes(turn_lanes_str)
@@ -1,27 +1,95 @@
-import osmnx as ox
-import networkx as nx
-import shapely
-import shapely.geometry
-import shapely.ops
+import math
 
-from typing import Dict, List, Tuple
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .turns import lane_mask
+
+# Gleiche Spur-Konfigurationen teilen sich ein Tupel (Richtungen, Masken)
+_LANE_CONFIGS: Dict[Tuple[Tuple[str, ...], ...], Tuple[tuple, Tuple[int, ...]]] = {}
+
+
+def _lane_config(lane_dirs) -> Tuple[tuple, Tuple[int, ...]]:
+    # Tupel von Tupeln ist schon die kanonische Form (z. B. aus dem OSM-Import)
+    if isinstance(lane_dirs, tuple):
+        key = lane_dirs
+    else:
+        key = tuple(tuple(dirs) for dirs in lane_dirs)
+    config = _LANE_CONFIGS.get(key)
+    if config is None:
+        config = _LANE_CONFIGS[key] = (key, tuple(lane_mask(d) for d in key))
+    return config
+
+
+def polyline_length(xy: Sequence[float]) -> float:
+    """
+    Länge einer gepackten Polylinie (x0, y0, x1, y1, ...); summiert wie
+    shapely/GEOS sqrt(dx*dx + dy*dy) je Segment.
+    """
+    total = 0.0
+    for i in range(2, len(xy), 2):
+        dx = xy[i] - xy[i - 2]
+        dy = xy[i + 1] - xy[i - 1]
+        total += math.sqrt(dx * dx + dy * dy)
+    return total
 
 
 class Street:
+    """
+    Gerichtete Straße zwischen zwei Knoten.
+
+    Speicherschonend: feste Attribute (__slots__), Polylinie als gepacktes
+    float-Array xy = [x0, y0, x1, y1, ...] (coords baut die Punktliste bei
+    Bedarf), Spur-Richtungen als geteilte Tupel.
+    """
+
+    __slots__ = (
+        "id",
+        "start_node",
+        "end_node",
+        "xy",
+        "length",
+        "speed_limit",
+        "lane_dirs",
+        "num_lanes",
+        "lane_masks",
+        "turns",
+    )
+
     def __init__(
         self,
         st_id: int,
         start_node,
         end_node,
-        coords: List[Tuple[float, float]],
+        coords: Sequence[Tuple[float, float]],
         speed_limit: float,
         lane_dirs: List[List[str]],
+        length: Optional[float] = None,
     ):
         self.id = st_id
         self.start_node = start_node
         self.end_node = end_node
-        self.coords = coords
-        self.length = shapely.geometry.LineString(coords).length
+        # Punkte (x, y) oder bereits gepackt als array("d")
+        if isinstance(coords, array):
+            self.xy = coords
+        else:
+            self.xy = array("d", [c for p in coords for c in p])
+        # Länge kann vorberechnet übergeben werden (z. B. aus dem Netz-Cache)
+        if length is None:
+            length = polyline_length(self.xy)
+        self.length = length
         self.speed_limit = speed_limit
-        self.lane_dirs = lane_dirs
-        self.num_lanes = len(lane_dirs)
+        # Erlaubte Richtungen je Spur als Bitmaske (LANE_* aus turns.py)
+        self.lane_dirs, self.lane_masks = _lane_config(lane_dirs)
+        self.num_lanes = len(self.lane_dirs)
+        # Nächste Street-ID -> Abbiege-Richtung (siehe turns.build_turn_table)
+        self.turns: Dict[int, str] = {}
+
+    @property
+    def coords(self) -> List[Tuple[float, float]]:
+        xy = self.xy
+        return list(zip(xy[0::2], xy[1::2]))
+
+    @property
+    def num_points(self) -> int:
+        return len(self.xy) // 2
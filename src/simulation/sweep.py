@@ -0,0 +1,247 @@
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional
+
+from .TrafficLight import PHASE_DURATIONS
+from .intersection import Intersection
+from .network_cache import CompiledNetwork, SharedNetwork
+from .simulation import Simulator
+from .street import Street
+
+# Ein Szenario: {"durations": {Phase: s} | None, "vehicles": int,
+#                "profile_mix": {Profil: Gewicht} | None, "seed": int}
+Scenario = Dict[str, object]
+
+
+def scenario_grid(
+    durations: Iterable[Optional[Dict[int, float]]] = (None,),
+    vehicles: Iterable[int] = (1000,),
+    profile_mix: Iterable[Optional[Dict[str, float]]] = (None,),
+    replicates: int = 1,
+    seed: int = 0,
+) -> List[Scenario]:
+    """
+    Kreuzprodukt der Parameter, je Kombination `replicates` Läufe mit den
+    Seeds seed, seed+1, ... (gleiche Seeds für alle Kombinationen, damit
+    Unterschiede aus den Parametern und nicht aus dem Zufall kommen).
+
+    durations überschreibt einzelne Phasen von PHASE_DURATIONS für alle
+    Ampeln, vehicles ist die Anfangsnachfrage, profile_mix die Gewichte
+    je Fahrzeugprofil (auch für Nachspawns).
+    """
+    grid = []
+    for dur, n, mix in itertools.product(durations, vehicles, profile_mix):
+        for r in range(replicates):
+            grid.append(
+                {"durations": dur, "vehicles": n, "profile_mix": mix, "seed": seed + r}
+            )
+    return grid
+
+
+def scenario_id(scenario: Scenario) -> str:
+    """Stabiler Schlüssel eines Szenarios (für das Fortsetzen von Sweeps)."""
+    text = json.dumps(scenario, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _mean_speed(sim: Simulator) -> Optional[float]:
+    engine = sim.engine
+    if engine is not None:
+        n = engine.size
+        return float(engine.speed[:n].mean()) if n else None
+    if not sim.vehicles:
+        return None
+    return sum(v.speed for v in sim.vehicles) / len(sim.vehicles)
+
+
+def run_scenario(
+    base: Simulator, scenario: Scenario, steps: int, dt: float = 1.0
+) -> dict:
+    """
+    Führt ein Szenario auf einer Verzweigung (fork) von `base` aus; base
+    sollte unberührt sein (Zeit 0, keine Fahrzeuge) und bleibt es.
+    Liefert die Kennzahlen des Laufs.
+    """
+    t0 = time.perf_counter()
+    sim = base.fork()
+    sim.rng.seed(scenario["seed"])
+    sim.profile_mix = scenario.get("profile_mix")
+    sim.spawn_processes = 1
+
+    durations = scenario.get("durations")
+    if durations:
+        plan = dict(PHASE_DURATIONS)
+        plan.update({int(p): float(d) for p, d in durations.items()})
+        for c in range(len(sim.light_scheduler.controllers)):
+            sim.light_scheduler.set_plan(c, plan)
+
+    sim.spawn_vehicles(int(scenario["vehicles"]))
+    # Zähler direkt im Tick-Takt statt per Profiler (dessen Phasen-Timer
+    # würden wall_s verfälschen)
+    vehicles = finished = blocked = 0
+    for _ in range(steps):
+        sim.step(dt)
+        vehicles += sim.vehicle_count()
+        finished += sim.last_removed
+        blocked += sim.blocked_at_end()
+
+    return {
+        "steps": steps,
+        "sim_time": sim.time,
+        "vehicles_end": sim.vehicle_count(),
+        "vehicles_mean": vehicles / steps if steps else 0.0,
+        "finished": finished,
+        "blocked_at_red_mean": blocked / max(steps, 1),
+        "mean_speed_end": _mean_speed(sim),
+        "wall_s": time.perf_counter() - t0,
+    }
+
+
+# Basis-Simulator je Worker-Prozess (einmal aus dem Shared-Memory-Netz gebaut)
+_WORKER_BASE: Optional[Simulator] = None
+_WORKER_NETWORK: Optional[SharedNetwork] = None
+
+
+def _init_sweep_worker(handle, sim_kwargs: dict):
+    global _WORKER_BASE, _WORKER_NETWORK
+    _WORKER_NETWORK = SharedNetwork.attach(handle)
+    intersections, streets = _WORKER_NETWORK.network().to_maps()
+    _WORKER_BASE = Simulator.from_network(intersections, streets, **sim_kwargs)
+
+
+def _sweep_task(scenario: Scenario, steps: int, dt: float) -> dict:
+    return run_scenario(_WORKER_BASE, scenario, steps, dt)
+
+
+class SweepRunner:
+    """
+    Parameter-Sweep (z. B. Ampel-Zeitpläne x Nachfrage x Profil-Mix) über
+    einen Prozess-Pool.
+
+    Das Netz liegt einmal kompiliert im Shared Memory (SharedNetwork);
+    jeder Worker baut daraus einmal seinen Basis-Simulator und rechnet
+    jedes Szenario auf einer Verzweigung davon (Router-Cache und
+    Routen-Tabelle bleiben über die Läufe erhalten).
+
+    Ergebnisse werden sofort nach jedem Lauf als JSON-Zeile an
+    `results_path` angehängt. Ein abgebrochener Sweep wird beim nächsten
+    run() fortgesetzt: Szenarien, deren scenario_id schon in der Datei
+    steht, werden übersprungen.
+    """
+
+    def __init__(
+        self,
+        network: CompiledNetwork,
+        results_path: str,
+        steps: int = 600,
+        dt: float = 1.0,
+        processes: Optional[int] = None,
+        **sim_kwargs,
+    ):
+        self.network = network
+        self.results_path = results_path
+        self.steps = steps
+        self.dt = dt
+        self.processes = processes or os.cpu_count() or 1
+        self.sim_kwargs = sim_kwargs
+
+    @classmethod
+    def from_maps(
+        cls,
+        intersections: Dict[str, Intersection],
+        streets: Dict[int, Street],
+        results_path: str,
+        **kwargs,
+    ) -> "SweepRunner":
+        return cls(CompiledNetwork.from_maps(intersections, streets), results_path, **kwargs)
+
+    def completed(self) -> Dict[str, dict]:
+        """Bereits gespeicherte Ergebnisse (scenario_id -> Zeile)."""
+        done: Dict[str, dict] = {}
+        if not os.path.exists(self.results_path):
+            return done
+        with open(self.results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    # Abgebrochen mitten in der Zeile: Lauf wird wiederholt
+                    continue
+                done[row["id"]] = row
+        return done
+
+    def _append(self, f, scenario: Scenario, metrics: dict) -> dict:
+        row = {"id": scenario_id(scenario), "scenario": scenario, "metrics": metrics}
+        f.write(json.dumps(row, sort_keys=True) + "\n")
+        f.flush()
+        return row
+
+    def run(self, scenarios: List[Scenario]) -> List[dict]:
+        """
+        Rechnet alle noch offenen Szenarien und liefert die Ergebnisse aller
+        Szenarien (in der Reihenfolge von `scenarios`).
+        """
+        done = self.completed()
+        pending = []
+        seen = set(done)
+        for sc in scenarios:
+            sid = scenario_id(sc)
+            if sid not in seen:
+                seen.add(sid)
+                pending.append(sc)
+        print(
+            f"[SweepRunner] {len(scenarios)} Szenarien, {len(scenarios) - len(pending)} "
+            f"bereits fertig, {len(pending)} offen ({self.processes} Prozesse)"
+        )
+
+        # Letzte Zeile ggf. abgebrochen: sauber in einer neuen Zeile weiterschreiben
+        if os.path.exists(self.results_path) and os.path.getsize(self.results_path):
+            with open(self.results_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        else:
+            needs_newline = False
+
+        with open(self.results_path, "a", encoding="utf-8") as f:
+            if needs_newline:
+                f.write("\n")
+            if pending and self.processes <= 1:
+                intersections, streets = self.network.to_maps()
+                base = Simulator.from_network(intersections, streets, **self.sim_kwargs)
+                for sc in pending:
+                    row = self._append(f, sc, run_scenario(base, sc, self.steps, self.dt))
+                    done[row["id"]] = row
+            elif pending:
+                self._run_pool(f, pending, done)
+
+        return [done[scenario_id(sc)] for sc in scenarios]
+
+    def _run_pool(self, f, pending: List[Scenario], done: Dict[str, dict]):
+        shared = SharedNetwork.create(self.network)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(self.processes, len(pending)),
+                mp_context=multiprocessing.get_context(),
+                initializer=_init_sweep_worker,
+                initargs=(shared.handle, self.sim_kwargs),
+            ) as pool:
+                futures = {
+                    pool.submit(_sweep_task, sc, self.steps, self.dt): sc for sc in pending
+                }
+                finished = 0
+                while futures:
+                    ready, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for fut in ready:
+                        sc = futures.pop(fut)
+                        row = self._append(f, sc, fut.result())
+                        done[row["id"]] = row
+                        finished += 1
+                    print(f"[SweepRunner] {finished}/{len(pending)} Läufe fertig")
+        finally:
+            shared.unlink()
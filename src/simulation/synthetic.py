@@ -0,0 +1,234 @@
+import math
+import random
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .intersection import Intersection
+from .osm_import import attach_traffic_lights, parse_turn_lanes
+from .street import Street
+
+# turn:lanes je Spuranzahl (OSM-Schreibweise, Spuren von links nach rechts)
+TURN_LANES = {
+    1: "",
+    2: "left;through|through;right",
+    3: "left|through|through;right",
+    4: "left|through|through|right",
+}
+
+
+class NetworkBuilder:
+    """
+    Baut Intersection-/Street-Maps direkt auf (ohne osmnx/shapely), im
+    selben Format wie osm_import.graph_to_network: Street-IDs ab 1,
+    Knoten-IDs als Strings, Ampeln an allen Knoten mit eingehenden Spuren.
+    """
+
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        lane_choices: Sequence[int] = (1, 1, 2, 2, 3),
+        speed_choices_kmh: Sequence[float] = (30.0, 50.0, 50.0),
+    ):
+        self.rng = random.Random(seed)
+        self.lane_choices = lane_choices
+        self.speed_choices_kmh = speed_choices_kmh
+        self.intersections: Dict[str, Intersection] = {}
+        self.streets: Dict[int, Street] = {}
+        self._next_street_id = 1
+
+    def add_node(self, node_id, x: float, y: float) -> str:
+        str_id = str(node_id)
+        self.intersections[str_id] = Intersection(str_id, x=x, y=y)
+        return str_id
+
+    def _street(self, u: str, v: str, coords, speed_limit: float, lane_dirs):
+        length = sum(
+            math.hypot(x2 - x1, y2 - y1)
+            for (x1, y1), (x2, y2) in zip(coords[:-1], coords[1:])
+        )
+        st = Street(
+            st_id=self._next_street_id,
+            start_node=u,
+            end_node=v,
+            coords=coords,
+            speed_limit=speed_limit,
+            lane_dirs=lane_dirs,
+            length=length,
+        )
+        self.streets[st.id] = st
+        self._next_street_id += 1
+        return st
+
+    def add_road(
+        self,
+        u: str,
+        v: str,
+        via: Optional[List[Tuple[float, float]]] = None,
+        lanes: Optional[int] = None,
+        speed_kmh: Optional[float] = None,
+        oneway: bool = False,
+    ):
+        """
+        Straße von u nach v (optional über Zwischenpunkte via); ohne oneway
+        wird wie beim OSM-Import eine Rückrichtung mit gleichen Spuren angelegt.
+        """
+        if lanes is None:
+            lanes = self.rng.choice(self.lane_choices)
+        if speed_kmh is None:
+            speed_kmh = self.rng.choice(self.speed_choices_kmh)
+        a, b = self.intersections[u], self.intersections[v]
+        coords = [(a.x_coord, a.y_coord)] + list(via or []) + [(b.x_coord, b.y_coord)]
+        lane_dirs = parse_turn_lanes(TURN_LANES.get(lanes, ""))
+        while len(lane_dirs) < lanes:
+            lane_dirs.append(["through"])
+        speed_limit = speed_kmh / 3.6
+        self._street(u, v, coords, speed_limit, lane_dirs)
+        if not oneway:
+            self._street(
+                v, u, list(reversed(coords)), speed_limit, [list(d) for d in lane_dirs]
+            )
+
+    def add_gate(self, node: str, dx: float, dy: float, gate_id) -> str:
+        """
+        Zufahrt am Rand: ein Knoten mit nur einer Anbindung (Spawn-Punkt,
+        siehe Simulator._find_boundary_nodes).
+        """
+        inter = self.intersections[node]
+        gate = self.add_node(gate_id, inter.x_coord + dx, inter.y_coord + dy)
+        self.add_road(gate, node, lanes=1, speed_kmh=50.0)
+        return gate
+
+    def build(self) -> Tuple[Dict[str, Intersection], Dict[int, Street]]:
+        attach_traffic_lights(self.intersections, self.streets)
+        return self.intersections, self.streets
+
+
+def grid_network(
+    rows: int,
+    cols: int,
+    spacing: float = 100.0,
+    seed: Optional[int] = None,
+    **kwargs,
+) -> Tuple[Dict[str, Intersection], Dict[int, Street]]:
+    """
+    Schachbrett-Netz mit rows x cols Kreuzungen und Zufahrten an allen
+    Randknoten. Spuranzahl und Tempolimit je Straße zufällig (seed).
+    """
+    b = NetworkBuilder(seed=seed, **kwargs)
+    for i in range(rows):
+        for j in range(cols):
+            b.add_node(f"g{i}_{j}", j * spacing, i * spacing)
+    for i in range(rows):
+        for j in range(cols):
+            if j + 1 < cols:
+                b.add_road(f"g{i}_{j}", f"g{i}_{j + 1}")
+            if i + 1 < rows:
+                b.add_road(f"g{i}_{j}", f"g{i + 1}_{j}")
+    for i in range(rows):
+        b.add_gate(f"g{i}_0", -spacing, 0.0, f"gate_w{i}")
+        b.add_gate(f"g{i}_{cols - 1}", spacing, 0.0, f"gate_e{i}")
+    for j in range(cols):
+        b.add_gate(f"g0_{j}", 0.0, -spacing, f"gate_s{j}")
+        b.add_gate(f"g{rows - 1}_{j}", 0.0, spacing, f"gate_n{j}")
+    return b.build()
+
+
+def radial_network(
+    rings: int,
+    spokes: int,
+    ring_spacing: float = 150.0,
+    seed: Optional[int] = None,
+    **kwargs,
+) -> Tuple[Dict[str, Intersection], Dict[int, Street]]:
+    """
+    Radiale Stadt: Zentrum, konzentrische Ringe (als Polylinien mit
+    Zwischenpunkten) und Ausfallstraßen; Zufahrten am äußeren Ring.
+    """
+    b = NetworkBuilder(seed=seed, **kwargs)
+    center = b.add_node("c", 0.0, 0.0)
+    angles = [2.0 * math.pi * k / spokes for k in range(spokes)]
+    for r in range(1, rings + 1):
+        radius = r * ring_spacing
+        for k, a in enumerate(angles):
+            b.add_node(f"r{r}_{k}", radius * math.cos(a), radius * math.sin(a))
+    for r in range(1, rings + 1):
+        radius = r * ring_spacing
+        for k, a in enumerate(angles):
+            # Ringsegment mit Mittelpunkt auf dem Kreisbogen
+            mid = a + math.pi / spokes
+            via = [(radius * math.cos(mid), radius * math.sin(mid))]
+            b.add_road(f"r{r}_{k}", f"r{r}_{(k + 1) % spokes}", via=via)
+            inner = center if r == 1 else f"r{r - 1}_{k}"
+            b.add_road(inner, f"r{r}_{k}", lanes=max(b.rng.choice(b.lane_choices), 2))
+    for k, a in enumerate(angles):
+        b.add_gate(
+            f"r{rings}_{k}", ring_spacing * math.cos(a), ring_spacing * math.sin(a), f"gate{k}"
+        )
+    return b.build()
+
+
+def random_planar_network(
+    rows: int,
+    cols: int,
+    spacing: float = 100.0,
+    jitter: float = 0.3,
+    keep_edge: float = 0.75,
+    diagonal: float = 0.3,
+    seed: Optional[int] = None,
+    **kwargs,
+) -> Tuple[Dict[str, Intersection], Dict[int, Street]]:
+    """
+    Zufälliger planarer, zusammenhängender Graph: verwackeltes Gitter, davon
+    ein zufälliger Spannbaum plus jede weitere Gitterkante mit
+    Wahrscheinlichkeit keep_edge und je Zelle höchstens eine Diagonale.
+    """
+    b = NetworkBuilder(seed=seed, **kwargs)
+    rng = b.rng
+    for i in range(rows):
+        for j in range(cols):
+            b.add_node(
+                f"p{i}_{j}",
+                (j + rng.uniform(-jitter, jitter)) * spacing,
+                (i + rng.uniform(-jitter, jitter)) * spacing,
+            )
+
+    lattice = []
+    for i in range(rows):
+        for j in range(cols):
+            if j + 1 < cols:
+                lattice.append(((i, j), (i, j + 1)))
+            if i + 1 < rows:
+                lattice.append(((i, j), (i + 1, j)))
+    rng.shuffle(lattice)
+
+    # Zufälliger Spannbaum (Kruskal mit Union-Find) hält den Graph zusammen
+    parent = {(i, j): (i, j) for i in range(rows) for j in range(cols)}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for p, q in lattice:
+        rp, rq = find(p), find(q)
+        if rp != rq:
+            parent[rp] = rq
+            keep = True
+        else:
+            keep = rng.random() < keep_edge
+        if keep:
+            b.add_road(f"p{p[0]}_{p[1]}", f"p{q[0]}_{q[1]}")
+
+    for i in range(rows - 1):
+        for j in range(cols - 1):
+            if rng.random() < diagonal:
+                if rng.random() < 0.5:
+                    b.add_road(f"p{i}_{j}", f"p{i + 1}_{j + 1}")
+                else:
+                    b.add_road(f"p{i}_{j + 1}", f"p{i + 1}_{j}")
+
+    for i in range(rows):
+        b.add_gate(f"p{i}_0", -spacing, 0.0, f"gate_w{i}")
+        b.add_gate(f"p{i}_{cols - 1}", spacing, 0.0, f"gate_e{i}")
+    return b.build()
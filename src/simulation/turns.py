@@ -0,0 +1,101 @@
+import math
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .street import Street
+
+# Abbiege-Richtungen als Codes (TURN_NONE = Routenende, keine Abbiegung)
+TURN_NONE = 0
+TURN_LEFT = 1
+TURN_THROUGH = 2
+TURN_RIGHT = 3
+
+# Bits für erlaubte Richtungen je Spur
+LANE_LEFT = 1
+LANE_THROUGH = 2
+LANE_RIGHT = 4
+
+# Richtung (wie Vehicle sie verwendet) -> Spur-Bit bzw. TURN_*-Code
+TURN_BITS = {"left": LANE_LEFT, "through": LANE_THROUGH, "right": LANE_RIGHT}
+TURN_CODES = {"left": TURN_LEFT, "through": TURN_THROUGH, "right": TURN_RIGHT}
+
+
+def lane_mask(dirs: List[str]) -> int:
+    """Bitmaske der erlaubten Richtungen einer Spur (lane_dirs-Eintrag)."""
+    m = 0
+    for d in dirs:
+        m |= TURN_BITS.get(d, 0)
+    return m
+
+
+def turn_direction(cur: "Street", nxt: "Street") -> str:
+    """
+    Abbiege-Richtung von cur nach nxt aus dem letzten Segment von cur und
+    dem ersten Segment von nxt: mehr als 30° nach rechts = "right", mehr
+    als 30° nach links = "left", sonst "through".
+    """
+    c = cur.xy  # gepackt: x0, y0, x1, y1, ...
+    n = nxt.xy
+    a1 = math.atan2(c[-1] - c[-3], c[-2] - c[-4])
+    a2 = math.atan2(n[3] - n[1], n[2] - n[0])
+    diff = math.degrees(a2 - a1)
+    if diff > 180:
+        diff -= 360
+    elif diff < -180:
+        diff += 360
+    if diff > 30:
+        return "right"
+    elif diff < -30:
+        return "left"
+    else:
+        return "through"
+
+
+def lookup_turn(cur: "Street", nxt: "Street") -> str:
+    """
+    Richtung aus der Tabelle von cur (siehe build_turn_table); fehlt das
+    Paar (Street nicht über den Simulator gebaut), wird es nachgetragen.
+    """
+    turn = cur.turns.get(nxt.id)
+    if turn is None:
+        turn = cur.turns[nxt.id] = turn_direction(cur, nxt)
+    return turn
+
+
+def target_lane(st: "Street", lane: int, turn: Optional[str]) -> int:
+    """
+    Spur, auf die ein Fahrzeug vor dem Abbiegen wechselt: von `lane` aus
+    Spur für Spur in Abbiegerichtung (links = höherer Index), bis eine Spur
+    die Richtung erlaubt oder der Rand erreicht ist. Geradeaus und am
+    Routenende bleibt es auf seiner Spur.
+    """
+    if turn is None:
+        return lane
+    bit = TURN_BITS[turn]
+    masks = st.lane_masks
+    if turn == "left":
+        while not masks[lane] & bit and lane < st.num_lanes - 1:
+            lane += 1
+    elif turn == "right":
+        while not masks[lane] & bit and lane > 0:
+            lane -= 1
+    return lane
+
+
+def build_turn_table(streets: Dict[int, "Street"]) -> int:
+    """
+    Trägt für jedes verbundene Street-Paar (Endknoten von a = Startknoten
+    von b) die Abbiege-Richtung in a.turns ein. Liefert die Anzahl Paare.
+    """
+    outgoing: Dict[object, List["Street"]] = {}
+    for st in streets.values():
+        outgoing.setdefault(st.start_node, []).append(st)
+    pairs = 0
+    for st in streets.values():
+        table = {}
+        for nxt in outgoing.get(st.end_node, ()):
+            table[nxt.id] = turn_direction(st, nxt)
+        st.turns = table
+        pairs += len(table)
+    return pairs
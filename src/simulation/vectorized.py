@@ -0,0 +1,712 @@
+import copy
+
+import numpy as np
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .TrafficLight import PHASE_GREEN, PHASE_YELLOW
+from .intersection import Intersection
+from .light_scheduler import TrafficLightScheduler
+from .street import Street
+from .turns import (
+    LANE_LEFT,
+    LANE_RIGHT,
+    LANE_THROUGH,
+    TURN_LEFT,
+    TURN_NONE,
+    TURN_RIGHT,
+    TURN_CODES,
+    TURN_THROUGH,
+    lookup_turn,
+)
+from .vehicle import VEHICLE_PROFILES, Vehicle
+
+PROFILE_NAMES = list(VEHICLE_PROFILES.keys())
+
+# Konstanten aus Vehicle
+MAX_ACCEL = 2.0
+MAX_DECEL = 4.0
+MIN_GAP = 5.0
+TURN_LOOKAHEAD = 50.0
+LIGHT_LOOKAHEAD = 20.0
+
+
+class VectorizedEngine:
+    """
+    Fahrzeug-Engine im Structure-of-Arrays-Layout.
+
+    Alle Fahrzeugzustände liegen in NumPy-Arrays (eine Zeile je Fahrzeug):
+    Street, Spur, position_s, speed, speed_factor, reaction_time,
+    Routen-Zeiger und done-Flag. Ein Tick rechnet Folgefahren, Ampelhalt
+    und Straßenwechsel gebündelt.
+
+    Die Semantik entspricht Simulator.step + Vehicle.update: Fahrzeuge werden
+    pro (Street, Spur) von vorne nach hinten aktualisiert, der "Leader" ist
+    der bereits aktualisierte Vordermann derselben Gruppe. Wir rechnen daher
+    in Rängen: erst alle vordersten Fahrzeuge (Rang 0, die auf das hinterste
+    Fahrzeug der nächsten Street schauen), dann Rang 1 usw. Jeder Rang ist
+    ein Block von Array-Operationen über alle Spuren gleichzeitig.
+    """
+
+    def __init__(
+        self,
+        intersections: Dict[str, Intersection],
+        streets: Dict[int, Street],
+        capacity: int = 1024,
+        scheduler: Optional[TrafficLightScheduler] = None,
+    ):
+        self.intersections = intersections
+        self.streets = streets
+        self.scheduler = scheduler
+        self._build_network_arrays()
+
+        self.size = 0
+        self._alloc(capacity)
+
+        # Routen liegen hintereinander in einem Puffer (Street-Zeilen)
+        self.route_buf = np.zeros(max(capacity * 8, 64), dtype=np.int32)
+        # Parallel dazu: TURN_*-Code zur nächsten Street der Route
+        self.route_turn = np.zeros(len(self.route_buf), dtype=np.int8)
+        self.route_used = 0
+        # Street-Wechsel im letzten step (für Statistiken)
+        self.last_moved = 0
+        # Optional (Liste statt None): Street-Wechsel als (vid, von-Zeile,
+        # nach-Zeile, -1 = Fahrt beendet) je Rang, für StreamingMetrics
+        self.transitions: Optional[List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None
+        # Optional: hinterste Position je Spur-Zeile für Spuren ohne eigene
+        # Fahrzeuge (NaN = frei), z. B. Rückstau mesoskopischer Streets
+        self.lane_rear: Optional[np.ndarray] = None
+
+    # ------------------------------------------------------------------
+    # Netz
+    # ------------------------------------------------------------------
+    def _build_network_arrays(self):
+        st_list = list(self.streets.values())
+        self.street_ids = np.array([st.id for st in st_list], dtype=np.int64)
+        self.street_row: Dict[int, int] = {st.id: i for i, st in enumerate(st_list)}
+        self.st_length = np.array([st.length for st in st_list], dtype=np.float64)
+        self.st_speed = np.array([st.speed_limit for st in st_list], dtype=np.float64)
+        self.st_lanes = np.array([st.num_lanes for st in st_list], dtype=np.int32)
+
+        # Abbiege-Richtung je verbundenem Street-Paar aus Street.turns
+        # (siehe turns.build_turn_table), sortiert nach Zeile * n + nächste Zeile
+        n = len(st_list)
+        keys = []
+        codes = []
+        for row, st in enumerate(st_list):
+            for nxt_id, turn in st.turns.items():
+                nrow = self.street_row.get(nxt_id)
+                if nrow is not None:
+                    keys.append(row * n + nrow)
+                    codes.append(TURN_CODES[turn])
+        order = np.argsort(np.array(keys, dtype=np.int64), kind="stable")
+        self.turn_keys = np.array(keys, dtype=np.int64)[order]
+        self.turn_codes = np.array(codes, dtype=np.int8)[order]
+
+        # Erlaubte Richtungen je (Street, Spur) als Bitmaske
+        lane_offsets = np.zeros(len(st_list) + 1, dtype=np.int64)
+        lane_offsets[1:] = np.cumsum(self.st_lanes)
+        masks = [m for st in st_list for m in st.lane_masks]
+        self.lane_offsets = lane_offsets
+        self.lane_mask = np.array(masks, dtype=np.int8)
+
+        # Ampel am Endknoten: Index in self.controllers oder -1
+        self.controllers = []
+        ctrl_index: Dict[str, int] = {}
+        for nid, inter in self.intersections.items():
+            if inter.traffic_lights:
+                ctrl_index[nid] = len(self.controllers)
+                self.controllers.append(inter.traffic_lights)
+        self.st_end_ctrl = np.array(
+            [ctrl_index.get(st.end_node, -1) for st in st_list], dtype=np.int64
+        )
+        self.st_end_exists = np.array(
+            [st.end_node in self.intersections for st in st_list], dtype=bool
+        )
+        # Spuren, für die der Controller tatsächlich eine Ampel hat
+        has_light = np.zeros(len(self.lane_mask), dtype=bool)
+        for row, st in enumerate(st_list):
+            ctrl = self.st_end_ctrl[row]
+            if ctrl < 0:
+                continue
+            spurs = self.controllers[ctrl].spurs
+            for ln in range(st.num_lanes):
+                if (st.id, ln) in spurs:
+                    has_light[lane_offsets[row] + ln] = True
+        self.lane_has_light = has_light
+        self.ctrl_green = np.ones(len(self.controllers) + 1, dtype=bool)
+        if self.scheduler is not None:
+            self._sched_index = np.array(
+                [tl._index for tl in self.controllers], dtype=np.int64
+            )
+
+    def _refresh_lights(self):
+        """
+        Übernimmt die aktuellen Ampelphasen der Controller in ein Array
+        (letzter Eintrag = "keine Ampel" => immer grün).
+        Mit TrafficLightScheduler ist das ein einziger Array-Zugriff.
+        """
+        if self.scheduler is not None:
+            self.ctrl_green[:-1] = self.scheduler.green[self._sched_index]
+            return
+        for i, tl in enumerate(self.controllers):
+            self.ctrl_green[i] = tl.global_phase in (PHASE_GREEN, PHASE_YELLOW)
+
+    # ------------------------------------------------------------------
+    # Fahrzeug-Arrays
+    # ------------------------------------------------------------------
+    def _alloc(self, capacity: int):
+        self.vid = np.zeros(capacity, dtype=np.int64)
+        self.profile = np.zeros(capacity, dtype=np.int8)
+        self.street = np.zeros(capacity, dtype=np.int32)
+        self.lane = np.zeros(capacity, dtype=np.int32)
+        self.position_s = np.zeros(capacity, dtype=np.float64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        self.speed_factor = np.zeros(capacity, dtype=np.float64)
+        self.reaction_time = np.zeros(capacity, dtype=np.float64)
+        self.base_limit = np.zeros(capacity, dtype=np.float64)
+        self.route_off = np.zeros(capacity, dtype=np.int64)
+        self.route_len = np.zeros(capacity, dtype=np.int32)
+        self.route_ptr = np.zeros(capacity, dtype=np.int32)
+        self.done = np.zeros(capacity, dtype=bool)
+
+    _COLUMNS = (
+        "vid",
+        "profile",
+        "street",
+        "lane",
+        "position_s",
+        "speed",
+        "speed_factor",
+        "reaction_time",
+        "base_limit",
+        "route_off",
+        "route_len",
+        "route_ptr",
+        "done",
+    )
+
+    def _grow(self, needed: int):
+        capacity = len(self.vid)
+        if needed <= capacity:
+            return
+        new_cap = max(needed, capacity * 2)
+        for name in self._COLUMNS:
+            old = getattr(self, name)
+            arr = np.zeros(new_cap, dtype=old.dtype)
+            arr[: self.size] = old[: self.size]
+            setattr(self, name, arr)
+
+    def _route_turns(
+        self, rows: np.ndarray, lens: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        TURN_*-Code je Routen-Eintrag (Richtung zur nächsten Street derselben
+        Route, TURN_NONE am Routenende). rows = eine Route oder mehrere
+        hintereinander mit den Längen lens.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        turn = np.full(len(rows), TURN_NONE, dtype=np.int8)
+        has_next = np.ones(len(rows), dtype=bool)
+        if lens is None:
+            has_next[-1:] = False
+        else:
+            ends = np.cumsum(lens) - 1
+            has_next[ends[np.asarray(lens) > 0]] = False
+        i = np.flatnonzero(has_next)
+        if not len(i):
+            return turn
+        keys = rows[i] * len(self.street_ids) + rows[i + 1]
+        found = np.zeros(len(i), dtype=bool)
+        if len(self.turn_keys):
+            pos = np.minimum(np.searchsorted(self.turn_keys, keys), len(self.turn_keys) - 1)
+            found = self.turn_keys[pos] == keys
+            turn[i[found]] = self.turn_codes[pos[found]]
+        # Paare, die nicht in der Tabelle stehen (Streets ohne Simulator gebaut)
+        ids = self.street_ids
+        for k in i[~found].tolist():
+            cur = self.streets[int(ids[rows[k]])]
+            nxt = self.streets[int(ids[rows[k + 1]])]
+            turn[k] = TURN_CODES[lookup_turn(cur, nxt)]
+        return turn
+
+    def _append_route(self, rows: List[int], lens: Optional[np.ndarray] = None) -> int:
+        needed = self.route_used + len(rows)
+        if needed > len(self.route_buf):
+            self._compact_routes()
+            needed = self.route_used + len(rows)
+            if needed > len(self.route_buf):
+                size = max(needed, len(self.route_buf) * 2)
+                buf = np.zeros(size, dtype=np.int32)
+                buf[: self.route_used] = self.route_buf[: self.route_used]
+                self.route_buf = buf
+                turn = np.zeros(size, dtype=np.int8)
+                turn[: self.route_used] = self.route_turn[: self.route_used]
+                self.route_turn = turn
+        off = self.route_used
+        self.route_buf[off : off + len(rows)] = rows
+        self.route_turn[off : off + len(rows)] = self._route_turns(rows, lens)
+        self.route_used += len(rows)
+        return off
+
+    def _compact_routes(self):
+        """Entfernt Routen bereits entfernter Fahrzeuge aus dem Puffer."""
+        n = self.size
+        lens = self.route_len[:n].astype(np.int64)
+        if self.route_used <= int(lens.sum()):
+            return
+        new_off = np.zeros(n, dtype=np.int64)
+        if n:
+            new_off[1:] = np.cumsum(lens)[:-1]
+        idx = np.repeat(self.route_off[:n] - new_off, lens) + np.arange(
+            int(lens.sum()), dtype=np.int64
+        )
+        total = int(lens.sum())
+        self.route_buf[:total] = self.route_buf[idx]
+        self.route_turn[:total] = self.route_turn[idx]
+        self.route_off[:n] = new_off
+        self.route_used = total
+
+    def replace_route(self, i: int, street_ids: Sequence[int]):
+        """
+        Neue Route für Fahrzeug i, beginnend mit seiner aktuellen Street.
+        Die alte Route bleibt bis zur nächsten Kompaktierung im Puffer.
+        """
+        rows = [self.street_row[st_id] for st_id in street_ids]
+        off = self._append_route(rows)
+        self.route_off[i] = off
+        self.route_len[i] = len(rows)
+        self.route_ptr[i] = 0
+
+    def take(self, mask: np.ndarray) -> Dict[str, list]:
+        """
+        Entfernt die Fahrzeuge mit mask[i] (Länge size) und gibt ihren
+        Zustand zurück: vid, profile (Namen), lane, route_index und routes
+        (Street-ID-Tupel). Die Reihenfolge der übrigen bleibt erhalten.
+        """
+        n = self.size
+        idx = np.flatnonzero(mask)
+        ids = self.street_ids
+        routes = [
+            tuple(ids[self.route_buf[off : off + ln]].tolist())
+            for off, ln in zip(self.route_off[idx].tolist(), self.route_len[idx].tolist())
+        ]
+        taken = {
+            "vid": self.vid[idx].tolist(),
+            "profile": [PROFILE_NAMES[p] for p in self.profile[idx].tolist()],
+            "lane": self.lane[idx].tolist(),
+            "route_index": self.route_ptr[idx].tolist(),
+            "routes": routes,
+        }
+        keep = ~mask
+        for name in self._COLUMNS:
+            arr = getattr(self, name)
+            arr[: n - len(idx)] = arr[:n][keep]
+        self.size = n - len(idx)
+        return taken
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add_vehicle(
+        self,
+        vehicle_id: int,
+        profile: str,
+        street_id: int,
+        lane_index: int,
+        route_streets: List[int],
+        position_s: float = 0.0,
+        speed: float = 0.0,
+        route_index: int = 0,
+    ):
+        """Fügt ein Fahrzeug hinzu (Startwerte wie im Vehicle-Konstruktor)."""
+        i = self.size
+        self._grow(i + 1)
+        sf, rt = VEHICLE_PROFILES[profile]
+        row = self.street_row[street_id]
+        self.vid[i] = vehicle_id
+        self.profile[i] = PROFILE_NAMES.index(profile)
+        self.street[i] = row
+        self.lane[i] = lane_index
+        self.position_s[i] = position_s
+        self.speed[i] = speed
+        self.speed_factor[i] = sf
+        self.reaction_time[i] = rt
+        self.base_limit[i] = self.st_speed[row] * sf
+        self.route_off[i] = self._append_route(
+            [self.street_row[s] for s in route_streets]
+        )
+        self.route_len[i] = len(route_streets)
+        self.route_ptr[i] = route_index
+        self.done[i] = False
+        self.size += 1
+
+    def add_vehicles(
+        self,
+        vehicle_ids: List[int],
+        profiles: List[str],
+        lanes: List[int],
+        routes: List[List[int]],
+    ):
+        """
+        Fügt viele Fahrzeuge auf einmal hinzu (Start jeweils auf der ersten
+        Street ihrer Route, position_s = 0, speed = 0).
+        """
+        k = len(vehicle_ids)
+        if k == 0:
+            return
+        i0 = self.size
+        self._grow(i0 + k)
+        sl = slice(i0, i0 + k)
+        row_of = self.street_row
+        rows = [[row_of[s] for s in r] for r in routes]
+        first = np.array([r[0] for r in rows], dtype=np.int32)
+        prof = np.array([PROFILE_NAMES.index(p) for p in profiles], dtype=np.int8)
+        sf_table = np.array([VEHICLE_PROFILES[p][0] for p in PROFILE_NAMES])
+        rt_table = np.array([VEHICLE_PROFILES[p][1] for p in PROFILE_NAMES])
+
+        self.vid[sl] = vehicle_ids
+        self.profile[sl] = prof
+        self.street[sl] = first
+        self.lane[sl] = lanes
+        self.position_s[sl] = 0.0
+        self.speed[sl] = 0.0
+        self.speed_factor[sl] = sf_table[prof]
+        self.reaction_time[sl] = rt_table[prof]
+        self.base_limit[sl] = self.st_speed[first] * sf_table[prof]
+        lens = np.array([len(r) for r in rows], dtype=np.int64)
+        self.route_len[sl] = lens
+        self.route_ptr[sl] = 0
+        self.done[sl] = False
+        # Alle Routen in einem Stück anhängen
+        off = self._append_route([x for r in rows for x in r], lens)
+        self.route_off[sl] = off + np.cumsum(lens) - lens
+        self.size += k
+
+    def load_vehicles(self, vehicles: List[Vehicle]):
+        """Übernimmt bestehende Vehicle-Objekte (Reihenfolge bleibt erhalten)."""
+        for v in vehicles:
+            self.add_vehicle(
+                v.vehicle_id,
+                v.profile,
+                v.current_street_id(),
+                v.lane_index,
+                v.route_streets,
+                position_s=v.position_s,
+                speed=v.speed,
+                route_index=v.route_index,
+            )
+            self.base_limit[self.size - 1] = v.base_speed_limit
+            self.done[self.size - 1] = v.done
+
+    def to_vehicles(self) -> List[Vehicle]:
+        """Erzeugt Vehicle-Objekte mit dem aktuellen Zustand (z. B. fürs Dashboard)."""
+        result = []
+        for i in range(self.size):
+            off, ln = int(self.route_off[i]), int(self.route_len[i])
+            route = [int(self.street_ids[r]) for r in self.route_buf[off : off + ln]]
+            v = Vehicle(
+                vehicle_id=int(self.vid[i]),
+                profile=PROFILE_NAMES[self.profile[i]],
+                current_street=self.streets[int(self.street_ids[self.street[i]])],
+                lane_index=int(self.lane[i]),
+                route_streets=route,
+                streets_map=self.streets,
+                intersections_map=self.intersections,
+            )
+            v.position_s = float(self.position_s[i])
+            v.speed = float(self.speed[i])
+            v.route_index = int(self.route_ptr[i])
+            v.base_speed_limit = float(self.base_limit[i])
+            v.done = bool(self.done[i])
+            v.plan_turn()
+            result.append(v)
+        return result
+
+    def branch(
+        self,
+        intersections: Dict[str, Intersection],
+        scheduler: Optional[TrafficLightScheduler],
+    ) -> "VectorizedEngine":
+        """
+        Kopie für Simulator.fork(): Netz-Arrays werden geteilt, nur die
+        Fahrzeugspalten und der Routen-Puffer kopiert. scheduler muss die
+        Controller in derselben Reihenfolge enthalten.
+        """
+        other = copy.copy(self)
+        other.intersections = intersections
+        other.scheduler = scheduler
+        other.transitions = None
+        other.ctrl_green = self.ctrl_green.copy()
+        if self.lane_rear is not None:
+            other.lane_rear = self.lane_rear.copy()
+        for name in self._COLUMNS:
+            setattr(other, name, getattr(self, name).copy())
+        other.route_buf = self.route_buf[: max(self.route_used, 64)].copy()
+        other.route_turn = self.route_turn[: max(self.route_used, 64)].copy()
+        return other
+
+    def export_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Fahrzeugzustand als kompakte Spalten (Street-IDs statt Zeilen,
+        Routen als Offsets + flacher Puffer), z. B. für Checkpoints.
+        """
+        n = self.size
+        lens = self.route_len[:n].astype(np.int64)
+        route_offsets = np.zeros(n + 1, dtype=np.int64)
+        route_offsets[1:] = np.cumsum(lens)
+        idx = np.repeat(self.route_off[:n] - route_offsets[:-1], lens) + np.arange(
+            int(route_offsets[-1]), dtype=np.int64
+        )
+        return {
+            "vid": self.vid[:n].copy(),
+            "profile": self.profile[:n].copy(),
+            "street": self.street_ids[self.street[:n]],
+            "lane": self.lane[:n].copy(),
+            "position_s": self.position_s[:n].copy(),
+            "speed": self.speed[:n].copy(),
+            "base_limit": self.base_limit[:n].copy(),
+            "route_index": self.route_ptr[:n].copy(),
+            "route_offsets": route_offsets,
+            "route_streets": self.street_ids[self.route_buf[idx]],
+        }
+
+    def import_columns(self, cols: Dict[str, np.ndarray]):
+        """Ersetzt alle Fahrzeuge durch den Zustand aus export_columns()."""
+        n = len(cols["vid"])
+        self.size = 0
+        self._grow(n)
+        row_of = np.zeros(int(self.street_ids.max(initial=0)) + 1, dtype=np.int32)
+        row_of[self.street_ids] = np.arange(len(self.street_ids), dtype=np.int32)
+        prof = cols["profile"].astype(np.int8)
+        sf_table = np.array([VEHICLE_PROFILES[p][0] for p in PROFILE_NAMES])
+        rt_table = np.array([VEHICLE_PROFILES[p][1] for p in PROFILE_NAMES])
+        route_offsets = cols["route_offsets"]
+
+        self.vid[:n] = cols["vid"]
+        self.profile[:n] = prof
+        self.street[:n] = row_of[cols["street"]]
+        self.lane[:n] = cols["lane"]
+        self.position_s[:n] = cols["position_s"]
+        self.speed[:n] = cols["speed"]
+        self.speed_factor[:n] = sf_table[prof]
+        self.reaction_time[:n] = rt_table[prof]
+        self.base_limit[:n] = cols["base_limit"]
+        self.route_off[:n] = route_offsets[:-1]
+        self.route_len[:n] = np.diff(route_offsets)
+        self.route_ptr[:n] = cols["route_index"]
+        self.done[:n] = False
+
+        total = int(route_offsets[-1])
+        if total > len(self.route_buf):
+            self.route_buf = np.zeros(total, dtype=np.int32)
+            self.route_turn = np.zeros(total, dtype=np.int8)
+        self.route_buf[:total] = row_of[cols["route_streets"]]
+        self.route_turn[:total] = self._route_turns(
+            self.route_buf[:total], np.diff(route_offsets)
+        )
+        self.route_used = total
+        self.size = n
+
+    # ------------------------------------------------------------------
+    # Simulation
+    # ------------------------------------------------------------------
+    def _turn_direction(self, idx: np.ndarray) -> np.ndarray:
+        """
+        Abbiege-Richtung zur nächsten Street der Route (TURN_* Codes, beim
+        Laden der Route aus Street.turns übernommen, siehe _route_turns).
+        """
+        last = self.route_len[idx] - 1
+        ptr = np.minimum(self.route_ptr[idx], last)
+        turn = self.route_turn[self.route_off[idx] + ptr]
+        return np.where(ptr < last, turn, TURN_NONE).astype(np.int8)
+
+    def _green(self, street: np.ndarray, lane: np.ndarray) -> np.ndarray:
+        """Darf ein Fahrzeug von (street, lane) in die Kreuzung einfahren?"""
+        ctrl = self.st_end_ctrl[street]
+        lane_row = self.lane_offsets[street] + lane
+        green = self.ctrl_green[ctrl]
+        return ~self.st_end_exists[street] | ~self.lane_has_light[lane_row] | green
+
+    def _update(
+        self,
+        idx: np.ndarray,
+        leader: Optional[np.ndarray],
+        dt: float,
+        next_leader_s: Optional[np.ndarray] = None,
+    ):
+        """
+        Entspricht Vehicle.update für alle Fahrzeuge in idx. leader = Index
+        des (bereits aktualisierten) Vordermanns; ohne Vordermann optional
+        next_leader_s = Position des hintersten Fahrzeugs auf der nächsten
+        Street (NaN = frei).
+        """
+        st = self.street[idx]
+        lane = self.lane[idx].copy()
+        pos = self.position_s[idx]
+        speed = self.speed[idx]
+        length = self.st_length[st]
+        dist_to_end = length - pos
+
+        accel = np.full(len(idx), MAX_ACCEL)
+        if leader is not None:
+            same = (self.street[leader] == st) & (self.lane[leader] == lane)
+            gap = self.position_s[leader] - pos - MIN_GAP
+            accel[same & (gap < speed * self.reaction_time[idx])] = -MAX_DECEL
+        elif next_leader_s is not None:
+            gap = dist_to_end + next_leader_s - MIN_GAP
+            with np.errstate(invalid="ignore"):
+                close = gap < speed * self.reaction_time[idx]
+            accel[close] = -MAX_DECEL
+
+        # Spurwechsel vor dem Abbiegen
+        turn = self._turn_direction(idx)
+        near = (turn != TURN_NONE) & (dist_to_end < TURN_LOOKAHEAD)
+        if near.any():
+            mask = self.lane_mask[self.lane_offsets[st] + lane]
+            need = np.select(
+                [turn == TURN_LEFT, turn == TURN_THROUGH, turn == TURN_RIGHT],
+                [LANE_LEFT, LANE_THROUGH, LANE_RIGHT],
+                0,
+            ).astype(np.int8)
+            wrong = near & ((mask & need) == 0)
+            go_left = wrong & (turn == TURN_LEFT) & (lane < self.st_lanes[st] - 1)
+            go_right = wrong & (turn == TURN_RIGHT) & (lane > 0)
+            lane[go_left] += 1
+            lane[go_right] -= 1
+
+        # Ampel voraus
+        green = self._green(st, lane)
+        accel[(dist_to_end < LIGHT_LOOKAHEAD) & ~green] = -MAX_DECEL
+
+        sf = self.speed_factor[idx]
+        final_limit = np.minimum(self.st_speed[st] * sf, self.base_limit[idx])
+        new_speed = speed + accel * dt
+        new_speed = np.maximum(0.0, np.minimum(new_speed, final_limit))
+        new_pos = pos + new_speed * dt
+
+        at_end = new_pos >= length
+        moving = ~at_end
+        self.speed[idx[moving]] = new_speed[moving]
+        self.position_s[idx[moving]] = new_pos[moving]
+        self.lane[idx] = lane
+
+        if not at_end.any():
+            return
+
+        # Ende der Street erreicht
+        missing = at_end & ~self.st_end_exists[st]
+        self.done[idx[missing]] = True
+        if self.transitions is not None and missing.any():
+            m_idx = idx[missing]
+            self.transitions.append(
+                (self.vid[m_idx], st[missing], np.full(len(m_idx), -1, dtype=np.int32))
+            )
+
+        blocked = at_end & self.st_end_exists[st] & ~green
+        self.speed[idx[blocked]] = 0.0
+        self.position_s[idx[blocked]] = length[blocked]
+
+        passing = at_end & self.st_end_exists[st] & green
+        if not passing.any():
+            return
+        p_idx = idx[passing]
+        self.route_ptr[p_idx] += 1
+        finished = self.route_ptr[p_idx] >= self.route_len[p_idx]
+        self.done[p_idx[finished]] = True
+
+        t_idx = p_idx[~finished]
+        self.last_moved += len(t_idx)
+        if self.transitions is not None:
+            to_row = np.full(len(p_idx), -1, dtype=np.int32)
+            to_row[~finished] = self.route_buf[
+                self.route_off[t_idx] + self.route_ptr[t_idx]
+            ]
+            self.transitions.append((self.vid[p_idx], st[passing], to_row))
+        if len(t_idx):
+            nxt = self.route_buf[self.route_off[t_idx] + self.route_ptr[t_idx]]
+            self.street[t_idx] = nxt
+            self.lane[t_idx] = np.minimum(self.lane[t_idx], self.st_lanes[nxt] - 1)
+            self.position_s[t_idx] = 0.0
+            self.speed[t_idx] = 0.0
+            self.base_limit[t_idx] = self.st_speed[nxt] * self.speed_factor[t_idx]
+
+    def _next_leader_positions(
+        self, order: np.ndarray, starts: np.ndarray, group_keys: np.ndarray
+    ) -> np.ndarray:
+        """
+        order = Fahrzeuge sortiert nach (Street, Spur, von vorne nach hinten),
+        starts = Beginn jeder Gruppe in order, group_keys = globale Spur-ID je
+        Gruppe (aufsteigend). Liefert je Gruppe für deren vorderstes Fahrzeug
+        die Position des hintersten Fahrzeugs in der Spur der nächsten
+        Route-Street, in die es einfahren würde (NaN, falls frei/keine).
+        """
+        heads = order[starts]
+        result = np.full(len(heads), np.nan)
+        has_next = self.route_ptr[heads] < self.route_len[heads] - 1
+        if not has_next.any():
+            return result
+        h = heads[has_next]
+        nxt = self.route_buf[self.route_off[h] + self.route_ptr[h] + 1]
+        target = self.lane_offsets[nxt] + np.minimum(self.lane[h], self.st_lanes[nxt] - 1)
+        g = np.minimum(np.searchsorted(group_keys, target), len(group_keys) - 1)
+        found = group_keys[g] == target
+        ends = np.append(starts[1:], len(order)) - 1
+        rear = order[ends[g]]
+        rear_s = np.where(found, self.position_s[rear], np.nan)
+        if self.lane_rear is not None:
+            rear_s = np.where(found, rear_s, self.lane_rear[target])
+        result[has_next] = rear_s
+        return result
+
+    def step(self, dt: float) -> int:
+        """
+        Ein Zeitschritt für alle Fahrzeuge (Ampeln müssen vorher aktualisiert
+        sein). Gibt die Anzahl entfernter (fertiger) Fahrzeuge zurück.
+        """
+        n = self.size
+        self.last_moved = 0
+        if n == 0:
+            return 0
+        self._refresh_lights()
+
+        # Gruppen (Street, Spur), innerhalb von vorne nach hinten
+        # (wie lane_index.lane_order_key: position_s absteigend, dann ID)
+        order = np.lexsort(
+            (self.vid[:n], -self.position_s[:n], self.lane[:n], self.street[:n])
+        )
+        st_sorted = self.street[order]
+        ln_sorted = self.lane[order]
+        new_group = np.ones(n, dtype=bool)
+        new_group[1:] = (st_sorted[1:] != st_sorted[:-1]) | (ln_sorted[1:] != ln_sorted[:-1])
+        group_start = np.maximum.accumulate(np.where(new_group, np.arange(n), 0))
+        rank = np.arange(n) - group_start
+
+        # Vorderste Fahrzeuge: hinterstes Fahrzeug der nächsten Street (Tick-Beginn)
+        starts = np.flatnonzero(new_group)
+        group_keys = self.lane_offsets[st_sorted[starts]] + ln_sorted[starts]
+        next_leader_s = self._next_leader_positions(order, starts, group_keys)
+
+        # Rang für Rang: der Leader (Rang r-1) ist dann bereits aktualisiert
+        max_rank = int(rank.max())
+        by_rank = np.argsort(rank, kind="stable")
+        bounds = np.searchsorted(rank[by_rank], np.arange(max_rank + 2))
+        for r in range(max_rank + 1):
+            pos_sorted = by_rank[bounds[r] : bounds[r + 1]]
+            idx = order[pos_sorted]
+            if r == 0:
+                self._update(idx, None, dt, next_leader_s)
+            else:
+                self._update(idx, order[pos_sorted - 1], dt)
+
+        # Fertige entfernen (Reihenfolge bleibt erhalten)
+        keep = ~self.done[:n]
+        removed = int(n - keep.sum())
+        if removed:
+            for name in self._COLUMNS:
+                arr = getattr(self, name)
+                arr[: n - removed] = arr[:n][keep]
+            self.size = n - removed
+            if self.route_used > 2 * int(self.route_len[: self.size].sum()) + 1024:
+                self._compact_routes()
+        return removed
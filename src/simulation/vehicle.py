@@ -1,8 +1,8 @@
-import math
-from typing import Dict, List, Optional
+from typing import Dict, Optional, Sequence
 
 from .intersection import Intersection
 from .street import Street
+from .turns import TURN_BITS, lookup_turn, target_lane
 
 VEHICLE_PROFILES = {
     "raser": (1.50, 0.8),
@@ -12,13 +12,46 @@ VEHICLE_PROFILES = {
 
 
 class Vehicle:
+    """
+    Einzelnes Fahrzeug des Objekt-Modells. Feste Attribute (__slots__),
+    damit auch Millionen Fahrzeuge ohne __dict__ auskommen; route_streets
+    ist in der Regel ein geteiltes Array aus der RouteTable des Simulators.
+    """
+
+    __slots__ = (
+        "vehicle_id",
+        "profile",
+        "speed_factor",
+        "reaction_time",
+        "current_street",
+        "lane_index",
+        "position_s",
+        "route_streets",
+        "route_index",
+        "streets_map",
+        "intersections_map",
+        "speed",
+        "base_speed_limit",
+        "done",
+        "next_turn",
+        "target_lane",
+        "asleep",
+        "changed",
+        "sleep_leader",
+        "sleep_next_s",
+    )
+
+    # Für alle Fahrzeuge gleich
+    max_accel = 2.0
+    max_decel = 4.0
+
     def __init__(
         self,
         vehicle_id: int,
         profile: str,
         current_street: Street,
         lane_index: int,
-        route_streets: List[int],
+        route_streets: Sequence[int],
         streets_map: Dict[int, Street],
         intersections_map: Dict[str, Intersection],
     ):
@@ -37,40 +70,63 @@ class Vehicle:
         self.intersections_map = intersections_map
 
         self.speed = 0.0
-        self.max_accel = 2.0
-        self.max_decel = 4.0
 
         self.base_speed_limit = current_street.speed_limit * self.speed_factor
         self.done = False
 
+        # Abbiegen am Ende der aktuellen Street (siehe plan_turn)
+        self.next_turn: Optional[str] = None
+        self.target_lane = lane_index
+        self.plan_turn()
+
+        # Schlafzustand (nur mit Simulator(sleep_idle=True)): letztes update
+        # war ein No-op; gesehen wurden sleep_leader bzw. sleep_next_s
+        self.asleep = False
+        self.changed = False
+        self.sleep_leader: Optional["Vehicle"] = None
+        self.sleep_next_s: Optional[float] = None
+
     def current_street_id(self) -> int:
         return self.current_street.id if self.current_street else -1
 
-    def update(self, dt: float, leader: Optional["Vehicle"]):
+    def next_street_id(self) -> Optional[int]:
+        if self.route_index >= len(self.route_streets) - 1:
+            return None
+        return self.route_streets[self.route_index + 1]
+
+    def update(
+        self,
+        dt: float,
+        leader: Optional["Vehicle"],
+        next_leader_s: Optional[float] = None,
+    ):
+        """
+        Ein Zeitschritt. leader = Vordermann auf derselben Spur (bereits
+        aktualisiert); ohne Vordermann optional next_leader_s = Position des
+        hintersten Fahrzeugs auf der nächsten Street der Route.
+        """
         if self.done:
             return
 
         dist_to_end = self.current_street.length - self.position_s
 
         desired_accel = self.max_accel
-        if leader and leader.current_street_id() == self.current_street_id():
-            if leader.lane_index == self.lane_index:
+        if leader:
+            if (
+                leader.current_street_id() == self.current_street_id()
+                and leader.lane_index == self.lane_index
+            ):
                 gap = leader.position_s - self.position_s - 5.0
                 if gap < self.speed * self.reaction_time:
                     desired_accel = -self.max_decel
+        elif next_leader_s is not None:
+            gap = dist_to_end + next_leader_s - 5.0
+            if gap < self.speed * self.reaction_time:
+                desired_accel = -self.max_decel
 
-        turn_dir = self._next_turn_direction()
-
-        if turn_dir and dist_to_end < 50.0:
-            if not self._lane_allows_turn(
-                self.current_street, self.lane_index, turn_dir
-            ):
-                if turn_dir == "left":
-                    if self.lane_index < self.current_street.num_lanes - 1:
-                        self.lane_index += 1
-                elif turn_dir == "right":
-                    if self.lane_index > 0:
-                        self.lane_index -= 1
+        # Kurz vor dem Ende je Tick eine Spur Richtung Abbiegespur
+        if self.lane_index != self.target_lane and dist_to_end < 50.0:
+            self.lane_index += 1 if self.target_lane > self.lane_index else -1
 
         if dist_to_end < 20.0:
             end_n = self.current_street.end_node
@@ -110,6 +166,7 @@ class Vehicle:
                     self.position_s = 0.0
                     self.speed = 0.0
                     self.base_speed_limit = next_st.speed_limit * self.speed_factor
+                    self.plan_turn()
                     return
             else:
                 self.done = True
@@ -117,35 +174,26 @@ class Vehicle:
             self.speed = new_speed
             self.position_s = new_pos
 
+    def plan_turn(self):
+        """
+        Bestimmt beim Einfahren in eine Street die Abbiege-Richtung zur
+        nächsten Street der Route und die Zielspur dafür (aus den beim
+        Netzaufbau berechneten Tabellen). Muss erneut aufgerufen werden,
+        wenn current_street, lane_index oder route_index von außen gesetzt
+        werden.
+        """
+        self.next_turn = self._next_turn_direction()
+        self.target_lane = target_lane(
+            self.current_street, self.lane_index, self.next_turn
+        )
+
     def _next_turn_direction(self) -> Optional[str]:
         if self.route_index >= len(self.route_streets) - 1:
             return None
-        next_st_id = self.route_streets[self.route_index + 1]
-        next_st = self.streets_map[next_st_id]
-        ccoords = self.current_street.coords
-        v1 = (ccoords[-1][0] - ccoords[-2][0], ccoords[-1][1] - ccoords[-2][1])
-        ncoords = next_st.coords
-        v2 = (ncoords[1][0] - ncoords[0][0], ncoords[1][1] - ncoords[0][1])
-        a1 = math.atan2(v1[1], v1[0])
-        a2 = math.atan2(v2[1], v2[0])
-        diff = math.degrees(a2 - a1)
-        if diff > 180:
-            diff -= 360
-        elif diff < -180:
-            diff += 360
-        if diff > 30:
-            return "right"
-        elif diff < -30:
-            return "left"
-        else:
-            return "through"
+        next_st = self.streets_map[self.route_streets[self.route_index + 1]]
+        return lookup_turn(self.current_street, next_st)
 
     def _lane_allows_turn(self, st: Street, ln: int, turn: str) -> bool:
         if ln < 0 or ln >= st.num_lanes:
             return False
-        directions = st.lane_dirs[ln]
-        return (
-            (turn in directions or "through" in directions)
-            if turn == "through"
-            else (turn in directions)
-        )
+        return bool(st.lane_masks[ln] & TURN_BITS[turn])
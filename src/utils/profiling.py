@@ -0,0 +1,241 @@
+import cProfile
+import json
+import math
+import os
+import time
+
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional
+
+# Gemeinsamer Kontext für abgeschaltete Messungen (keine Allokation je Aufruf)
+NULL_PHASE = nullcontext()
+
+
+def null_phase(name: str) -> ContextManager:
+    """Ersatz für Profiler.phase, wenn kein Profiler aktiv ist."""
+    return NULL_PHASE
+
+
+class Histogram:
+    """
+    Histogramm mit Zweierpotenz-Buckets: Bucket k zählt Werte in
+    [2^k, 2^(k+1)); Werte <= 0 landen in Bucket None ("<=0").
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets: Dict[Optional[int], int] = {}
+
+    def add(self, value: float, n: int = 1):
+        self.count += n
+        self.total += value * n
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        k = math.floor(math.log2(value)) if value > 0 else None
+        self.buckets[k] = self.buckets.get(k, 0) + n
+
+    def to_dict(self) -> dict:
+        buckets = {
+            ("<=0" if k is None else f"{2.0 ** k:g}"): c
+            for k, c in sorted(
+                self.buckets.items(), key=lambda kv: -math.inf if kv[0] is None else kv[0]
+            )
+        }
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "buckets": buckets,
+        }
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start, self.start)
+        return False
+
+
+class Profiler:
+    """
+    Messungen für die Simulationsschleife: Phasen-Timer, Zähler und
+    Histogramme, optional als Zeitleiste (Chrome-Trace).
+
+    Der Simulator ruft den Profiler nur auf, wenn einer gesetzt ist
+    (Simulator.enable_profiling); sonst kosten die Messpunkte je Tick nur
+    ein paar Attributzugriffe.
+
+    sample_ticks() registriert einen Hook für ausgewählte Ticks (z. B.
+    cProfile oder ein externer Sampling-Profiler), siehe cprofile_hook().
+    """
+
+    def __init__(self, trace: bool = False, max_trace_events: int = 1_000_000):
+        self.trace = trace
+        self.max_trace_events = max_trace_events
+        self._origin = time.perf_counter()
+        self.reset()
+        self._tick_hook: Optional[Callable[[int], ContextManager]] = None
+        self._hook_every: Optional[int] = None
+        self._hook_ticks: Optional[set] = None
+
+    def reset(self):
+        # name -> [Anzahl, Summe, Minimum, Maximum] (Sekunden)
+        self.timers: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.events: List[dict] = []
+
+    # ------------------------------------------------------------------
+    # Erfassen
+    # ------------------------------------------------------------------
+    def phase(self, name: str) -> _Phase:
+        """Kontextmanager, der die Dauer des Blocks unter `name` verbucht."""
+        return _Phase(self, name)
+
+    def add_time(self, name: str, seconds: float, start: Optional[float] = None):
+        t = self.timers.get(name)
+        if t is None:
+            self.timers[name] = [1, seconds, seconds, seconds]
+        else:
+            t[0] += 1
+            t[1] += seconds
+            if seconds < t[2]:
+                t[2] = seconds
+            if seconds > t[3]:
+                t[3] = seconds
+        if self.trace and start is not None and len(self.events) < self.max_trace_events:
+            self.events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self._origin) * 1e6,
+                    "dur": seconds * 1e6,
+                    "pid": os.getpid(),
+                    "tid": 0,
+                }
+            )
+
+    def count(self, name: str, n: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: float, n: int = 1):
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = Histogram()
+        h.add(value, n)
+
+    # ------------------------------------------------------------------
+    # Hooks für ausgewählte Ticks
+    # ------------------------------------------------------------------
+    def sample_ticks(
+        self,
+        hook: Callable[[int], ContextManager],
+        every: Optional[int] = None,
+        ticks: Optional[Iterable[int]] = None,
+    ):
+        """
+        hook(tick) liefert einen Kontextmanager, der den ganzen Tick umschließt;
+        aufgerufen für jeden `every`-ten Tick und/oder die Ticks in `ticks`.
+        """
+        self._tick_hook = hook
+        self._hook_every = every
+        self._hook_ticks = set(ticks) if ticks is not None else None
+
+    def tick_context(self, tick: int) -> ContextManager:
+        hook = self._tick_hook
+        if hook is None:
+            return NULL_PHASE
+        if (self._hook_every and tick % self._hook_every == 0) or (
+            self._hook_ticks is not None and tick in self._hook_ticks
+        ):
+            return hook(tick)
+        return NULL_PHASE
+
+    # ------------------------------------------------------------------
+    # Auswertung / Export
+    # ------------------------------------------------------------------
+    def stats(self) -> dict:
+        timers = {
+            name: {
+                "count": int(c),
+                "total_s": total,
+                "mean_ms": total / c * 1e3 if c else None,
+                "min_ms": lo * 1e3,
+                "max_ms": hi * 1e3,
+            }
+            for name, (c, total, lo, hi) in sorted(self.timers.items())
+        }
+        return {
+            "timers": timers,
+            "counters": dict(sorted(self.counters.items())),
+            "histograms": {
+                name: h.to_dict() for name, h in sorted(self.histograms.items())
+            },
+        }
+
+    def to_json(self, path: str, extra: Optional[dict] = None):
+        data = self.stats()
+        if extra:
+            data.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    def to_chrome_trace(self, path: str):
+        """
+        Zeitleiste im Chrome-Trace-Format (chrome://tracing, Perfetto).
+        Nur verfügbar, wenn der Profiler mit trace=True angelegt wurde.
+        """
+        if not self.trace:
+            raise ValueError("Profiler wurde ohne trace=True angelegt")
+        events = list(self.events)
+        for name, value in self.counters.items():
+            events.append(
+                {
+                    "name": name,
+                    "ph": "C",
+                    "ts": (time.perf_counter() - self._origin) * 1e6,
+                    "pid": os.getpid(),
+                    "args": {"value": value},
+                }
+            )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class _CProfileTick:
+    def __init__(self, path: str):
+        self.path = path
+        self.prof = cProfile.Profile()
+
+    def __enter__(self):
+        self.prof.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.disable()
+        self.prof.dump_stats(self.path)
+        return False
+
+
+def cprofile_hook(directory: str) -> Callable[[int], ContextManager]:
+    """
+    Hook für Profiler.sample_ticks: profiliert den Tick mit cProfile und
+    schreibt <directory>/tick_<n>.prof (auswertbar mit pstats/snakeviz).
+    """
+    os.makedirs(directory, exist_ok=True)
+    return lambda tick: _CProfileTick(os.path.join(directory, f"tick_{tick:06d}.prof"))
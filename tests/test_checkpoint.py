@@ -0,0 +1,84 @@
+"""
+Checkpoint und fork: ein geladener Zustand muss genau so weiterlaufen wie
+der ununterbrochene Lauf, und eine Verzweigung darf ihre Basis nicht
+verändern.
+"""
+
+import numpy as np
+import pytest
+
+from src.simulation import Simulator
+from src.simulation.TrafficLight import PHASE_GREEN
+from src.simulation.synthetic import grid_network
+
+ENGINES = ("objects", "vectorized")
+
+
+def _build(engine: str, meso: bool = False, reroute: bool = False) -> Simulator:
+    intersections, streets = grid_network(8, 8, seed=2)
+    sim = Simulator.from_network(intersections, streets, seed=3, engine=engine)
+    if meso:
+        nodes = list(intersections)
+        sim.enable_meso(micro_nodes=[nodes[len(nodes) // 2]], radius=250.0)
+    if reroute:
+        sim.enable_rerouting(interval=20.0)
+    return sim
+
+
+def _assert_same(a: Simulator, b: Simulator, step: int):
+    ca, cb = a.vehicle_columns(), b.vehicle_columns()
+    for name in ("vid", "street", "lane", "position_s", "speed"):
+        assert np.array_equal(ca[name], cb[name]), (step, name)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "options", [{}, {"meso": True}, {"reroute": True}], ids=["micro", "meso", "reroute"]
+)
+def test_checkpoint_resumes_same_run(tmp_path, engine, options):
+    base = _build(engine, **options)
+    base.spawn_vehicles(400, processes=1)
+    for _ in range(80):
+        base.step(1.0)
+    path = str(tmp_path / "state.npz")
+    base.save_checkpoint(path)
+
+    restored = _build(engine, **options)
+    restored.load_checkpoint(path)
+    assert restored.time == base.time
+    _assert_same(base, restored, -1)
+    for step in range(100):
+        base.step(1.0)
+        restored.step(1.0)
+        _assert_same(base, restored, step)
+    assert base.vehicle_count()
+    if options.get("reroute"):
+        # Nach dem Laden wurden die Kosten mehrfach neu gesetzt
+        assert restored.rerouter.updates >= 4
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_fork_leaves_base_untouched(engine):
+    base = _build(engine)
+    reference = _build(engine)
+    for sim in (base, reference):
+        sim.spawn_vehicles(400, processes=1)
+        for _ in range(40):
+            sim.step(1.0)
+    before = base.vehicle_columns()
+
+    branch = base.fork()
+    lights = [tl._index for tl in branch.light_scheduler.controllers]
+    branch.light_scheduler.force_phases(lights, [PHASE_GREEN] * len(lights))
+    for _ in range(60):
+        branch.step(1.0)
+    assert branch.time > base.time
+
+    after = base.vehicle_columns()
+    for name, col in before.items():
+        assert np.array_equal(col, after[name]), name
+    # Die Basis läuft danach wie ein Lauf, der nie verzweigt wurde
+    for step in range(60):
+        base.step(1.0)
+        reference.step(1.0)
+        _assert_same(base, reference, step)
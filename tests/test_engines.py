@@ -0,0 +1,72 @@
+"""
+Äquivalenz-Tests auf den synthetischen Netzen: Objekt- vs. vektorisierte
+Engine und partitionierter vs. Einzelprozess-Betrieb müssen bei gleichem
+seed denselben Zustand je Fahrzeug liefern.
+"""
+
+import multiprocessing
+
+import pytest
+
+from src.simulation import Simulator
+from src.simulation.partition import PartitionedSimulator, vehicle_state
+from src.simulation.synthetic import (
+    grid_network,
+    radial_network,
+    random_planar_network,
+)
+
+NETWORKS = {
+    "grid": lambda: grid_network(8, 8, seed=2),
+    "radial": lambda: radial_network(3, 8, seed=4),
+    "planar": lambda: random_planar_network(8, 8, seed=5),
+}
+
+VEHICLES = 400
+STEPS = 60
+
+
+def _states(sim: Simulator):
+    vehicles = sim.engine.to_vehicles() if sim.engine is not None else sim.vehicles
+    return sorted(vehicle_state(v) for v in vehicles)
+
+
+def _build(name: str, **kwargs) -> Simulator:
+    intersections, streets = NETWORKS[name]()
+    return Simulator.from_network(intersections, streets, seed=3, **kwargs)
+
+
+@pytest.mark.parametrize("name", sorted(NETWORKS))
+def test_vectorized_matches_objects(name):
+    sims = [_build(name, engine=engine) for engine in ("objects", "vectorized")]
+    for sim in sims:
+        sim.spawn_vehicles(VEHICLES, processes=1)
+    for step in range(STEPS):
+        for sim in sims:
+            sim.step(1.0)
+        assert sims[0].vehicle_count() == sims[1].vehicle_count(), step
+    objects, vectorized = (_states(sim) for sim in sims)
+    assert objects
+    assert objects == vectorized
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Partitionierter Betrieb benötigt fork-Prozesse",
+)
+@pytest.mark.parametrize("name", sorted(NETWORKS))
+def test_partitioned_matches_single_process(name):
+    single = _build(name)
+    single.spawn_vehicles(VEHICLES, processes=1)
+    part = PartitionedSimulator(_build(name), 3)
+    try:
+        part.spawn_vehicles(VEHICLES, processes=1)
+        for step in range(STEPS):
+            single.step(1.0)
+            part.step(1.0)
+            assert single.vehicle_count() == part.vehicle_count(), step
+        states = [vehicle_state(v) for v in part.collect_vehicles()]
+    finally:
+        part.close()
+    assert states
+    assert states == _states(single)
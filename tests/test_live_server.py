@@ -0,0 +1,101 @@
+"""
+Binäres Frame-Protokoll des Live-Servers: ein FrameDecoder, der die Frames
+von LiveServer.frame anwendet, muss nach jedem Frame genau die Sicht des
+Clients auf den aktuellen Tick haben, auch über Viewport-Wechsel und
+übersprungene Ticks hinweg.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+
+from src.dashboard.server import WS_TEXT, Client, FrameDecoder, LiveServer, ws_frame
+from src.simulation import Simulator
+from src.simulation.synthetic import grid_network
+
+
+class _Client:
+    """Wie server.Client, ohne Verbindung (nur der Protokoll-Stand)."""
+
+    def __init__(self, viewport):
+        self.viewport = viewport
+        self.base = None
+        self.base_view = viewport
+
+
+def _send(server: LiveServer, client: _Client, decoder: FrameDecoder, snap):
+    decoder.apply(server.frame(client, snap))
+    client.base = snap
+    client.base_view = client.viewport
+
+
+def _assert_view(server: LiveServer, client: _Client, decoder: FrameDecoder, snap):
+    vid, state = server._view(snap, client.viewport)
+    expected = {
+        v: (s >> 32, (s >> 16) & 0xFFFF, (s >> 8) & 0xFF, s & 0xFF)
+        for v, s in zip(vid.tolist(), state.tolist())
+    }
+    assert decoder.vehicles == expected
+    assert decoder.tick == snap.tick
+    lights = client.viewport.lights
+    visible = np.arange(len(snap.phase)) if lights is None else np.flatnonzero(lights)
+    assert visible.size
+    for c in visible.tolist():
+        assert decoder.lights[c] == snap.phase[c]
+
+
+def test_decoder_follows_frames_across_viewport_changes():
+    intersections, streets = grid_network(6, 6, seed=2)
+    sim = Simulator.from_network(intersections, streets, seed=3)
+    sim.spawn_vehicles(300, processes=1)
+    server = LiveServer(sim)
+    xy = server.geom.xy
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    mid = (lo + hi) / 2.0
+    box = server.viewport({"viewport": [lo[0], lo[1], mid[0], mid[1]]})
+    some = server.viewport({"streets": sorted(streets)[::3]})
+    full = server.viewport({"viewport": None})
+
+    clients = [(_Client(full), FrameDecoder()), (_Client(box), FrameDecoder())]
+    for tick in range(40):
+        sim.step(1.0)
+        snap = server.take_snapshot()
+        if tick == 12:
+            clients[0][0].viewport = box
+            clients[1][0].viewport = some
+        if tick == 25:
+            clients[0][0].viewport = full
+            clients[1][0].viewport = box
+        for k, (client, decoder) in enumerate(clients):
+            # Zweiter Client verpasst Ticks (Delta über mehrere Ticks)
+            if k == 1 and tick % 3 and tick not in (12, 25):
+                continue
+            _send(server, client, decoder, snap)
+            _assert_view(server, client, decoder, snap)
+    assert len(clients[0][1].vehicles)
+
+
+def test_invalid_messages_are_counted():
+    intersections, streets = grid_network(4, 4, seed=2)
+    server = LiveServer(Simulator.from_network(intersections, streets, seed=3))
+    box = [0.0, 0.0, 150.0, 150.0]
+    messages = [
+        b"kein json",
+        b"[1, 2]",
+        b'{"viewport": [1]}',
+        json.dumps({"viewport": box}).encode("utf-8"),
+    ]
+
+    async def run():
+        reader = asyncio.StreamReader()
+        for msg in messages:
+            reader.feed_data(ws_frame(WS_TEXT, msg))  # unmaskiert
+        reader.feed_eof()
+        client = Client(None)
+        await server._receive_loop(reader, client)
+        return client
+
+    client = asyncio.run(run())
+    assert client.invalid == 3
+    assert client.viewport.key == ("box", *box)
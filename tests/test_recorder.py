@@ -0,0 +1,61 @@
+"""
+TrajectoryRecorder/-Reader: eine Aufzeichnung über mehrere Chunks muss je
+Tick genau die Fahrzeug-Spalten des Simulators zurückgeben (Positionen und
+Geschwindigkeiten in float32).
+"""
+
+import numpy as np
+import pytest
+
+from src.simulation import Simulator
+from src.simulation.recorder import TrajectoryReader, TrajectoryRecorder
+from src.simulation.synthetic import grid_network
+
+TICKS = 25
+
+
+def _expected(sim: Simulator):
+    cols = sim.vehicle_columns()
+    order = np.argsort(cols["vid"], kind="stable")
+    return {name: arr[order] for name, arr in cols.items()}, sim.time
+
+
+@pytest.mark.parametrize("engine", ("objects", "vectorized"))
+def test_roundtrip_over_chunks(tmp_path, engine):
+    intersections, streets = grid_network(6, 6, seed=2)
+    sim = Simulator.from_network(intersections, streets, seed=3, engine=engine)
+    sim.spawn_vehicles(300, processes=1)
+    directory = str(tmp_path / "rec")
+    rec = TrajectoryRecorder(directory, sim, chunk_ticks=4)
+    sim.recorder = rec
+    recorded = []
+    for _ in range(TICKS):
+        sim.step(1.0)
+        recorded.append(_expected(sim))
+    rec.close()
+    assert rec.ticks_written == TICKS
+
+    reader = TrajectoryReader(directory)
+    assert len(reader) == TICKS
+    assert len(set(reader.index["chunk"].tolist())) == -(-TICKS // 4)
+    # Rückwärts lesen, damit Chunks auch erneut geladen werden
+    for i in reversed(range(TICKS)):
+        cols, t = recorded[i]
+        got = reader.tick(i)
+        assert got["time"] == t
+        assert np.array_equal(got["vid"], cols["vid"]), i
+        assert np.array_equal(got["street"], cols["street"]), i
+        assert np.array_equal(got["lane"], cols["lane"]), i
+        for name in ("position_s", "speed"):
+            assert got[name].dtype == np.float32
+            assert np.array_equal(got[name], cols[name].astype(np.float32)), (i, name)
+
+    times = [t for _, t in recorded]
+    assert reader.seek_time(times[0] - 0.5) == 0
+    assert reader.seek_time(times[7]) == 7
+    assert reader.seek_time(times[7] + 0.5) == 7
+    assert reader.seek_time(times[-1] + 100.0) == TICKS - 1
+
+    loaded_intersections, loaded_streets = reader.load_network()
+    assert len(loaded_intersections) == len(intersections)
+    assert sorted(loaded_streets) == sorted(streets)
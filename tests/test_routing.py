@@ -0,0 +1,66 @@
+"""
+Alle Routing-Methoden müssen auf den synthetischen Netzen Routen mit
+denselben Kosten wie Dijkstra finden (bei Gleichstand darf die Route
+selbst abweichen).
+"""
+
+import random
+
+import pytest
+
+from src.simulation.contraction import ContractionHierarchy
+from src.simulation.routing import CSRGraph, Router
+from src.simulation.synthetic import (
+    grid_network,
+    radial_network,
+    random_planar_network,
+)
+
+NETWORKS = {
+    "grid": lambda: grid_network(8, 8, seed=2),
+    "radial": lambda: radial_network(3, 8, seed=4),
+    "planar": lambda: random_planar_network(8, 8, seed=5),
+}
+
+PAIRS = 200
+
+
+def _cost(route, streets):
+    return sum(streets[st_id].length for st_id in route)
+
+
+def _valid(route, start, goal, streets):
+    if not route:
+        return True
+    nodes = [streets[route[0]].start_node]
+    for st_id in route:
+        st = streets[st_id]
+        if st.start_node != nodes[-1]:
+            return False
+        nodes.append(st.end_node)
+    return nodes[0] == start and nodes[-1] == goal
+
+
+@pytest.mark.parametrize("name", sorted(NETWORKS))
+@pytest.mark.parametrize("method", [m for m in Router.METHODS if m != "dijkstra"])
+def test_methods_match_dijkstra(name, method):
+    intersections, streets = NETWORKS[name]()
+    graph = CSRGraph.from_network(intersections, streets)
+    ch = None
+    if method == "ch":
+        ch = ContractionHierarchy.load_or_build(graph, None, verbose=False)
+    reference = Router(graph, cache_size=0, method="dijkstra")
+    router = Router(graph, cache_size=0, method=method, ch=ch)
+
+    rng = random.Random(7)
+    nodes = list(intersections)
+    found = 0
+    for _ in range(PAIRS):
+        start, goal = rng.choice(nodes), rng.choice(nodes)
+        expected = reference.route(start, goal)
+        route = router.route(start, goal)
+        assert bool(route) == bool(expected), (start, goal)
+        assert _valid(route, start, goal, streets), (start, goal)
+        assert _cost(route, streets) == pytest.approx(_cost(expected, streets))
+        found += bool(expected)
+    assert found
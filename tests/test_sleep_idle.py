@@ -0,0 +1,53 @@
+"""
+sleep_idle darf das Ergebnis nicht ändern: gleicher seed mit und ohne
+schlafende Spuren muss dieselben Fahrzeug-Spalten liefern, auch wenn
+Ampeln mitten im Lauf umgeschaltet oder umgeplant werden.
+"""
+
+import numpy as np
+
+from src.simulation import Simulator
+from src.simulation.TrafficLight import PHASE_DURATIONS, PHASE_GREEN, PHASE_RED
+from src.simulation.synthetic import grid_network
+
+
+def _build(sleep_idle: bool) -> Simulator:
+    intersections, streets = grid_network(8, 8, seed=2)
+    sim = Simulator.from_network(
+        intersections, streets, seed=3, sleep_idle=sleep_idle
+    )
+    sim.spawn_vehicles(400, processes=1)
+    return sim
+
+
+def _assert_same(a: Simulator, b: Simulator, step: int):
+    ca, cb = a.vehicle_columns(), b.vehicle_columns()
+    for name in ("vid", "street", "lane", "position_s", "speed"):
+        assert np.array_equal(ca[name], cb[name]), (step, name)
+
+
+def test_sleep_idle_matches_awake_run():
+    awake, sleeping = _build(False), _build(True)
+    nodes = [
+        nid for nid, inter in awake.intersections.items() if inter.traffic_lights
+    ]
+    assert nodes
+
+    for step in range(120):
+        if step == 40:
+            # Mitten im Lauf: Phasen erzwingen und Zeitpläne ändern
+            for sim in (awake, sleeping):
+                lights = [sim.intersections[nid].traffic_lights for nid in nodes]
+                cs = [tl._index for tl in lights]
+                phases = [PHASE_GREEN if k % 2 else PHASE_RED for k in range(len(cs))]
+                sim.light_scheduler.force_phases(cs, phases)
+        if step == 70:
+            plan = dict(PHASE_DURATIONS)
+            plan.update({PHASE_GREEN: 30.0, PHASE_RED: 8.0})
+            for sim in (awake, sleeping):
+                for nid in nodes[::3]:
+                    sim.set_timing_plan(nid, plan, 5.0)
+        awake.step(1.0)
+        sleeping.step(1.0)
+        _assert_same(awake, sleeping, step)
+    assert len(awake.vehicle_columns()["vid"])